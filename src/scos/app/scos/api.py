@@ -0,0 +1,177 @@
+"""
+JSON API панели СЦОС.
+
+Онлайн-курсы, онлайн-курс, список слушателей СЦОС курса и состояние отправки
+событий обучения для автоматизации и страниц панели СЦОС (таблицы страниц
+загружаются из API после открытия страницы). Списки читаются страницами по
+курсору: ответ содержит results и курсор следующей страницы next, который
+передается параметром cursor. Параметр fields - поля ответа через запятую.
+Ответы содержат ETag и поддерживают If-None-Match (см. utils.json_api).
+"""
+
+from django.contrib.auth.decorators import (
+    login_required,
+    user_passes_test,
+)
+
+from .views import (
+    LMS_URL,
+    SCOS_COURSES_PAGE_SIZE,
+    SCOS_ROSTER_PAGE_SIZE,
+    get_registry_course_or_404,
+    is_staff_check,
+)
+
+from .utils.json_api import (
+    APIError,
+    get_fields,
+    get_page_size,
+    json_api,
+    pick,
+)
+
+from .utils.course import (
+    get_course_key,
+)
+
+from .utils.course_list import (
+    COURSE_FIELDS,
+    EXTRA_FIELDS,
+    get_course_list,
+    get_course_list_filters,
+    get_course_list_page,
+    get_course_list_sort,
+)
+
+from .utils.user import (
+    ROSTER_FIELDS,
+    decode_enrollments_cursor,
+    get_course_enrollment_counts,
+    get_course_roster_page,
+)
+
+from .utils.delivery_records import (
+    get_delivered_courses_page,
+    get_delivery_stats,
+)
+
+from .utils.circuit import (
+    get_circuit_status,
+)
+
+from .utils.publisher import (
+    get_delivery_queue_depth,
+)
+
+from .utils.deadline import (
+    SCOS_VIEW_DEADLINE,
+    with_deadline,
+)
+
+from .utils.profiling import (
+    profiled,
+)
+
+
+
+# enrollments - число записей слушателей СЦОС, считается только по запросу
+COURSE_API_FIELDS = COURSE_FIELDS + EXTRA_FIELDS + ("enrollments",)
+COURSE_API_DEFAULT_FIELDS = COURSE_FIELDS + ("institution_short_title",)
+DELIVERY_SECTIONS = ("stats", "circuit", "queue")
+DELIVERED_COURSE_FIELDS = ("global_id", "title", "session_id", "delivered_at")
+
+
+
+@login_required
+@user_passes_test(is_staff_check, login_url=LMS_URL)
+@profiled
+@json_api
+def courses(request) -> dict:
+    fields = get_fields(request.GET, COURSE_API_FIELDS, COURSE_API_DEFAULT_FIELDS)
+    filters = get_course_list_filters(request.GET)
+    sort = get_course_list_sort(request.GET)
+    cursor = request.GET.get("cursor")
+    page, next_cursor = get_course_list_page(
+        filters,
+        sort,
+        cursor = cursor,
+        size = get_page_size(request.GET, SCOS_COURSES_PAGE_SIZE),
+    )
+    if "enrollments" in fields:
+        enrollment_counts = get_course_enrollment_counts(
+            row["session_id"] for row in page if row["session_id"]
+        )
+        for row in page:
+            row["enrollments"] = enrollment_counts.get(row["session_id"])
+    data = {
+        "results": pick(page, fields),
+        "next": next_cursor,
+    }
+    if not cursor:
+        data["count"] = get_course_list(filters, sort).count()
+    return data
+
+@login_required
+@user_passes_test(is_staff_check, login_url=LMS_URL)
+@profiled
+@with_deadline(SCOS_VIEW_DEADLINE)
+@json_api
+def course(request, global_id: str) -> dict:
+    scos_course = get_registry_course_or_404(global_id)
+    fields = get_fields(request.GET, None, scos_course.keys())
+    return {field: scos_course.get(field) for field in fields}
+
+@login_required
+@user_passes_test(is_staff_check, login_url=LMS_URL)
+@profiled
+@with_deadline(SCOS_VIEW_DEADLINE)
+@json_api
+def course_roster(request, global_id: str) -> dict:
+    fields = get_fields(request.GET, ROSTER_FIELDS, ROSTER_FIELDS)
+    course_id = get_course_key(get_registry_course_or_404(global_id).get("external_url") or "")
+    if course_id is None:
+        raise APIError("у онлайн-курса нет курса платформы", 404)
+    cursor = request.GET.get("cursor")
+    if cursor and decode_enrollments_cursor(cursor) is None:
+        raise APIError("некорректный курсор")
+    page, next_cursor = get_course_roster_page(
+        course_id,
+        cursor = cursor,
+        size = get_page_size(request.GET, SCOS_ROSTER_PAGE_SIZE),
+    )
+    return {
+        "course_id": course_id,
+        "results": pick(page, fields),
+        "next": next_cursor,
+    }
+
+@login_required
+@user_passes_test(is_staff_check, login_url=LMS_URL)
+@profiled
+@json_api
+def delivery(request) -> dict:
+    sections = get_fields(request.GET, DELIVERY_SECTIONS, DELIVERY_SECTIONS)
+    data = {}
+    if "stats" in sections:
+        data["stats"] = get_delivery_stats()
+    if "circuit" in sections:
+        data["circuit"] = get_circuit_status()
+    if "queue" in sections:
+        queue_name, queue_depth = get_delivery_queue_depth()
+        data["queue"] = {"name": queue_name, "depth": queue_depth}
+    return data
+
+@login_required
+@user_passes_test(is_staff_check, login_url=LMS_URL)
+@profiled
+@json_api
+def delivery_courses(request) -> dict:
+    fields = get_fields(request.GET, DELIVERED_COURSE_FIELDS, DELIVERED_COURSE_FIELDS)
+    page, next_cursor = get_delivered_courses_page(
+        cursor = request.GET.get("cursor"),
+        size = get_page_size(request.GET, SCOS_COURSES_PAGE_SIZE),
+    )
+    return {
+        "results": pick(page, fields),
+        "next": next_cursor,
+    }
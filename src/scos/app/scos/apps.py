@@ -0,0 +1,42 @@
+"""
+Scos app config.
+"""
+
+from django.apps import AppConfig
+from edx_django_utils.plugins.constants import ( # pylint: disable=import-error
+    PluginSettings,
+    PluginURLs,
+)
+
+
+
+class SCOSConfig(AppConfig):
+    """
+    Конфигурация Django приложения СЦОС.
+
+    Приложение подключается к LMS и CMS как Django плагин Open edX (точки
+входа lms.djangoapp и cms.djangoapp), панель СЦОС доступна в CMS по адресу
+/scos/.
+    """
+    default_auto_field = "django.db.models.AutoField"
+    name = "scos"
+    label = "scos"
+    verbose_name = "СЦОС"
+
+    plugin_app = {
+        PluginURLs.CONFIG: {
+            "cms.djangoapp": {
+                PluginURLs.NAMESPACE: "scos",
+                PluginURLs.REGEX: r"^scos/",
+                PluginURLs.RELATIVE_PATH: "urls",
+            },
+        },
+        PluginSettings.CONFIG: {
+            "lms.djangoapp": {
+                "common": {PluginSettings.RELATIVE_PATH: "settings.common"},
+            },
+        },
+    }
+
+    def ready(self) -> None:
+        from .utils import signals  # pylint: disable=import-outside-toplevel,unused-import
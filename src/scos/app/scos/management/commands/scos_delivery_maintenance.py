@@ -0,0 +1,19 @@
+"""
+./manage.py cms scos_delivery_maintenance - обслуживание журнала отправки
+событий обучения (см. scos.utils.delivery_records)
+"""
+
+from django.core.management.base import BaseCommand
+
+from ...utils.delivery_records import (
+    maintain_deliveries,
+)
+
+
+
+class Command(BaseCommand):
+    help = "Обслуживание журнала отправки событий обучения на СЦОС"
+
+    def handle(self, *args, **options):
+        stats = maintain_deliveries()
+        self.stdout.write(f"Журнал отправки событий обслужен: {stats}")
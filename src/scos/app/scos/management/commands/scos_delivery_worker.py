@@ -0,0 +1,40 @@
+"""
+./manage.py lms scos_delivery_worker - асинхронный воркер отправки событий
+обучения на СЦОС (см. scos.utils.delivery)
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...utils.delivery import (
+    SCOS_ASYNC_CONCURRENCY,
+    SCOS_ASYNC_PREPARE_THREADS,
+    DeliveryWorker,
+    aiohttp,
+)
+
+
+
+class Command(BaseCommand):
+    help = "Асинхронный воркер отправки событий обучения на СЦОС"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=SCOS_ASYNC_CONCURRENCY,
+            help="Число одновременных запросов к СЦОС",
+        )
+        parser.add_argument(
+            "--prepare-threads",
+            type=int,
+            default=SCOS_ASYNC_PREPARE_THREADS,
+            help="Число потоков запросов к базе платформы",
+        )
+
+    def handle(self, *args, **options):
+        if aiohttp is None:
+            raise CommandError("Для асинхронного воркера отправки СЦОС установите aiohttp")
+        DeliveryWorker(
+            concurrency = options["concurrency"],
+            prepare_threads = options["prepare_threads"],
+        ).run()
@@ -0,0 +1,33 @@
+"""
+./manage.py cms scos_registry_sync - синхронизация локальной копии реестра
+СЦОС (см. scos.utils.registry)
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import (
+    SCOSRegistrySync,
+)
+from ...utils.registry import (
+    sync_registry,
+)
+
+
+
+class Command(BaseCommand):
+    help = "Синхронизация локальной копии реестра СЦОС"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Запросить подробную информацию обо всех курсах",
+        )
+
+    def handle(self, *args, **options):
+        sync = sync_registry(full=options["full"])
+        if sync is None:
+            raise CommandError("Синхронизация реестра СЦОС уже выполняется")
+        if sync.status != SCOSRegistrySync.SUCCESS:
+            raise CommandError(f"Ошибка синхронизации реестра СЦОС: {sync.error}")
+        self.stdout.write(f"Реестр СЦОС синхронизирован: {sync.stats}")
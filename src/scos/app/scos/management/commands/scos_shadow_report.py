@@ -0,0 +1,51 @@
+"""
+./manage.py cms scos_shadow_report - отчет о различиях ответов основного и
+второго контуров СЦОС (см. scos.utils.shadow)
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...utils.shadow import (
+    SCOS_SHADOW_PATH,
+    get_shadow_report,
+)
+
+
+
+class Command(BaseCommand):
+    help = "Отчет о различиях ответов основного и второго контуров СЦОС"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="*",
+            help=f"Файлы или каталоги сравнения, по умолчанию {SCOS_SHADOW_PATH}",
+        )
+        parser.add_argument(
+            "--json",
+            action="store_true",
+            help="Отчет в формате JSON",
+        )
+
+    def handle(self, *args, **options):
+        report, dropped = get_shadow_report(options["paths"] or [SCOS_SHADOW_PATH])
+        if not report:
+            raise CommandError("Нет записей сравнения ответов")
+        if options["json"]:
+            self.stdout.write(json.dumps(
+                {"requests": report, "dropped": dropped}, ensure_ascii=False, indent=2,
+            ))
+            return
+        for row in report:
+            self.stdout.write(
+                f"{row['method']} {row['path']}: всего {row['total']}, "
+                f"совпадают {row['same']}, статус {row['status']}, тело {row['body']}, "
+                f"ошибки {row['error']}, не сравнивались {row['uncompared']}; "
+                f"мс p50/p95 основной {row['primary_p50']}/{row['primary_p95']}, "
+                f"второй {row['shadow_p50']}/{row['shadow_p95']}"
+            )
+            for field, count in row["fields"]:
+                self.stdout.write(f"    {field}: {count}")
+        self.stdout.write(f"Отброшено копий при переполнении очереди: {dropped}")
@@ -0,0 +1,23 @@
+"""
+./manage.py cms scos_visitors_push - отправка на СЦОС числа записей на
+онлайн-курсы (см. scos.utils.visitors)
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...utils.visitors import (
+    push_visitors,
+)
+
+
+
+class Command(BaseCommand):
+    help = "Отправка на СЦОС числа записей на онлайн-курсы"
+
+    def handle(self, *args, **options):
+        stats = push_visitors()
+        if stats is None:
+            raise CommandError("Отправка числа записей на курсы уже выполняется")
+        if stats["failed"]:
+            raise CommandError(f"Ошибка отправки числа записей на курсы: {stats}")
+        self.stdout.write(f"Число записей на курсы отправлено: {stats}")
@@ -0,0 +1,26 @@
+"""
+Снимки отправленных на СЦОС параметров онлайн-курсов.
+"""
+
+from django.db import migrations, models
+
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SCOSCourseSnapshot",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("session_id", models.CharField(max_length=255, unique=True)),
+                ("data", models.JSONField(default=dict)),
+                ("updated_at", models.DateTimeField()),
+            ],
+        ),
+    ]
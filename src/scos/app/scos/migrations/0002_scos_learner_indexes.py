@@ -0,0 +1,53 @@
+"""
+Индексы для запросов записей слушателей СЦОС на курсы.
+
+Таблицы принадлежат приложениям student и social_django, поэтому индексы
+создаются через schema_editor без изменения их моделей.
+"""
+
+from django.db import migrations, models
+
+
+
+INDEXES = [
+    (
+        "student",
+        "CourseEnrollment",
+        models.Index(
+            fields=["course_id", "created"],
+            name="scos_enroll_course_created",
+        ),
+    ),
+    (
+        "social_django",
+        "UserSocialAuth",
+        models.Index(
+            fields=["user_id", "provider"],
+            name="scos_usa_user_provider",
+        ),
+    ),
+]
+
+
+
+def add_indexes(apps, schema_editor):
+    for app_label, model_name, index in INDEXES:
+        schema_editor.add_index(apps.get_model(app_label, model_name), index)
+
+def remove_indexes(apps, schema_editor):
+    for app_label, model_name, index in INDEXES:
+        schema_editor.remove_index(apps.get_model(app_label, model_name), index)
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scos", "0001_scos_course_snapshots"),
+        ("student", "__first__"),
+        ("social_django", "0010_uid_db_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_indexes, remove_indexes),
+    ]
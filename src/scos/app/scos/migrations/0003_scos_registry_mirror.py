@@ -0,0 +1,76 @@
+"""
+Локальная копия реестра СЦОС для панели СЦОС.
+"""
+
+from django.db import migrations, models
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scos", "0002_scos_learner_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SCOSCourse",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("global_id", models.CharField(max_length=255, unique=True)),
+                ("title", models.CharField(blank=True, db_index=True, max_length=512)),
+                ("external_url", models.CharField(blank=True, db_index=True, max_length=512)),
+                ("session_id", models.CharField(blank=True, db_index=True, max_length=255)),
+                ("institution_id", models.CharField(blank=True, db_index=True, max_length=255)),
+                ("language", models.CharField(blank=True, max_length=16)),
+                ("started_at", models.CharField(blank=True, max_length=32)),
+                ("finished_at", models.CharField(blank=True, max_length=32)),
+                ("business_version", models.IntegerField(null=True)),
+                ("data", models.JSONField(default=dict)),
+                ("synced_at", models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SCOSPlatform",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("global_id", models.CharField(max_length=255, unique=True)),
+                ("title", models.CharField(blank=True, db_index=True, max_length=512)),
+                ("short_title", models.CharField(blank=True, max_length=255)),
+                ("data", models.JSONField(default=dict)),
+                ("synced_at", models.DateTimeField()),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="SCOSRegistrySync",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("started_at", models.DateTimeField(db_index=True)),
+                ("finished_at", models.DateTimeField(null=True)),
+                ("status", models.CharField(choices=[("running", "Выполняется"), ("success", "Успешно"), ("failure", "Ошибка")], default="running", max_length=16)),
+                ("full", models.BooleanField(default=False)),
+                ("stats", models.JSONField(default=dict)),
+                ("error", models.TextField(blank=True)),
+            ],
+            options={
+                "ordering": ("-started_at",),
+            },
+        ),
+        migrations.CreateModel(
+            name="SCOSRightholder",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("global_id", models.CharField(max_length=255, unique=True)),
+                ("title", models.CharField(blank=True, db_index=True, max_length=512)),
+                ("short_title", models.CharField(blank=True, max_length=255)),
+                ("data", models.JSONField(default=dict)),
+                ("synced_at", models.DateTimeField()),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+"""
+Журнал отправки событий обучения на СЦОС.
+"""
+
+from django.db import migrations, models
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scos", "0003_scos_registry_mirror"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scoscourse",
+            name="delivered_at",
+            field=models.DateTimeField(db_index=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="SCOSDelivery",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("kind", models.CharField(max_length=32)),
+                ("status", models.CharField(choices=[("pending", "Ожидает отправки"), ("sent", "Отправлено"), ("failed", "Ошибка")], default="pending", max_length=16)),
+                ("course_id", models.CharField(blank=True, max_length=255)),
+                ("item", models.JSONField(default=dict)),
+                ("event_at", models.DateTimeField()),
+                ("created_at", models.DateTimeField()),
+                ("sent_at", models.DateTimeField(null=True)),
+                ("attempts", models.IntegerField(default=0)),
+                ("error_kind", models.CharField(blank=True, max_length=16)),
+                ("error", models.TextField(blank=True)),
+            ],
+            options={
+                "indexes": [models.Index(fields=["status", "kind"], name="scos_delivery_status")],
+            },
+        ),
+        migrations.CreateModel(
+            name="SCOSDeliveryCounter",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("kind", models.CharField(max_length=32)),
+                ("metric", models.CharField(max_length=32)),
+                ("value", models.BigIntegerField(default=0)),
+            ],
+            options={
+                "unique_together": {("kind", "metric")},
+            },
+        ),
+    ]
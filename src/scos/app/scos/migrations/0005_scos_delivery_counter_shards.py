@@ -0,0 +1,25 @@
+"""
+Сводные показатели отправки событий разделены на строки.
+"""
+
+from django.db import migrations, models
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scos", "0004_scos_delivery_records"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scosdeliverycounter",
+            name="shard",
+            field=models.SmallIntegerField(default=0),
+        ),
+        migrations.AlterUniqueTogether(
+            name="scosdeliverycounter",
+            unique_together={("kind", "metric", "shard")},
+        ),
+    ]
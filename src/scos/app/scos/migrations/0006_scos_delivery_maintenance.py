@@ -0,0 +1,36 @@
+"""
+Обслуживание журнала отправки событий: время постановки записи в отправку,
+индексы удаления старых и поиска незавершенных отправок.
+"""
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+
+def set_queued_at(apps, schema_editor): # pylint: disable=unused-argument
+    SCOSDelivery = apps.get_model("scos", "SCOSDelivery")
+    SCOSDelivery.objects.filter(queued_at__isnull=True).update(queued_at=F("created_at"))
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("scos", "0005_scos_delivery_counter_shards"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scosdelivery",
+            name="queued_at",
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(set_queued_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="scosdelivery",
+            index=models.Index(fields=["status", "queued_at"], name="scos_delivery_queued"),
+        ),
+        migrations.AddIndex(
+            model_name="scosdelivery",
+            index=models.Index(fields=["status", "sent_at"], name="scos_delivery_sent"),
+        ),
+    ]
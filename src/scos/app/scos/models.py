@@ -0,0 +1,146 @@
+"""
+Модели приложения СЦОС: локальная копия реестра СЦОС и журнал отправки
+событий обучения.
+
+Онлайн-курсы платформы, платформы и Правообладатели копируются из реестра СЦОС
+задачей registry_sync (см. utils.registry), панель СЦОС читает их из базы
+платформы, а не из API СЦОС.
+
+Снимки отправленных на СЦОС параметров онлайн-курсов хранятся в
+SCOSCourseSnapshot (см. utils.course_update).
+
+Каждая отправка события обучения на СЦОС записывается в SCOSDelivery,
+сводные показатели страницы отправки хранятся в SCOSDeliveryCounter (см.
+utils.delivery_records).
+"""
+
+from django.db import models
+
+
+
+class SCOSPartner(models.Model):
+    """
+    Партнер СЦОС (3.1.10, 3.1.11)
+    """
+    global_id = models.CharField(max_length=255, unique=True)
+    title = models.CharField(max_length=512, blank=True, db_index=True)
+    short_title = models.CharField(max_length=255, blank=True)
+    data = models.JSONField(default=dict)
+    synced_at = models.DateTimeField()
+
+    class Meta:
+        abstract = True
+
+    def __str__(self) -> str:
+        return self.short_title or self.title or self.global_id
+
+class SCOSPlatform(SCOSPartner):
+    """
+    Платформа СЦОС
+    """
+
+class SCOSRightholder(SCOSPartner):
+    """
+    Правообладатель СЦОС
+    """
+
+class SCOSCourse(models.Model):
+    """
+    Онлайн-курс платформы в реестре СЦОС: поля для поиска и сортировки,
+    data - подробная информация о курсе (3.1.15)
+    """
+    global_id = models.CharField(max_length=255, unique=True)
+    title = models.CharField(max_length=512, blank=True, db_index=True)
+    external_url = models.CharField(max_length=512, blank=True, db_index=True)
+    session_id = models.CharField(max_length=255, blank=True, db_index=True)
+    institution_id = models.CharField(max_length=255, blank=True, db_index=True)
+    language = models.CharField(max_length=16, blank=True)
+    started_at = models.CharField(max_length=32, blank=True)
+    finished_at = models.CharField(max_length=32, blank=True)
+    business_version = models.IntegerField(null=True)
+    data = models.JSONField(default=dict)
+    synced_at = models.DateTimeField()
+    # Последняя успешная отправка события обучения курса
+    delivered_at = models.DateTimeField(null=True, db_index=True)
+
+    def __str__(self) -> str:
+        return self.title or self.global_id
+
+class SCOSCourseSnapshot(models.Model):
+    """
+    Последние отправленные на СЦОС параметры онлайн-курса (payload без "id")
+    курса платформы session_id
+    """
+    session_id = models.CharField(max_length=255, unique=True)
+    data = models.JSONField(default=dict)
+    updated_at = models.DateTimeField()
+
+class SCOSRegistrySync(models.Model):
+    """
+    Синхронизация локальной копии реестра СЦОС
+    """
+    RUNNING = "running"
+    SUCCESS = "success"
+    FAILURE = "failure"
+    STATUSES = (
+        (RUNNING, "Выполняется"),
+        (SUCCESS, "Успешно"),
+        (FAILURE, "Ошибка"),
+    )
+    started_at = models.DateTimeField(db_index=True)
+    finished_at = models.DateTimeField(null=True)
+    status = models.CharField(max_length=16, choices=STATUSES, default=RUNNING)
+    full = models.BooleanField(default=False)
+    stats = models.JSONField(default=dict)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ("-started_at",)
+
+class SCOSDelivery(models.Model):
+    """
+    Отправка события обучения на СЦОС: kind - вид запроса
+    (scos_api.SCOS_WRITE_REQUESTS), item - отправляемый объект
+    """
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUSES = (
+        (PENDING, "Ожидает отправки"),
+        (SENT, "Отправлено"),
+        (FAILED, "Ошибка"),
+    )
+    kind = models.CharField(max_length=32)
+    status = models.CharField(max_length=16, choices=STATUSES, default=PENDING)
+    course_id = models.CharField(max_length=255, blank=True)
+    item = models.JSONField(default=dict)
+    event_at = models.DateTimeField()
+    created_at = models.DateTimeField()
+    # Запись получила статус pending (создана или отправляется повторно)
+    queued_at = models.DateTimeField(null=True)
+    sent_at = models.DateTimeField(null=True)
+    attempts = models.IntegerField(default=0)
+    error_kind = models.CharField(max_length=16, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "kind"], name="scos_delivery_status"),
+            models.Index(fields=["status", "queued_at"], name="scos_delivery_queued"),
+            models.Index(fields=["status", "sent_at"], name="scos_delivery_sent"),
+        ]
+
+class SCOSDeliveryCounter(models.Model):
+    """
+    Сводный показатель отправки событий вида kind: число записей в статусе
+    (metric = статус) или число отправок с задержкой до N секунд
+    (metric = "lag_le_N"). Показатель разделен на строки shard, значение -
+    сумма строк.
+    """
+    kind = models.CharField(max_length=32)
+    metric = models.CharField(max_length=32)
+    shard = models.SmallIntegerField(default=0)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = (("kind", "metric", "shard"),)
@@ -0,0 +1,56 @@
+"""
+Настройки LMS для приложения СЦОС
+"""
+
+import os
+
+
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COURSE_ABOUT_FILTER = "org.openedx.learning.course_about.render.started.v1"
+
+SCOS_EVENTS = [
+    "edx.course.enrollment.activated",
+    "edx.course.enrollment.deactivated",
+    "edx.grades.subsection.grade_calculated",
+    "edx.grades.course.grade_calculated",
+]
+
+
+
+def plugin_settings(settings) -> None:
+    """
+    Отправка событий обучения на СЦОС и виджет отзывов СЦОС на странице
+    описания курса
+    """
+    settings.EVENT_TRACKING_BACKENDS.update(
+        {
+            "scos": {
+                "ENGINE": "eventtracking.backends.routing.RoutingBackend",
+                "OPTIONS": {
+                    "backends": {
+                        "scos": {
+                            "ENGINE": "scos.utils.events.SCOSEventTrackingBackend",
+                        }
+                    },
+                    "processors": [
+                        {
+                            "ENGINE": "eventtracking.processors.regex_filter.RegexFilter",
+                            "OPTIONS": {
+                                "filter_type": "allowlist",
+                                "regular_expressions": SCOS_EVENTS,
+                            }
+                        }
+                    ]
+                }
+            }
+        }
+    )
+    settings.MAKO_TEMPLATE_DIRS_BASE.append(os.path.join(APP_ROOT, "templates", "lms"))
+    filters_config = getattr(settings, "OPEN_EDX_FILTERS_CONFIG", {})
+    course_about = filters_config.setdefault(
+        COURSE_ABOUT_FILTER, {"fail_silently": True, "pipeline": []}
+    )
+    course_about["pipeline"].append("scos.utils.filters.SCOSCourseAboutWidget")
+    settings.OPEN_EDX_FILTERS_CONFIG = filters_config
@@ -107,3 +107,140 @@ async function sendCourseInfo(url, courseJSON, csrftoken) {
             document.getElementById("send_course_info").disabled = false;
     }
 }
+
+// loading tables and values from JSON API
+
+function getAPIValue(row, path) {
+    let value = row;
+    for (const key of path.split(".")) {
+        if (value === null || value === undefined) {
+            return undefined;
+        }
+        value = value[key];
+    }
+    return value;
+}
+
+// column: "path[:datetime][|empty value]"
+
+function formatAPIValue(value, column) {
+    const [spec, empty] = column.split("|");
+    const format = spec.split(":")[1];
+    if (value === null || value === undefined || value === "") {
+        return empty || "";
+    }
+    if (format === "datetime") {
+        return new Date(value).toLocaleString("ru-RU");
+    }
+    if (typeof value === "object") {
+        return JSON.stringify(value);
+    }
+    return String(value);
+}
+
+function apiTableFields(table) {
+    const fields = table.dataset.columns.split(",").map(
+        (column) => column.split(/[.:|]/)[0]
+    );
+    if (table.dataset.link) {
+        fields.push("global_id");
+    }
+    return [...new Set(fields)];
+}
+
+function apiTableRow(table, row) {
+    const tr = document.createElement("tr");
+    if (table.dataset.link) {
+        const href = table.dataset.link.replace(
+            "__global_id__", encodeURIComponent(row.global_id)
+        );
+        tr.className = "courses";
+        tr.addEventListener("click", (event) => {
+            window.location = href;
+        });
+    }
+    for (const column of table.dataset.columns.split(",")) {
+        const td = document.createElement("td");
+        const path = column.split(/[:|]/)[0];
+        td.textContent = formatAPIValue(getAPIValue(row, path), column);
+        tr.appendChild(td);
+    }
+    return tr;
+}
+
+function setAPIStatus(element, text) {
+    if (element) {
+        element.textContent = text;
+        element.hidden = !text;
+    }
+}
+
+async function loadAPITable(table) {
+    const more = document.getElementById(table.dataset.more);
+    const status = document.getElementById(table.dataset.status);
+    const url = new URL(table.dataset.api, window.location.href);
+    url.searchParams.set("fields", apiTableFields(table).join(","));
+    if (table.dataset.cursor) {
+        url.searchParams.set("cursor", table.dataset.cursor);
+    }
+    if (more) {
+        more.disabled = true;
+    }
+    setAPIStatus(status, "Загрузка...");
+    try {
+        const response = await fetch(url, {mode: "same-origin"});
+        if (!response.ok) {
+            throw new Error(`Response status: ${response.status}`);
+        }
+        const json = await response.json();
+        for (const row of json.results) {
+            table.appendChild(apiTableRow(table, row));
+        }
+        if (json.count !== undefined && table.dataset.count) {
+            document.getElementById(table.dataset.count).textContent = json.count;
+        }
+        table.dataset.cursor = json.next || "";
+        if (more) {
+            more.hidden = !json.next;
+        }
+        setAPIStatus(status, "");
+    } catch (error) {
+        setAPIStatus(status, `Ошибка загрузки: ${error.message}`);
+    }
+    if (more) {
+        more.disabled = false;
+    }
+}
+
+function loadAPITables() {
+    for (const table of document.querySelectorAll("table[data-api]")) {
+        const more = document.getElementById(table.dataset.more);
+        if (more) {
+            more.addEventListener("click", (event) => loadAPITable(table));
+        }
+        loadAPITable(table);
+    }
+}
+
+async function loadAPIValues() {
+    const requests = {};
+    for (const element of document.querySelectorAll("[data-api-value]")) {
+        const url = element.dataset.apiValue;
+        if (!(url in requests)) {
+            requests[url] = fetch(url, {mode: "same-origin"}).then((response) => {
+                if (!response.ok) {
+                    throw new Error(`Response status: ${response.status}`);
+                }
+                return response.json();
+            });
+        }
+        try {
+            const json = await requests[url];
+            element.textContent = formatAPIValue(
+                getAPIValue(json, element.dataset.path), element.dataset.column || ""
+            );
+        } catch (error) {
+            element.textContent = `Ошибка загрузки: ${error.message}`;
+        }
+    }
+}
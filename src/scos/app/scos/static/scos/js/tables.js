@@ -0,0 +1,2 @@
+loadAPITables();
+loadAPIValues();
@@ -4,6 +4,7 @@ URLs for the scos app.
 
 from django.urls import path
 
+from . import api
 from .views import (
     scos,
     course_all,
@@ -12,10 +13,15 @@ from .views import (
     course_send,
     course_update,
     user_courses,
-    user_course
+    user_course,
+    user_course_export,
+    profile,
+    registry_sync,
+    delivery,
+    delivery_retry,
 )
 
-app_name = 'cms.djangoapps.scos'
+app_name = 'scos'
 
 urlpatterns = [
     path("", scos, name="scos"),
@@ -27,4 +33,18 @@ urlpatterns = [
     path("course/<str:global_id>/", course, name="course"),
     path("user/courses/", user_courses, name="user_courses"),
     path("user/course/<str:global_id>/", user_course, name="user_course"),
+    path(
+        "user/course/<str:global_id>/export/<str:export_format>/",
+        user_course_export,
+        name="user_course_export"
+    ),
+    path("profile/<str:profile_id>/", profile, name="profile"),
+    path("registry/sync/", registry_sync, name="registry_sync"),
+    path("delivery/", delivery, name="delivery"),
+    path("delivery/retry/", delivery_retry, name="delivery_retry"),
+    path("api/courses/", api.courses, name="api_courses"),
+    path("api/courses/<str:global_id>/", api.course, name="api_course"),
+    path("api/courses/<str:global_id>/roster/", api.course_roster, name="api_course_roster"),
+    path("api/delivery/", api.delivery, name="api_delivery"),
+    path("api/delivery/courses/", api.delivery_courses, name="api_delivery_courses"),
 ]
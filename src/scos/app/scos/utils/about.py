@@ -0,0 +1,80 @@
+"""
+Виджет отзывов СЦОС на странице описания курса (course about) LMS.
+
+Идентификатор и версия курса СЦОС читаются только из кэша. Устаревшее
+значение (старше SCOS_WIDGET_FRESH секунд) отдается сразу, а обновление
+запускается в фоне задачей Celery. Поиск в кэше ограничен временем
+SCOS_WIDGET_TIME_BUDGET секунд, при его превышении страница отображается
+без виджета.
+"""
+
+import os
+import codecs
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Union
+import yaml
+
+from .cache import (
+    get_course_widget,
+    acquire_course_widget_refresh,
+    release_course_widget_refresh,
+)
+from .tasks import (
+    course_widget_refresh,
+)
+
+
+
+LOGGER = logging.getLogger(__name__)
+
+CONFIG_FILE = os.environ["CMS_CFG"]
+with codecs.open(CONFIG_FILE, encoding="utf-8") as f:
+    __config__ = yaml.safe_load(f)
+    SCOS_WIDGET_FRESH = __config__.get("SCOS_WIDGET_FRESH", 10 * 60)
+    SCOS_WIDGET_TIME_BUDGET = __config__.get("SCOS_WIDGET_TIME_BUDGET", 0.1)
+
+EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="scos-widget")
+
+
+
+def schedule_course_widget_refresh(course_key: str) -> None:
+    """
+    Запускает фоновое обновление виджета курса, если оно еще не запущено
+    """
+    if not acquire_course_widget_refresh(course_key):
+        return
+    try:
+        course_widget_refresh.apply_async(
+            args = (course_key,),
+            retry = False,
+        )
+    except Exception as exception:  # pylint: disable=broad-except
+        release_course_widget_refresh(course_key)
+        LOGGER.error(
+            "Не получилось добавить задачу обновления виджета СЦОС в очередь: %s",
+            exception,
+        )
+
+def lookup_course_widget(course_key: str) -> Union[dict, None]:
+    widget = get_course_widget(course_key)
+    if widget is None or time.time() - widget["updated"] > SCOS_WIDGET_FRESH:
+        schedule_course_widget_refresh(course_key)
+    if widget is None:
+        return None
+    return widget["course"]
+
+def get_scos_course_widget(course_key) -> Union[dict, None]:
+    """
+    Возвращает {"global_id": ..., "business_version": ...} курса СЦОС для
+виджета отзывов или None, если курс не размещен на СЦОС или данных еще нет
+    """
+    future = EXECUTOR.submit(lookup_course_widget, str(course_key))
+    try:
+        return future.result(timeout=SCOS_WIDGET_TIME_BUDGET)
+    except FutureTimeoutError:
+        LOGGER.warning(
+            "Превышено время получения виджета СЦОС курса %s", course_key
+        )
+        return None
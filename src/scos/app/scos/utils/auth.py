@@ -1,20 +1,98 @@
 """
 СЦОС OpenId backend
+
+Настройки OpenID провайдера (.well-known/openid-configuration) и ключи
+подписи (JWKS) СЦОС хранятся в общем кэше Django платформы
+SCOS_OIDC_CACHE_TIMEOUT секунд. За SCOS_OIDC_REFRESH_BEFORE секунд до
+истечения срока их заранее обновляет один процесс, остальные процессы
+используют сохраненные значения. Токен, подписанный ключом, которого нет в
+кэше (смена ключей СЦОС), запрашивает ключи сразу.
 """
 
 import os
 import codecs
+import logging
+import time
+from typing import Any, Callable, Union
 import yaml
 
+import jwt
+from jwt.utils import base64url_decode
+
+from django.core.cache import cache
+
 from social_core.backends.open_id_connect import OpenIdConnectAuth
 
 
 
+LOGGER = logging.getLogger(__name__)
+
 CONFIG_FILE = os.environ["LMS_CFG"]
 
 with codecs.open(CONFIG_FILE, encoding="utf-8") as f:
     __config__ = yaml.safe_load(f)
     SCOS_OIDC_ENDPOINT = __config__["SCOS_OIDC_ENDPOINT"]
+    SCOS_OIDC_CACHE_TIMEOUT = __config__.get("SCOS_OIDC_CACHE_TIMEOUT", 60 * 60)
+    SCOS_OIDC_REFRESH_BEFORE = __config__.get("SCOS_OIDC_REFRESH_BEFORE", 5 * 60)
+
+OIDC_CONFIG_KEY = "scos.oidc.config"
+OIDC_JWKS_KEY = "scos.oidc.jwks"
+# Обновление значения одним процессом, секунд
+REFRESH_LOCK_TIMEOUT = 30
+# Запрос ключей при неизвестном kid не чаще, секунд
+KID_REFETCH_INTERVAL = 10
+
+
+
+def fetch_shared(key: str, fetch: Callable[[], Any], entry: Union[dict, None]) -> Any:
+    """
+    Запрашивает значение и сохраняет в общий кэш. При ошибке запроса
+    используется сохраненное значение, если оно есть
+    """
+    try:
+        value = fetch()
+    except Exception as exception:  # pylint: disable=broad-except
+        if entry is None:
+            raise
+        LOGGER.warning("СЦОС. Не получилось обновить %s: %s", key, exception)
+        return entry["value"]
+    cache.set(
+        key,
+        {
+            "value": value,
+            "refresh_at": time.time() + SCOS_OIDC_CACHE_TIMEOUT - SCOS_OIDC_REFRESH_BEFORE,
+        },
+        SCOS_OIDC_CACHE_TIMEOUT,
+    )
+    return value
+
+def get_shared(key: str, fetch: Callable[[], Any]) -> Any:
+    """
+    Значение из общего кэша, близкое к истечению срока значение обновляет один
+    процесс
+    """
+    entry = cache.get(key)
+    if entry is not None and time.time() < entry["refresh_at"]:
+        return entry["value"]
+    refresh_key = f"{key}.refresh"
+    locked = cache.add(refresh_key, True, REFRESH_LOCK_TIMEOUT)
+    if not locked and entry is not None:
+        return entry["value"]
+    try:
+        return fetch_shared(key, fetch, entry)
+    finally:
+        if locked:
+            cache.delete(refresh_key)
+
+def refetch_shared(key: str, fetch: Callable[[], Any]) -> Any:
+    """
+    Запрашивает значение сразу, не чаще KID_REFETCH_INTERVAL секунд на все
+    процессы
+    """
+    entry = cache.get(key)
+    if entry is not None and not cache.add(f"{key}.refetch", True, KID_REFETCH_INTERVAL):
+        return entry["value"]
+    return fetch_shared(key, fetch, entry)
 
 
 
@@ -33,6 +111,42 @@ class SCOSAuthBackend(OpenIdConnectAuth):
     DEFAULT_SCOPE = ["openid", "email"]
     JWT_DECODE_OPTIONS = {"verify_at_hash": False}
 
+    def oidc_config(self):
+        """
+        Настройки OpenID провайдера СЦОС из общего кэша
+        """
+        return get_shared(
+            f"{OIDC_CONFIG_KEY}.{self.oidc_endpoint()}",
+            lambda: self.get_json(self.oidc_endpoint() + "/.well-known/openid-configuration"),
+        )
+
+    def get_jwks_keys(self):
+        """
+        Ключи подписи СЦОС из общего кэша
+        """
+        return get_shared(f"{OIDC_JWKS_KEY}.{self.jwks_uri()}", self.get_remote_jwks_keys)
+
+    def find_valid_key(self, id_token):
+        """
+        Ключ подписи id_token, неизвестный kid запрашивает ключи СЦОС сразу
+        """
+        kid = jwt.get_unverified_header(id_token).get("kid")
+        keys = self.get_jwks_keys()
+        if kid is not None and all(kid != key.get("kid") for key in keys):
+            keys = refetch_shared(f"{OIDC_JWKS_KEY}.{self.jwks_uri()}", self.get_remote_jwks_keys)
+        for key in keys:
+            if kid is None or kid == key.get("kid"):
+                if "alg" not in key:
+                    key["alg"] = self.setting("JWT_ALGORITHMS", self.JWT_ALGORITHMS)[0]
+                rsakey = jwt.PyJWK(key)
+                message, encoded_sig = id_token.rsplit(".", 1)
+                decoded_sig = base64url_decode(encoded_sig.encode("utf-8"))
+                if rsakey.Algorithm.verify(
+                    message.encode("utf-8"), rsakey.key, decoded_sig
+                ):
+                    return key
+        return None
+
     def get_user_details(self, response):
         """
         Возвращает информацию о пользователе СЦОС
@@ -0,0 +1,75 @@
+"""
+Кэширование данных СЦОС
+"""
+
+import os
+import codecs
+import hashlib
+import json
+import time
+from typing import Union
+import yaml
+
+from django.core.cache import cache
+
+
+
+CONFIG_FILE = os.environ["CMS_CFG"]
+with codecs.open(CONFIG_FILE, encoding="utf-8") as f:
+    __config__ = yaml.safe_load(f)
+    SCOS_WIDGET_TIMEOUT = __config__.get("SCOS_WIDGET_TIMEOUT", 24 * 60 * 60)
+
+COURSE_WIDGET_KEY = "scos.course_widget.{course_key}"
+COURSE_WIDGET_REFRESH_KEY = "scos.course_widget_refresh.{course_key}"
+COURSE_WIDGET_REFRESH_TIMEOUT = 60
+
+
+
+def cache_key(prefix: str, **params) -> str:
+    """
+    Возвращает ключ кэша для набора параметров
+    """
+    if not params:
+        return f"scos.{prefix}"
+    digest = hashlib.md5(
+        json.dumps(params, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    return f"scos.{prefix}.{digest}"
+
+def get_course_widget(course_key: str) -> Union[dict, None]:
+    """
+    Возвращает запись о виджете отзывов СЦОС курса:
+    {"course": {"global_id": ..., "business_version": ...} или None,
+    "updated": время обновления}
+    """
+    return cache.get(COURSE_WIDGET_KEY.format(course_key=course_key))
+
+def set_course_widget(course_key: str, scos_course: Union[dict, None]) -> None:
+    """
+    Сохраняет идентификатор и версию курса СЦОС для виджета отзывов,
+    scos_course = None - курс не размещен на СЦОС
+    """
+    if scos_course is not None:
+        scos_course = {
+            "global_id": scos_course["global_id"],
+            "business_version": scos_course["business_version"],
+        }
+    cache.set(
+        COURSE_WIDGET_KEY.format(course_key=course_key),
+        {"course": scos_course, "updated": time.time()},
+        SCOS_WIDGET_TIMEOUT,
+    )
+
+def acquire_course_widget_refresh(course_key: str) -> bool:
+    """
+    Блокировка обновления виджета курса, чтобы обновление запускалось
+    одно на все процессы
+    """
+    return cache.add(
+        COURSE_WIDGET_REFRESH_KEY.format(course_key=course_key),
+        True,
+        COURSE_WIDGET_REFRESH_TIMEOUT,
+    )
+
+def release_course_widget_refresh(course_key: str) -> None:
+    cache.delete(COURSE_WIDGET_REFRESH_KEY.format(course_key=course_key))
@@ -0,0 +1,117 @@
+"""
+Автоматический выключатель (circuit breaker) отправки событий обучения на
+СЦОС.
+
+После SCOS_CIRCUIT_FAILURES ошибок подряд, после которых запрос можно
+повторить (таймаут, ошибка соединения, ошибка СЦОС 5xx), выключатель
+размыкается: SCOS_CIRCUIT_COOLDOWN секунд события не отправляются на СЦОС и
+записываются с ошибкой, их можно отправить повторно со страницы отправки
+панели СЦОС. Затем один пробный запрос (полуоткрытое состояние) замыкает
+выключатель при успехе или снова размыкает при ошибке. Состояние хранится в
+кэше Django и общее для всех процессов.
+"""
+
+import os
+import codecs
+import time
+from datetime import datetime, timezone
+from typing import Union
+import yaml
+
+from django.core.cache import cache
+
+from .scos_http import (
+    SCOSError,
+)
+
+
+
+CONFIG_FILE = os.environ["CMS_CFG"]
+with codecs.open(CONFIG_FILE, encoding="utf-8") as f:
+    __config__ = yaml.safe_load(f)
+    SCOS_CIRCUIT_FAILURES = __config__.get("SCOS_CIRCUIT_FAILURES", 5)
+    SCOS_CIRCUIT_COOLDOWN = __config__.get("SCOS_CIRCUIT_COOLDOWN", 60)
+
+FAILURES_KEY = "scos.circuit.failures"
+OPEN_KEY = "scos.circuit.open_until"
+PROBE_KEY = "scos.circuit.probe"
+HEALTH_KEY = "scos.circuit.health"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+
+def circuit_state() -> str:
+    open_until = cache.get(OPEN_KEY)
+    if open_until is None:
+        return CLOSED
+    if time.time() < open_until:
+        return OPEN
+    return HALF_OPEN
+
+def allow_request() -> bool:
+    """
+    Можно ли отправить запрос на СЦОС: в полуоткрытом состоянии - один
+    пробный запрос на все процессы
+    """
+    state = circuit_state()
+    if state == CLOSED:
+        return True
+    if state == OPEN:
+        return False
+    return cache.add(PROBE_KEY, True, SCOS_CIRCUIT_COOLDOWN)
+
+def circuit_error() -> SCOSError:
+    return SCOSError(SCOSError.CIRCUIT, "отправка на СЦОС приостановлена после ошибок")
+
+def record_result(error: Union[SCOSError, None]) -> None:
+    """
+    Учитывает результат запроса к СЦОС: ошибки запроса (4xx) СЦОС не
+    размыкают выключатель
+    """
+    now = time.time()
+    health = cache.get(HEALTH_KEY) or {}
+    if error is None or not error.retryable:
+        health["success_at"] = now
+        cache.set(HEALTH_KEY, health, None)
+        if cache.get(FAILURES_KEY) or cache.get(OPEN_KEY) is not None:
+            cache.delete_many([FAILURES_KEY, OPEN_KEY, PROBE_KEY])
+        return
+    if error.kind == SCOSError.CIRCUIT:
+        return
+    health.update({"failure_at": now, "error": str(error)})
+    cache.set(HEALTH_KEY, health, None)
+    cache.add(FAILURES_KEY, 0, None)
+    try:
+        failures = cache.incr(FAILURES_KEY)
+    except ValueError:
+        failures = 1
+    if failures >= SCOS_CIRCUIT_FAILURES or circuit_state() == HALF_OPEN:
+        cache.set(OPEN_KEY, now + SCOS_CIRCUIT_COOLDOWN, None)
+        cache.delete(PROBE_KEY)
+
+def as_datetime(timestamp: Union[float, None]) -> Union[datetime, None]:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+def get_circuit_status() -> dict:
+    """
+    Состояние выключателя и доступность СЦОС для страницы отправки
+    """
+    health = cache.get(HEALTH_KEY) or {}
+    state = circuit_state()
+    return {
+        "state": state,
+        "failures": cache.get(FAILURES_KEY) or 0,
+        "open_until": as_datetime(cache.get(OPEN_KEY)) if state == OPEN else None,
+        "success_at": as_datetime(health.get("success_at")),
+        "failure_at": as_datetime(health.get("failure_at")),
+        "error": health.get("error", ""),
+        "healthy": state == CLOSED and (
+            health.get("failure_at") is None
+            or (health.get("success_at") or 0) > health["failure_at"]
+        ),
+    }
@@ -0,0 +1,145 @@
+"""
+Список онлайн-курсов СЦОС для панели СЦОС.
+
+Список читается из локальной копии реестра СЦОС (см. registry): фильтры,
+поиск по названию и сортировка выполняются запросом к базе платформы.
+JSON API читает список страницами по курсору (см. json_api).
+"""
+
+from typing import Dict, List, Tuple, Union
+
+from django.db.models import F, QuerySet, Value
+from django.db.models.functions import Lower, NullIf, Substr
+from django.http import QueryDict
+
+from .json_api import (
+    APIError,
+    decode_cursor,
+    encode_cursor,
+    keyset_after,
+)
+from .registry import (
+    courses_with_rightholders,
+    get_registry_platform,
+    get_registry_rightholders,
+)
+
+
+
+EXACT_FILTERS = (
+    "language",
+    "institution_id",
+)
+LOCAL_FILTERS = (
+    "title",
+    "started_from",
+    "started_to",
+)
+SORT_FIELDS = (
+    "title",
+    "institution_short_title",
+    "language",
+    "started_at",
+    "finished_at",
+)
+DEFAULT_SORT = "title"
+COURSE_FIELDS = (
+    "global_id",
+    "title",
+    "institution_id",
+    "language",
+    "started_at",
+    "finished_at",
+)
+# Поля списка курсов, кроме COURSE_FIELDS
+EXTRA_FIELDS = (
+    "institution_short_title",
+    "session_id",
+    "delivered_at",
+)
+
+
+
+def get_course_list_filters(query: QueryDict) -> Dict[str, str]:
+    """
+    Возвращает непустые фильтры списка курсов из параметров запроса
+    """
+    return {
+        option: query[option].strip()
+        for option in EXACT_FILTERS + LOCAL_FILTERS
+        if query.get(option, "").strip()
+    }
+
+def get_course_list_sort(query: QueryDict) -> str:
+    """
+    Возвращает поле сортировки списка курсов, "-" - обратный порядок
+    """
+    sort = query.get("sort", DEFAULT_SORT)
+    if sort.lstrip("-") not in SORT_FIELDS:
+        return DEFAULT_SORT
+    return sort
+
+def get_scos_rightholders() -> Union[Dict[str, dict], None]:
+    """
+    Словарь Правообладателей СЦОС, ключ - global_id
+    """
+    return get_registry_rightholders() or None
+
+def get_scos_platform() -> Union[dict, None]:
+    """
+    Платформа СЦОС с идентификатором SCOS_PARTNER_ID
+    """
+    return get_registry_platform()
+
+def get_course_list(filters: Dict[str, str], sort: str) -> QuerySet:
+    """
+    Возвращает отфильтрованный и отсортированный список онлайн-курсов
+    платформы на СЦОС
+    """
+    courses = courses_with_rightholders()
+    for option in EXACT_FILTERS:
+        if option in filters:
+            courses = courses.filter(**{option: filters[option]})
+    if "title" in filters:
+        courses = courses.filter(title__icontains=filters["title"])
+    if "started_from" in filters or "started_to" in filters:
+        courses = courses.annotate(started_date=Substr("started_at", 1, 10))
+    if "started_from" in filters:
+        courses = courses.filter(started_date__gte=filters["started_from"])
+    if "started_to" in filters:
+        courses = courses.exclude(started_at="").filter(
+            started_date__lte=filters["started_to"]
+        )
+    # Пустые значения - в конце списка, при обратном порядке - в начале
+    field = sort.lstrip("-")
+    courses = courses.annotate(sort_value=Lower(NullIf(F(field), Value(""))))
+    value = F("sort_value")
+    order = value.desc(nulls_first=True) if sort.startswith("-") else value.asc(nulls_last=True)
+    return courses.order_by(order, "global_id").values(
+        *COURSE_FIELDS, *EXTRA_FIELDS, "sort_value",
+    )
+
+def get_course_list_page(
+        filters: Dict[str, str],
+        sort: str,
+        cursor: Union[str, None] = None,
+        size: int = 50,
+) -> Tuple[List[dict], Union[str, None]]:
+    """
+    Страница списка онлайн-курсов после курсора и курсор следующей страницы
+    """
+    courses = get_course_list(filters, sort)
+    after = decode_cursor(cursor, 3)
+    if after is not None:
+        cursor_sort, value, global_id = after
+        if cursor_sort != sort:
+            raise APIError("курсор другой сортировки")
+        descending = sort.startswith("-")
+        courses = courses.filter(
+            keyset_after("sort_value", value, global_id, descending, nulls_last=not descending)
+        )
+    page = list(courses[:size + 1])
+    if len(page) > size:
+        last = page[size - 1]
+        return page[:size], encode_cursor([sort, last["sort_value"], last["global_id"]])
+    return page, None
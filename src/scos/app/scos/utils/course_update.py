@@ -0,0 +1,84 @@
+"""
+Автоматическое обновление онлайн-курсов на СЦОС.
+
+Снимок - последние отправленные на СЦОС параметры онлайн-курса (payload
+без "id"), хранится в SCOSCourseSnapshot по курсу платформы (course_key),
+поэтому снимок добавленного курса сохраняется до того, как СЦОС присвоит
+курсу global_id. Обновление отправляется только если параметры курса
+изменились относительно снимка, а у курса без снимка - относительно
+параметров курса в локальной копии реестра СЦОС.
+"""
+
+from typing import Dict, Iterable, Union
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from ..models import (
+    SCOSCourseSnapshot,
+)
+
+
+
+PUBLISH_TOKEN_KEY = "scos.course_publish_token.{course_key}"
+PUBLISH_TOKEN_TIMEOUT = 24 * 60 * 60
+
+
+
+def get_course_snapshot(course_key: str) -> Union[dict, None]:
+    """
+    Возвращает снимок последних отправленных на СЦОС параметров курса
+    """
+    snapshot = SCOSCourseSnapshot.objects.filter(session_id=str(course_key)).first()
+    return snapshot.data if snapshot is not None else None
+
+def set_course_snapshot(course_key: str, course_info: dict) -> None:
+    """
+    Сохраняет снимок отправленных на СЦОС параметров курса
+    """
+    snapshot = {
+        attr: value for attr, value in course_info.items() if attr != "id"
+    }
+    SCOSCourseSnapshot.objects.update_or_create(
+        session_id = str(course_key),
+        defaults = {"data": snapshot, "updated_at": timezone.now()},
+    )
+
+def get_course_snapshots(course_keys: Iterable[str]) -> Dict[str, dict]:
+    """
+    Снимки параметров курсов одним запросом, ключ - course_key
+    """
+    return dict(
+        SCOSCourseSnapshot.objects.filter(
+            session_id__in=[str(course_key) for course_key in course_keys],
+        ).values_list("session_id", "data")
+    )
+
+def course_info_diff(snapshot: dict, course_info: dict) -> dict:
+    """
+    Возвращает параметры курса, значения которых отличаются от снимка
+    """
+    return {
+        attr: value for attr, value in course_info.items()
+        if snapshot.get(attr) != value
+    }
+
+def set_course_publish_token(course_key: str) -> str:
+    """
+    Запоминает последнюю публикацию курса, возвращает её идентификатор
+    """
+    token = uuid4().hex
+    cache.set(
+        PUBLISH_TOKEN_KEY.format(course_key=course_key),
+        token,
+        timeout=PUBLISH_TOKEN_TIMEOUT,
+    )
+    return token
+
+def is_latest_course_publish(course_key: str, token: str) -> bool:
+    """
+    Проверяет что публикация курса последняя (более поздние публикации
+    заменяют отложенное обновление)
+    """
+    return cache.get(PUBLISH_TOKEN_KEY.format(course_key=course_key)) == token
@@ -0,0 +1,91 @@
+"""
+Бюджет времени запросов к API СЦОС.
+
+Вызывающий код задает крайний срок (deadline) для всех запросов к СЦОС,
+выполняемых внутри него: страницы панели СЦОС - SCOS_VIEW_DEADLINE секунд,
+задачи Celery - SCOS_TASK_DEADLINE секунд. Крайний срок хранится в
+contextvars и действует во вложенных вызовах, вложенный бюджет не продлевает
+внешний. Таймауты соединения (SCOS_CONNECT_TIMEOUT) и чтения
+(SCOS_READ_TIMEOUT) каждого запроса ограничиваются оставшимся временем, после
+крайнего срока запрос к СЦОС не выполняется (DeadlineExceeded).
+"""
+
+import os
+import codecs
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Iterator, Tuple, Union
+import yaml
+
+import requests
+
+
+
+CONFIG_FILE = os.environ["CMS_CFG"]
+with codecs.open(CONFIG_FILE, encoding="utf-8") as f:
+    __config__ = yaml.safe_load(f)
+    SCOS_CONNECT_TIMEOUT = __config__.get("SCOS_CONNECT_TIMEOUT", 3.05)
+    SCOS_READ_TIMEOUT = __config__.get("SCOS_READ_TIMEOUT", 5.0)
+    SCOS_VIEW_DEADLINE = __config__.get("SCOS_VIEW_DEADLINE", 10.0)
+    SCOS_TASK_DEADLINE = __config__.get("SCOS_TASK_DEADLINE", 60.0)
+
+# Крайний срок запросов к СЦОС (time.monotonic), None - без ограничения
+DEADLINE: ContextVar[Union[float, None]] = ContextVar("scos_deadline", default=None)
+
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """
+    Бюджет времени исчерпан, запрос к СЦОС не выполнялся
+    """
+
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """
+    Крайний срок запросов к СЦОС через seconds секунд, но не позже внешнего
+    """
+    current = DEADLINE.get()
+    value = time.monotonic() + seconds
+    if current is not None:
+        value = min(value, current)
+    token = DEADLINE.set(value)
+    try:
+        yield
+    finally:
+        DEADLINE.reset(token)
+
+def with_deadline(seconds: float) -> Callable:
+    """
+    Декоратор: запросы к СЦОС внутри функции выполняются с бюджетом seconds
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with deadline(seconds):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def remaining() -> Union[float, None]:
+    """
+    Оставшееся время бюджета, секунд, None - без ограничения
+    """
+    current = DEADLINE.get()
+    if current is None:
+        return None
+    return current - time.monotonic()
+
+def request_timeout() -> Tuple[float, float]:
+    """
+    (таймаут соединения, таймаут чтения) запроса к СЦОС в пределах бюджета
+    """
+    left = remaining()
+    if left is None:
+        return SCOS_CONNECT_TIMEOUT, SCOS_READ_TIMEOUT
+    if left <= 0:
+        raise DeadlineExceeded("Бюджет времени запросов к СЦОС исчерпан")
+    return min(SCOS_CONNECT_TIMEOUT, left), min(SCOS_READ_TIMEOUT, left)
@@ -0,0 +1,469 @@
+"""
+Асинхронный воркер отправки событий обучения на СЦОС.
+
+Отправка события на СЦОС - в основном ожидание ответа сети, процесс Celery
+prefork ожидает один запрос. При SCOS_ASYNC_DELIVERY: true задачи событий
+обучения (user_enrolled, user_unenrolled, subsection_grade, course_grade)
+отправляются в очередь SCOS_DELIVERY_QUEUE, которую читает воркер
+./manage.py lms scos_delivery_worker.
+
+Воркер выполняет запросы к СЦОС в цикле событий asyncio (aiohttp): до
+SCOS_ASYNC_CONCURRENCY запросов одновременно в одном процессе. Запросы к базе
+и кэшу платформы (get_user_scos_uid, find_registry_course, get_blocks)
+выполняются в пуле из SCOS_ASYNC_PREPARE_THREADS потоков. Сообщение задачи
+подтверждается брокеру после отправки события, результат сохраняется в бэкенд
+результатов Celery, как у задачи Celery. Упорядочивание событий слушателя
+(см. ordering), журнал отправки и выключатель (см. delivery_records,
+circuit), трассировка и запись трафика выполняются так же, как в задачах
+Celery.
+
+Перед повторным подключением к брокеру после ошибки обработчики сообщений
+прежнего соединения завершаются: ожидание SHUTDOWN_TIMEOUT секунд, затем
+отмена. Их сообщения брокер доставит повторно.
+"""
+
+import os
+import asyncio
+import codecs
+import contextvars
+import logging
+import queue
+import signal
+import socket
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from datetime import datetime, timezone
+from typing import Any, Callable, Union
+from urllib.parse import urlsplit
+import yaml
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+import requests
+
+from celery import current_app, states
+from celery.backends.base import DisabledBackend
+
+from django.db import close_old_connections
+
+from .circuit import (
+    allow_request,
+    circuit_error,
+    record_result,
+)
+from .deadline import (
+    SCOS_CONNECT_TIMEOUT,
+    SCOS_READ_TIMEOUT,
+    SCOS_TASK_DEADLINE,
+    deadline,
+)
+from .delivery_records import (
+    finish_delivery,
+    start_delivery,
+)
+from .ordering import (
+    PARTITION_HEADER,
+    SEQUENCE_HEADER,
+    SEQUENCED_AT_HEADER,
+    is_turn,
+    mark_done,
+    retry_delay,
+)
+from .profiling import (
+    record_http,
+)
+from .publisher import (
+    SCOS_DELIVERY_QUEUE,
+)
+from .recorder import (
+    record_request,
+)
+from .scos_api import (
+    SCOS_WRITE_REQUESTS,
+    scos_write_request,
+    scos_write_response,
+)
+from .scos_http import (
+    SCOSError,
+    scos_json,
+)
+from .shadow import (
+    mirror_request,
+)
+from .tasks import (
+    EVENT_PLANS,
+    schedule_circuit_retry,
+)
+from .tracing import (
+    ENQUEUED_HEADER,
+    TRACE_HEADER,
+    span,
+)
+
+
+
+LOGGER = logging.getLogger(__name__)
+
+CONFIG_FILE = os.environ["CMS_CFG"]
+with codecs.open(CONFIG_FILE, encoding="utf-8") as f:
+    __config__ = yaml.safe_load(f)
+    SCOS_ASYNC_CONCURRENCY = __config__.get("SCOS_ASYNC_CONCURRENCY", 200)
+    SCOS_ASYNC_PREPARE_THREADS = __config__.get("SCOS_ASYNC_PREPARE_THREADS", 8)
+
+# Интервал подтверждения сообщений брокеру, если новых сообщений нет
+DRAIN_TIMEOUT = 0.1
+# Ожидание отправляемых событий при завершении воркера
+SHUTDOWN_TIMEOUT = 30
+RECONNECT_DELAY = 5
+
+# Ответ aiohttp для записи трафика (recorder.record_request)
+RecordedResponse = namedtuple("RecordedResponse", ["status_code", "headers", "content"])
+
+
+
+class DeliveryWorker:
+    """
+    Читает задачи событий обучения из очереди SCOS_DELIVERY_QUEUE и
+    отправляет события на СЦОС в цикле событий asyncio
+    """
+
+    def __init__(
+        self,
+        concurrency: int = SCOS_ASYNC_CONCURRENCY,
+        prepare_threads: int = SCOS_ASYNC_PREPARE_THREADS,
+    ) -> None:
+        self.concurrency = concurrency
+        self.prepare_threads = prepare_threads
+        # Сообщения с ожиданием очереди слушателя тоже занимают место
+        self.prefetch = concurrency * 2
+        self.accepting = threading.Event()
+        self.acks: queue.SimpleQueue = queue.SimpleQueue()
+        self.in_flight = 0
+        # Обработчики сообщений текущего соединения (только поток чтения очереди)
+        self.handlers: set = set()
+        self.stats: Counter = Counter()
+        self.loop: Union[asyncio.AbstractEventLoop, None] = None
+        self.stopping: Union[asyncio.Event, None] = None
+        self.semaphore: Union[asyncio.Semaphore, None] = None
+        self.executor: Union[ThreadPoolExecutor, None] = None
+        self.session = None
+
+    def run(self) -> None:
+        if aiohttp is None:
+            raise RuntimeError("Для асинхронного воркера отправки СЦОС установите aiohttp")
+        asyncio.run(self.main())
+
+    def stop(self) -> None:
+        if self.stopping is not None and not self.stopping.is_set():
+            LOGGER.info("СЦОС. Завершение воркера отправки, событий в обработке: %s", self.in_flight)
+            self.stopping.set()
+
+    async def main(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            self.loop.add_signal_handler(signum, self.stop)
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.executor = ThreadPoolExecutor(
+            self.prepare_threads, thread_name_prefix="scos-prepare"
+        )
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(
+            sock_connect = SCOS_CONNECT_TIMEOUT,
+            sock_read = SCOS_READ_TIMEOUT,
+        )
+        try:
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                self.session = session
+                self.accepting.set()
+                consumer = threading.Thread(
+                    target=self.consume, name="scos-delivery-consumer", daemon=True
+                )
+                consumer.start()
+                LOGGER.info(
+                    "СЦОС. Воркер отправки запущен: очередь %s, запросов %s",
+                    SCOS_DELIVERY_QUEUE,
+                    self.concurrency,
+                )
+                await self.stopping.wait()
+                self.accepting.clear()
+                await self.loop.run_in_executor(None, consumer.join)
+        finally:
+            self.executor.shutdown(wait=True)
+            LOGGER.info("СЦОС. Воркер отправки остановлен: %s", dict(self.stats))
+
+    def consume(self) -> None:
+        """
+        Поток чтения очереди: kombu не допускает обращения к соединению из
+        нескольких потоков, поэтому сообщения подтверждаются в этом потоке
+        """
+        delivery_queue = current_app.amqp.queues[SCOS_DELIVERY_QUEUE]
+        while self.accepting.is_set():
+            try:
+                with current_app.connection_for_read() as connection:
+                    with connection.Consumer(
+                        delivery_queue,
+                        callbacks = [self.on_message],
+                        accept = current_app.conf.accept_content,
+                        prefetch_count = self.prefetch,
+                    ) as consumer:
+                        while self.accepting.is_set():
+                            self.process_acks()
+                            try:
+                                connection.drain_events(timeout=DRAIN_TIMEOUT)
+                            except socket.timeout:
+                                pass
+                        consumer.cancel()
+                        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+                        while self.in_flight and time.monotonic() < deadline:
+                            self.process_acks()
+                            time.sleep(DRAIN_TIMEOUT)
+                        self.process_acks()
+            except Exception as exception:  # pylint: disable=broad-except
+                # Неподтвержденные сообщения брокер доставит повторно
+                LOGGER.error("СЦОС. Ошибка чтения очереди %s: %s", SCOS_DELIVERY_QUEUE, exception)
+                self.drain_handlers()
+                time.sleep(RECONNECT_DELAY)
+
+    def drain_handlers(self) -> None:
+        """
+        Завершает обработчики сообщений прежнего соединения перед повторным
+        подключением: ожидает их SHUTDOWN_TIMEOUT секунд, оставшиеся
+        отменяются. Подтверждения прежнего соединения отбрасываются
+        """
+        _, pending = wait_futures(self.handlers, timeout=SHUTDOWN_TIMEOUT)
+        for handler in pending:
+            handler.cancel()
+        if pending:
+            LOGGER.warning(
+                "СЦОС. Отменена обработка %s сообщений, они будут доставлены повторно",
+                len(pending),
+            )
+        self.handlers = set()
+        self.in_flight = 0
+        self.acks = queue.SimpleQueue()
+
+    def on_message(self, body: Any, message) -> None:
+        if not self.accepting.is_set():
+            message.requeue()
+            return
+        self.in_flight += 1
+        self.handlers = {handler for handler in self.handlers if not handler.done()}
+        self.handlers.add(
+            asyncio.run_coroutine_threadsafe(self.handle(body, message, self.acks), self.loop)
+        )
+
+    def process_acks(self) -> None:
+        while True:
+            try:
+                message, acknowledge = self.acks.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                if acknowledge:
+                    message.ack()
+                else:
+                    message.reject(requeue=False)
+            finally:
+                self.in_flight -= 1
+
+    async def run_sync(self, function: Callable, *args) -> Any:
+        """
+        Выполняет функцию в пуле потоков с контекстом трассировки
+        """
+        context = contextvars.copy_context()
+        return await self.loop.run_in_executor(self.executor, context.run, function, *args)
+
+    async def handle(self, body: Any, message, acks: queue.SimpleQueue) -> None:
+        """
+        Обработка сообщения, подтверждение передается в очередь acks соединения,
+        из которого сообщение получено
+        """
+        headers = message.headers or {}
+        name = headers.get("task")
+        task_id = headers.get("id")
+        plan = EVENT_PLANS.get(name)
+        if plan is None or not isinstance(body, (list, tuple)):
+            # Сообщение не задачи события обучения или протокол Celery 1
+            LOGGER.error("СЦОС. Воркер отправки не выполняет задачу %s (%s)", name, task_id)
+            self.stats["rejected"] += 1
+            acks.put((message, False))
+            return
+        acknowledge = True
+        try:
+            args, kwargs, _ = body
+            await self.wait_eta(headers.get("eta"))
+            with span(
+                f"task {name.rsplit('.', 1)[-1]}",
+                traceparent = headers.get(TRACE_HEADER),
+                task_id = task_id,
+                retries = headers.get("retries", 0),
+                worker = "async",
+            ) as current:
+                enqueued = headers.get(ENQUEUED_HEADER)
+                if current is not None and enqueued:
+                    current.set_attribute("queue_ms", round((current.start - enqueued) * 1000, 3))
+                await self.execute(name, task_id, plan, args, kwargs, headers)
+        except Exception as exception:  # pylint: disable=broad-except
+            LOGGER.error(
+                "СЦОС. Воркер отправки не выполняет задачу %s (%s): %s", name, task_id, exception,
+            )
+            self.stats["rejected"] += 1
+            acknowledge = False
+        finally:
+            acks.put((message, acknowledge))
+
+    async def wait_eta(self, eta: Union[str, None]) -> None:
+        if not eta:
+            return
+        moment = datetime.fromisoformat(eta)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        delay = (moment - datetime.now(timezone.utc)).total_seconds()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def execute(
+        self,
+        name: str,
+        task_id: str,
+        plan: Callable,
+        args: list,
+        kwargs: dict,
+        headers: dict,
+    ) -> None:
+        partition = headers.get(PARTITION_HEADER)
+        sequence = headers.get(SEQUENCE_HEADER)
+        ordered = partition is not None and sequence is not None
+        if ordered:
+            attempt = 0
+            while not await self.run_sync(
+                is_turn, partition, sequence, headers.get(SEQUENCED_AT_HEADER)
+            ):
+                self.stats["waited"] += 1
+                await asyncio.sleep(retry_delay(attempt))
+                attempt += 1
+        cancelled = False
+        try:
+            write = await self.run_sync(prepare, plan, args, kwargs)
+            if write is not None:
+                kind, item = write
+                delivery = await self.run_sync(start_delivery, kind, item, args[0]["timestamp"])
+                if await self.run_sync(allow_request):
+                    async with self.semaphore:
+                        error = await self.write(kind, item)
+                    await self.run_sync(record_result, error)
+                else:
+                    error = circuit_error()
+                await self.run_sync(finish_delivery, delivery, error)
+                if error is not None and error.kind == SCOSError.CIRCUIT:
+                    await self.run_sync(schedule_circuit_retry)
+        except asyncio.CancelledError:
+            # Сообщение будет доставлено повторно, задача не отмечается выполненной
+            cancelled = True
+            raise
+        except Exception as exception:  # pylint: disable=broad-except
+            LOGGER.exception("СЦОС. Задача %s (%s) завершилась с ошибкой: %s", name, task_id, exception)
+            self.stats["failed"] += 1
+            await self.run_sync(store_result, name, task_id, exception, states.FAILURE)
+        else:
+            self.stats["succeeded"] += 1
+            await self.run_sync(store_result, name, task_id, None, states.SUCCESS)
+        finally:
+            if ordered and not cancelled:
+                await self.run_sync(mark_done, partition, sequence)
+
+    async def write(self, kind: str, item: dict) -> Union[SCOSError, None]:
+        """
+        Асинхронный вариант delivery_records.send_delivery: отправляет событие
+        обучения на СЦОС, возвращает ошибку отправки
+        """
+        request = scos_write_request(kind, item)
+        try:
+            scos_write_response(kind, response_json(await self.request(**request)))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exception:
+            error = delivery_error(exception)
+        except SCOSError as exception:
+            error = exception
+        else:
+            return None
+        LOGGER.warning("СЦОС api. %s: %s", SCOS_WRITE_REQUESTS[kind][2], error)
+        return error
+
+    async def request(self, method: str, url: str, **kwargs) -> RecordedResponse:
+        """
+        Асинхронный вариант scos_http.scos_request
+        """
+        with span("http", method=method, path=urlsplit(url).path) as current:
+            started = time.time()
+            start = time.perf_counter()
+            try:
+                async with self.session.request(method, url, **kwargs) as response:
+                    content = await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exception:
+                elapsed = time.perf_counter() - start
+                record_request(method, url, kwargs, started, elapsed, exception=exception)
+                record_http(method, url, elapsed, exception=exception)
+                mirror_request(method, url, kwargs, started, elapsed, exception=exception)
+                raise
+            elapsed = time.perf_counter() - start
+            recorded = RecordedResponse(response.status, response.headers, content)
+            record_request(method, url, kwargs, started, elapsed, response=recorded)
+            record_http(method, url, elapsed, status=response.status)
+            mirror_request(
+                method, url, kwargs, started, elapsed, status=response.status, content=content,
+            )
+            if current is not None:
+                current.set_attribute("status", response.status)
+            return recorded
+
+
+
+def prepare(plan: Callable, args: list, kwargs: dict) -> Any:
+    """
+    Подготовка запроса к СЦОС в потоке пула: соединения с базой закрываются,
+    как после задачи Celery
+    """
+    close_old_connections()
+    try:
+        with deadline(SCOS_TASK_DEADLINE):
+            return plan(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+def response_json(recorded: RecordedResponse) -> Any:
+    """
+    Ответ СЦОС (JSON), ошибки - SCOSError, как scos_http.scos_json
+    """
+    response = requests.Response()
+    response.status_code = recorded.status_code
+    response._content = recorded.content # pylint: disable=protected-access
+    return scos_json(response)
+
+def delivery_error(exception: Exception) -> SCOSError:
+    """
+    Классификация ошибки aiohttp, как SCOSError.from_exception
+    """
+    if isinstance(exception, asyncio.TimeoutError):
+        return SCOSError(SCOSError.TIMEOUT, str(exception) or "timeout")
+    if isinstance(exception, aiohttp.ClientConnectionError):
+        return SCOSError(SCOSError.CONNECTION, str(exception))
+    return SCOSError(SCOSError.CLIENT, str(exception))
+
+def store_result(name: str, task_id: str, result: Any, state: str) -> None:
+    """
+    Сохраняет результат задачи в бэкенд результатов Celery
+    """
+    backend = current_app.backend
+    task = current_app.tasks.get(name)
+    if not task_id or isinstance(backend, DisabledBackend) or (task and task.ignore_result):
+        return
+    try:
+        backend.store_result(task_id, result, state)
+    except Exception as exception:  # pylint: disable=broad-except
+        LOGGER.warning("СЦОС. Не получилось сохранить результат задачи %s: %s", task_id, exception)
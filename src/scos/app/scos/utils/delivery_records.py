@@ -0,0 +1,408 @@
+"""
+Журнал и сводные показатели отправки событий обучения на СЦОС.
+
+Каждая отправка записывается в SCOSDelivery: запись создается со статусом
+pending перед запросом к СЦОС и получает статус sent или failed по его
+результату. Одновременно изменяются сводные счетчики SCOSDeliveryCounter
+(число записей в каждом статусе и гистограмма задержки отправки от события
+до ответа СЦОС по видам запросов) и время последней успешной отправки курса
+SCOSCourse.delivered_at. Страница отправки панели СЦОС и JSON API читают
+только счетчики, а не журнал.
+
+Каждый счетчик разделен на COUNTER_SHARDS строк: отправка изменяет случайную
+строку, значение счетчика - сумма строк, поэтому параллельные отправки не
+ожидают блокировку одной строки. Время последней успешной отправки курса
+обновляется не чаще одного раза в DELIVERED_AT_INTERVAL секунд.
+
+Записи с ошибкой можно отправить повторно: задача retry_failed читает их
+страницами по идентификатору (retry_failed_deliveries), записи страницы
+снова получают статус pending и отправляются задачами retry_deliveries.
+События, не отправленные из-за разомкнутого выключателя (SCOSError.CIRCUIT),
+отправляются повторно автоматически через SCOS_CIRCUIT_COOLDOWN секунд.
+
+Обслуживание журнала (maintain_deliveries, не чаще одного раза в
+MAINTENANCE_INTERVAL секунд): отправленные записи старше
+SCOS_DELIVERY_RETENTION_DAYS дней удаляются (сводные счетчики не
+изменяются), записи в статусе pending дольше SCOS_DELIVERY_PENDING_TIMEOUT
+секунд (процесс отправки завершился до ответа СЦОС) получают статус failed.
+"""
+
+import os
+import codecs
+import logging
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, List, Tuple, Union
+import yaml
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from ..models import (
+    SCOSCourse,
+    SCOSDelivery,
+    SCOSDeliveryCounter,
+)
+from .circuit import (
+    CLOSED,
+    SCOS_CIRCUIT_COOLDOWN,
+    allow_request,
+    circuit_error,
+    circuit_state,
+    record_result,
+)
+from .json_api import (
+    decode_cursor,
+    encode_cursor,
+    keyset_after,
+)
+from .scos_api import (
+    SCOS_WRITE_REQUESTS,
+    scos_fetch,
+    scos_write_request,
+    scos_write_response,
+)
+from .scos_http import (
+    SCOSError,
+)
+
+
+
+LOGGER = logging.getLogger(__name__)
+
+CONFIG_FILE = os.environ["CMS_CFG"]
+with codecs.open(CONFIG_FILE, encoding="utf-8") as f:
+    __config__ = yaml.safe_load(f)
+    SCOS_DELIVERY_RETENTION_DAYS = __config__.get("SCOS_DELIVERY_RETENTION_DAYS", 30)
+    SCOS_DELIVERY_PENDING_TIMEOUT = __config__.get("SCOS_DELIVERY_PENDING_TIMEOUT", 3600)
+
+# Верхние границы интервалов гистограммы задержки отправки, секунд
+LAG_BUCKETS = (1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 6 * 3600, 24 * 3600)
+LAG_INF = "lag_inf"
+STATUSES = (SCOSDelivery.PENDING, SCOSDelivery.SENT, SCOSDelivery.FAILED)
+# Записей в одной задаче повторной отправки
+RETRY_BATCH_SIZE = 100
+# Записей в одной задаче чтения записей с ошибкой для повторной отправки
+RETRY_PAGE_SIZE = 2000
+# Строк каждого сводного счетчика
+COUNTER_SHARDS = 16
+# Интервал обновления времени последней успешной отправки курса, секунд
+DELIVERED_AT_INTERVAL = 60
+# Интервал обслуживания журнала, секунд
+MAINTENANCE_INTERVAL = 15 * 60
+# Записей, удаляемых или изменяемых одним запросом при обслуживании журнала
+MAINTENANCE_BATCH_SIZE = 1000
+# Вид ошибки записи, отправка которой не завершилась
+STALE = "stale"
+MAINTENANCE_KEY = "scos.delivery.maintenance"
+CIRCUIT_RETRY_KEY = "scos.delivery.circuit_retry"
+
+
+
+def lag_metric(seconds: float) -> str:
+    for bucket in LAG_BUCKETS:
+        if seconds <= bucket:
+            return f"lag_le_{bucket}"
+    return LAG_INF
+
+def bump(kind: str, metric: str, value: int = 1) -> None:
+    """
+    Изменяет сводный счетчик на value (случайную строку счетчика)
+    """
+    shard = random.randrange(COUNTER_SHARDS)
+    counter = SCOSDeliveryCounter.objects.filter(kind=kind, metric=metric, shard=shard)
+    if counter.update(value=F("value") + value):
+        return
+    try:
+        with transaction.atomic():
+            SCOSDeliveryCounter.objects.create(
+                kind=kind, metric=metric, shard=shard, value=value,
+            )
+    except IntegrityError:
+        # Строка счетчика создана другим процессом
+        counter.update(value=F("value") + value)
+
+def touch_delivered_at(global_id: str, now: datetime) -> None:
+    """
+    Время последней успешной отправки курса, не чаще одного раза в
+    DELIVERED_AT_INTERVAL секунд
+    """
+    if cache.add(f"scos.delivered_at.{global_id}", True, DELIVERED_AT_INTERVAL):
+        SCOSCourse.objects.filter(global_id=global_id).update(delivered_at=now)
+
+def start_delivery(kind: str, item: dict, event_at: datetime) -> SCOSDelivery:
+    """
+    Записывает отправку события обучения со статусом pending
+    """
+    if timezone.is_naive(event_at):
+        event_at = timezone.make_aware(event_at, dt_timezone.utc)
+    with transaction.atomic():
+        delivery = SCOSDelivery.objects.create(
+            kind = kind,
+            course_id = str(item.get("course_id") or ""),
+            item = item,
+            event_at = event_at,
+            created_at = timezone.now(),
+            queued_at = timezone.now(),
+        )
+        bump(kind, SCOSDelivery.PENDING)
+    return delivery
+
+def finish_delivery(delivery: SCOSDelivery, error: Union[SCOSError, None]) -> None:
+    """
+    Записывает результат отправки: статус, счетчики, время последней
+    успешной отправки курса
+    """
+    now = timezone.now()
+    delivery.attempts += 1
+    if error is None:
+        delivery.status = SCOSDelivery.SENT
+        delivery.sent_at = now
+        delivery.error_kind = ""
+        delivery.error = ""
+    else:
+        delivery.status = SCOSDelivery.FAILED
+        delivery.error_kind = error.kind
+        delivery.error = str(error)
+    with transaction.atomic():
+        delivery.save(update_fields=["status", "sent_at", "attempts", "error_kind", "error"])
+        bump(delivery.kind, SCOSDelivery.PENDING, -1)
+        bump(delivery.kind, delivery.status)
+        if error is None:
+            bump(delivery.kind, lag_metric((now - delivery.event_at).total_seconds()))
+    if error is None and delivery.course_id:
+        touch_delivered_at(delivery.course_id, now)
+
+def send_delivery(delivery: SCOSDelivery) -> Union[SCOSError, None]:
+    """
+    Отправляет записанное событие обучения на СЦОС, если выключатель
+    отправки замкнут (см. circuit)
+    """
+    if allow_request():
+        try:
+            scos_write_response(
+                delivery.kind,
+                scos_fetch(**scos_write_request(delivery.kind, delivery.item)),
+            )
+            error = None
+        except SCOSError as exception:
+            LOGGER.warning("СЦОС api. %s: %s", SCOS_WRITE_REQUESTS[delivery.kind][2], exception)
+            error = exception
+        record_result(error)
+    else:
+        error = circuit_error()
+    finish_delivery(delivery, error)
+    return error
+
+def deliver_event(kind: str, item: dict, event_at: datetime) -> Union[SCOSError, None]:
+    """
+    Записывает и отправляет событие обучения на СЦОС
+    """
+    return send_delivery(start_delivery(kind, item, event_at))
+
+def retry_failed_deliveries(
+        kind: Union[str, None] = None,
+        after_id: int = 0,
+        error_kind: Union[str, None] = None,
+        size: int = RETRY_PAGE_SIZE,
+) -> Tuple[List[List[int]], Union[int, None]]:
+    """
+    Возвращает в статус pending страницу записей с ошибкой (вида error_kind)
+    после записи after_id (по возрастанию идентификатора), возвращает
+    идентификаторы записей пачками для задач retry_deliveries и
+    идентификатор, после которого читается следующая страница (None -
+    страница последняя)
+    """
+    failed = SCOSDelivery.objects.filter(status=SCOSDelivery.FAILED, id__gt=after_id)
+    if kind:
+        failed = failed.filter(kind=kind)
+    if error_kind:
+        failed = failed.filter(error_kind=error_kind)
+    ids = list(failed.order_by("id").values_list("id", flat=True)[:size])
+    batches = []
+    for start in range(0, len(ids), RETRY_BATCH_SIZE):
+        batch = ids[start:start + RETRY_BATCH_SIZE]
+        with transaction.atomic():
+            counts: Dict[str, int] = {}
+            rows = SCOSDelivery.objects.select_for_update().filter(
+                id__in=batch, status=SCOSDelivery.FAILED,
+            )
+            batch = []
+            for delivery_id, delivery_kind in rows.values_list("id", "kind"):
+                batch.append(delivery_id)
+                counts[delivery_kind] = counts.get(delivery_kind, 0) + 1
+            SCOSDelivery.objects.filter(id__in=batch).update(
+                status=SCOSDelivery.PENDING, queued_at=timezone.now(),
+            )
+            for delivery_kind, count in counts.items():
+                bump(delivery_kind, SCOSDelivery.FAILED, -count)
+                bump(delivery_kind, SCOSDelivery.PENDING, count)
+        if batch:
+            batches.append(batch)
+    return batches, ids[-1] if len(ids) == size else None
+
+def get_failed_count(kind: Union[str, None] = None) -> int:
+    """
+    Число записей с ошибкой по сводным счетчикам
+    """
+    counters = SCOSDeliveryCounter.objects.filter(metric=SCOSDelivery.FAILED)
+    if kind:
+        counters = counters.filter(kind=kind)
+    return counters.aggregate(total=Sum("value"))["total"] or 0
+
+def resend_deliveries(ids: Iterable[int]) -> bool:
+    """
+    Повторная отправка записей со статусом pending, True - часть записей не
+    отправлена из-за разомкнутого выключателя
+    """
+    refused = False
+    for delivery in SCOSDelivery.objects.filter(id__in=list(ids), status=SCOSDelivery.PENDING):
+        error = send_delivery(delivery)
+        refused = refused or (error is not None and error.kind == SCOSError.CIRCUIT)
+    return refused
+
+def acquire_circuit_retry() -> bool:
+    """
+    Одна повторная отправка событий, не отправленных из-за разомкнутого
+    выключателя, за SCOS_CIRCUIT_COOLDOWN секунд
+    """
+    return cache.add(CIRCUIT_RETRY_KEY, True, SCOS_CIRCUIT_COOLDOWN)
+
+def has_circuit_failures() -> bool:
+    """
+    Выключатель замкнут и есть записи, не отправленные из-за разомкнутого
+    выключателя
+    """
+    return circuit_state() == CLOSED and SCOSDelivery.objects.filter(
+        status=SCOSDelivery.FAILED, error_kind=SCOSError.CIRCUIT,
+    ).exists()
+
+def prune_deliveries() -> int:
+    """
+    Удаляет отправленные записи старше SCOS_DELIVERY_RETENTION_DAYS дней,
+    возвращает число записей
+    """
+    if not SCOS_DELIVERY_RETENTION_DAYS:
+        return 0
+    expired = SCOSDelivery.objects.filter(
+        status = SCOSDelivery.SENT,
+        sent_at__lt = timezone.now() - timedelta(days=SCOS_DELIVERY_RETENTION_DAYS),
+    )
+    count = 0
+    while True:
+        ids = list(expired.values_list("id", flat=True)[:MAINTENANCE_BATCH_SIZE])
+        if not ids:
+            return count
+        count += SCOSDelivery.objects.filter(id__in=ids).delete()[0]
+
+def sweep_pending_deliveries() -> int:
+    """
+    Записи в статусе pending дольше SCOS_DELIVERY_PENDING_TIMEOUT секунд
+    получают статус failed, возвращает число записей
+    """
+    stale = SCOSDelivery.objects.filter(
+        status = SCOSDelivery.PENDING,
+        queued_at__lt = timezone.now() - timedelta(seconds=SCOS_DELIVERY_PENDING_TIMEOUT),
+    )
+    count = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                stale.select_for_update().values_list("id", "kind")[:MAINTENANCE_BATCH_SIZE]
+            )
+            if not rows:
+                return count
+            counts: Dict[str, int] = {}
+            for _, delivery_kind in rows:
+                counts[delivery_kind] = counts.get(delivery_kind, 0) + 1
+            SCOSDelivery.objects.filter(id__in=[row[0] for row in rows]).update(
+                status = SCOSDelivery.FAILED,
+                error_kind = STALE,
+                error = "отправка не завершена",
+            )
+            for delivery_kind, kind_count in counts.items():
+                bump(delivery_kind, SCOSDelivery.PENDING, -kind_count)
+                bump(delivery_kind, SCOSDelivery.FAILED, kind_count)
+        count += len(rows)
+
+def maintain_deliveries() -> dict:
+    """
+    Обслуживание журнала: удаление старых отправленных записей и
+    незавершенных отправок
+    """
+    stats = {
+        "pruned": prune_deliveries(),
+        "stale": sweep_pending_deliveries(),
+    }
+    LOGGER.info("СЦОС. Обслуживание журнала отправки событий: %s", stats)
+    return stats
+
+def acquire_delivery_maintenance() -> bool:
+    """
+    Обслуживание журнала не чаще одного раза в MAINTENANCE_INTERVAL секунд
+    """
+    return cache.add(MAINTENANCE_KEY, True, MAINTENANCE_INTERVAL)
+
+def lag_percentile(histogram: Dict[str, int], quantile: float) -> Union[int, None]:
+    """
+    Верхняя граница интервала гистограммы, в который попадает квантиль
+    задержки, секунд; None - задержка больше последнего интервала или
+    отправок не было
+    """
+    total = sum(histogram.values())
+    if not total:
+        return None
+    count = 0
+    for bucket in LAG_BUCKETS:
+        count += histogram.get(f"lag_le_{bucket}", 0)
+        if count >= quantile * total:
+            return bucket
+    return None
+
+def get_delivery_stats() -> List[dict]:
+    """
+    Сводные показатели отправки по видам запросов
+    """
+    counters: Dict[str, Dict[str, int]] = {kind: {} for kind in SCOS_WRITE_REQUESTS}
+    rows = SCOSDeliveryCounter.objects.values("kind", "metric").annotate(total=Sum("value"))
+    for row in rows:
+        counters.setdefault(row["kind"], {})[row["metric"]] = row["total"]
+    stats = []
+    for kind, metrics in counters.items():
+        histogram = {
+            metric: value for metric, value in metrics.items() if metric.startswith("lag_")
+        }
+        stats.append({
+            "kind": kind,
+            "description": SCOS_WRITE_REQUESTS.get(kind, (None, None, kind))[2],
+            **{status: metrics.get(status, 0) for status in STATUSES},
+            "lag_p50": lag_percentile(histogram, 0.5),
+            "lag_p95": lag_percentile(histogram, 0.95),
+            "lag_over": histogram.get(LAG_INF, 0),
+        })
+    return stats
+
+def get_delivered_courses_page(
+        cursor: Union[str, None] = None,
+        size: int = 50,
+) -> Tuple[List[dict], Union[str, None]]:
+    """
+    Страница онлайн-курсов по времени последней успешной отправки (сначала
+    последние, курсы без отправок - в конце) и курсор следующей страницы
+    """
+    courses = SCOSCourse.objects.order_by(
+        F("delivered_at").desc(nulls_last=True), "global_id",
+    ).values("global_id", "title", "session_id", "delivered_at")
+    after = decode_cursor(cursor, 2)
+    if after is not None:
+        delivered_at, global_id = after
+        courses = courses.filter(
+            keyset_after("delivered_at", delivered_at, global_id, descending=True)
+        )
+    page = list(courses[:size + 1])
+    if len(page) > size:
+        last = page[size - 1]
+        return page[:size], encode_cursor([last["delivered_at"], last["global_id"]])
+    return page, None
@@ -6,6 +6,21 @@ import logging
 
 from common.djangoapps.track.backends import BaseBackend # pylint: disable=import-error
 
+from .ordering import (
+    ordering_headers,
+)
+from .publisher import (
+    SCOS_ASYNC_PUBLISH,
+    get_publisher,
+    publish_options,
+)
+from .recorder import (
+    record_event,
+)
+from .tracing import (
+    inject,
+    span,
+)
 from .tasks import (
     user_enrolled,
     user_unenrolled,
@@ -23,17 +38,25 @@ class SCOSEventTrackingBackend(BaseBackend):
 
     def send(self, event):
 
-        if event["name"] == "edx.course.enrollment.activated":
-            self.send_to_celery(user_enrolled, event)
+        record_event(event)
 
-        if event["name"] == "edx.course.enrollment.deactivated":
-            self.send_to_celery(user_unenrolled, event)
+        with span(
+            "event",
+            event=event["name"],
+            course_id=(event.get("data") or {}).get("course_id"),
+        ):
 
-        if event["name"] == "edx.grades.subsection.grade_calculated":
-            self.send_to_celery(subsection_grade, event)
+            if event["name"] == "edx.course.enrollment.activated":
+                self.send_to_celery(user_enrolled, event)
 
-        if event["name"] == "edx.grades.course.grade_calculated":
-            self.send_to_celery(course_grade, event)
+            if event["name"] == "edx.course.enrollment.deactivated":
+                self.send_to_celery(user_unenrolled, event)
+
+            if event["name"] == "edx.grades.subsection.grade_calculated":
+                self.send_to_celery(subsection_grade, event)
+
+            if event["name"] == "edx.grades.course.grade_calculated":
+                self.send_to_celery(course_grade, event)
 
     def send_to_celery(
         self,
@@ -41,10 +64,17 @@ class SCOSEventTrackingBackend(BaseBackend):
         *args,
         **kwargs) -> None:
         try:
-            task.apply_async(
-                args = args,
-                kwargs = kwargs,
-            )
+            with span("enqueue", task=task.name):
+                headers = inject(ordering_headers(args[0]) if args else None)
+                if SCOS_ASYNC_PUBLISH:
+                    get_publisher().submit(task, args, kwargs, headers)
+                else:
+                    task.apply_async(
+                        args = args,
+                        kwargs = kwargs,
+                        headers = headers,
+                        **publish_options(task.name),
+                    )
         except Exception as exception:  # pylint: disable=broad-except
             logging.error(
                 "Не получилось добавить задачу СЦОС в очередь: %s",
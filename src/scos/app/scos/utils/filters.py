@@ -0,0 +1,41 @@
+"""
+Фильтры Open edX (openedx-filters) приложения СЦОС
+"""
+
+from openedx_filters import PipelineStep # pylint: disable=import-error
+
+from .scos_api import SCOS_BASE_URL
+from .about import get_scos_course_widget
+
+
+
+COURSE_ABOUT_TEMPLATE = "courseware/course_about.html"
+SCOS_COURSE_ABOUT_TEMPLATE = "scos/course_about.html"
+
+
+
+class SCOSCourseAboutWidget(PipelineStep):
+    """
+    Добавляет виджет отзывов СЦОС на страницу описания курса, если курс
+    размещен на СЦОС
+    """
+
+    def run_filter(self, context, template_name): # pylint: disable=arguments-differ
+        if template_name != COURSE_ABOUT_TEMPLATE:
+            return {}
+        scos_course = get_scos_course_widget(context["course"].id)
+        if not scos_course:
+            return {}
+        context.update(
+            {
+                "scos": {
+                    "base_url": SCOS_BASE_URL,
+                    "course_id": scos_course["global_id"],
+                    "course_version": scos_course["business_version"],
+                }
+            }
+        )
+        return {
+            "context": context,
+            "template_name": SCOS_COURSE_ABOUT_TEMPLATE,
+        }
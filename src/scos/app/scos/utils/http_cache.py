@@ -0,0 +1,215 @@
+"""
+HTTP кэш GET запросов к API СЦОС.
+
+Ответы хранятся в кэше Django (SCOS_HTTP_CACHE, по умолчанию Redis платформы).
+Пока ответ свеж (Cache-Control: max-age), запрос к СЦОС не выполняется. После
+этого ответ проверяется условным запросом If-None-Match / If-Modified-Since,
+ответ 304 продлевает сохраненный ответ. Если СЦОС не передает ни ETag, ни
+Last-Modified, ни max-age, ответ считается свежим SCOS_HTTP_CACHE_TIMEOUT
+секунд.
+
+Устаревший ответ обновляет один процесс (блокировка в кэше на ключ ответа):
+остальные процессы в это время получают устаревший ответ, а если ответа в
+кэше нет - ожидают обновления до SCOS_HTTP_CACHE_LOCK_WAIT секунд.
+
+После изменения данных на СЦОС сохраненный ответ удаляется (invalidate), и
+следующий запрос получает ответ СЦОС.
+"""
+
+import os
+import codecs
+import time
+from typing import Dict, Tuple, Union
+import yaml
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from django.core.cache import caches
+
+from .cache import cache_key
+from .deadline import remaining
+from .scos_http import scos_request
+
+
+
+CONFIG_FILE = os.environ["CMS_CFG"]
+with codecs.open(CONFIG_FILE, encoding="utf-8") as f:
+    __config__ = yaml.safe_load(f)
+    SCOS_HTTP_CACHE = __config__.get("SCOS_HTTP_CACHE", "default")
+    SCOS_HTTP_CACHE_TIMEOUT = __config__.get("SCOS_HTTP_CACHE_TIMEOUT", 300)
+    SCOS_HTTP_CACHE_STORE_TIMEOUT = __config__.get(
+        "SCOS_HTTP_CACHE_STORE_TIMEOUT", 7 * 24 * 60 * 60
+    )
+    SCOS_HTTP_CACHE_LOCK_TIMEOUT = __config__.get("SCOS_HTTP_CACHE_LOCK_TIMEOUT", 30)
+    SCOS_HTTP_CACHE_LOCK_WAIT = __config__.get("SCOS_HTTP_CACHE_LOCK_WAIT", 5)
+
+STORED_HEADERS = (
+    "Content-Type",
+    "ETag",
+    "Last-Modified",
+    "Cache-Control",
+)
+# Интервал проверки кэша при ожидании обновления ответа, секунд
+REFRESH_POLL_INTERVAL = 0.05
+
+
+
+def parse_cache_control(value: Union[str, None]) -> Dict[str, Union[str, None]]:
+    """
+    Разбирает заголовок Cache-Control: {"max-age": "60", "no-cache": None}
+    """
+    directives: Dict[str, Union[str, None]] = {}
+    for directive in (value or "").split(","):
+        name, _, argument = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+def freshness_lifetime(headers: CaseInsensitiveDict) -> int:
+    """
+    Время (секунд), в течение которого ответ используется без запроса к СЦОС
+    """
+    cache_control = parse_cache_control(headers.get("Cache-Control"))
+    if "no-cache" in cache_control:
+        return 0
+    for directive in ("s-maxage", "max-age"):
+        if (cache_control.get(directive) or "").isdigit():
+            return int(cache_control[directive])
+    if headers.get("ETag") or headers.get("Last-Modified"):
+        return 0
+    return SCOS_HTTP_CACHE_TIMEOUT
+
+def cached_response(entry: dict, url: str) -> requests.Response:
+    response = requests.Response()
+    response.status_code = entry["status_code"]
+    response.headers = CaseInsensitiveDict(entry["headers"])
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = url
+    response._content = entry["content"] # pylint: disable=protected-access
+    return response
+
+def store_response(key: str, response: requests.Response, now: float) -> None:
+    cache_control = parse_cache_control(response.headers.get("Cache-Control"))
+    if "no-store" in cache_control:
+        return
+    lifetime = freshness_lifetime(response.headers)
+    entry = {
+        "status_code": response.status_code,
+        "headers": {
+            header: response.headers[header]
+            for header in STORED_HEADERS if header in response.headers
+        },
+        "content": response.content,
+        "expires": now + lifetime,
+        "stored": time.time(),
+    }
+    caches[SCOS_HTTP_CACHE].set(key, entry, SCOS_HTTP_CACHE_STORE_TIMEOUT)
+
+def wait_refresh(key: str, refresh_key: str) -> Tuple[Union[dict, None], bool]:
+    """
+    Ожидает ответ, сохраненный обновляющим процессом. Возвращает (ответ,
+    блокировка получена): если обновляющий процесс завершился, не сохранив
+    ответ, обновление выполняет этот процесс
+    """
+    started = time.time()
+    wait = SCOS_HTTP_CACHE_LOCK_WAIT
+    left = remaining()
+    if left is not None:
+        wait = min(wait, left)
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(REFRESH_POLL_INTERVAL)
+        entry = caches[SCOS_HTTP_CACHE].get(key)
+        if entry is not None and entry.get("stored", 0) >= started:
+            return entry, False
+        if caches[SCOS_HTTP_CACHE].add(refresh_key, True, SCOS_HTTP_CACHE_LOCK_TIMEOUT):
+            return None, True
+    return None, False
+
+def refresh_response(
+    key: str,
+    url: str,
+    headers: Union[dict, None],
+    timeout: Union[float, Tuple[float, float], None],
+) -> requests.Response:
+    """
+    Запрос к СЦОС, условный при наличии сохраненного ответа
+    """
+    entry = caches[SCOS_HTTP_CACHE].get(key)
+    now = time.time()
+    request_headers = dict(headers or {})
+    if entry is not None:
+        if "ETag" in entry["headers"]:
+            request_headers["If-None-Match"] = entry["headers"]["ETag"]
+        if "Last-Modified" in entry["headers"]:
+            request_headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+    response: requests.Response = scos_request(
+        method = "GET",
+        url = url,
+        headers = request_headers,
+        timeout = timeout,
+    )
+    if response.status_code == 304 and entry is not None:
+        for header in ("ETag", "Last-Modified", "Cache-Control"):
+            if header in response.headers:
+                entry["headers"][header] = response.headers[header]
+        entry["expires"] = now + freshness_lifetime(
+            CaseInsensitiveDict(entry["headers"])
+        )
+        entry["stored"] = time.time()
+        caches[SCOS_HTTP_CACHE].set(key, entry, SCOS_HTTP_CACHE_STORE_TIMEOUT)
+        return cached_response(entry, url)
+    if response.status_code == 200:
+        store_response(key, response, now)
+    return response
+
+def response_key(
+    url: str,
+    headers: Union[dict, None] = None,
+    params: Union[dict, None] = None,
+) -> Tuple[str, str]:
+    """
+    (адрес с параметрами, ключ сохраненного ответа) GET запроса
+    """
+    full_url = requests.Request("GET", url, params=params).prepare().url
+    return full_url, cache_key("http", url=full_url, accept=(headers or {}).get("Accept"))
+
+def invalidate(
+    url: str,
+    headers: Union[dict, None] = None,
+    params: Union[dict, None] = None,
+) -> None:
+    """
+    Удаляет сохраненный ответ GET запроса (параметры как у cached_get)
+    """
+    caches[SCOS_HTTP_CACHE].delete(response_key(url, headers, params)[1])
+
+def cached_get(
+    url: str,
+    headers: Union[dict, None] = None,
+    params: Union[dict, None] = None,
+    timeout: Union[float, Tuple[float, float], None] = None,
+) -> requests.Response:
+    """
+    GET запрос к API СЦОС через HTTP кэш. Исключения requests не
+    перехватываются.
+    """
+    full_url, key = response_key(url, headers, params)
+    entry = caches[SCOS_HTTP_CACHE].get(key)
+    if entry is not None and entry["expires"] > time.time():
+        return cached_response(entry, full_url)
+    refresh_key = f"{key}.refresh"
+    locked = caches[SCOS_HTTP_CACHE].add(refresh_key, True, SCOS_HTTP_CACHE_LOCK_TIMEOUT)
+    if not locked:
+        if entry is not None:
+            return cached_response(entry, full_url)
+        entry, locked = wait_refresh(key, refresh_key)
+        if entry is not None:
+            return cached_response(entry, full_url)
+    try:
+        return refresh_response(key, full_url, headers, timeout)
+    finally:
+        if locked:
+            caches[SCOS_HTTP_CACHE].delete(refresh_key)
@@ -0,0 +1,156 @@
+"""
+Общие части JSON API панели СЦОС.
+
+Курсорная пагинация (keyset): курсор - значения ключа сортировки последней
+записи страницы, следующая страница читается условием "после курсора", без
+OFFSET, поэтому глубина страницы не влияет на время запроса. Выбор полей:
+параметр fields - список полей через запятую. ETag ответа - хэш тела, при
+совпадении с If-None-Match возвращается 304 без тела.
+"""
+
+import base64
+import hashlib
+import json
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Iterable, List, Tuple, Union
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404, HttpResponse, JsonResponse, QueryDict
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+
+
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+
+
+
+class APIError(Exception):
+    """
+    Ошибка запроса к JSON API, status - HTTP статус ответа
+    """
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+
+def cursor_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} не сериализуется в курсор")
+
+def encode_cursor(values: list) -> str:
+    """
+    Курсор страницы из значений ключа сортировки последней записи
+    """
+    cursor = json.dumps(values, default=cursor_value, separators=(",", ":"))
+    return base64.urlsafe_b64encode(cursor.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: Union[str, None], length: int) -> Union[list, None]:
+    """
+    Значения ключа сортировки из курсора, некорректный курсор - APIError
+    """
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+    except ValueError as exception:
+        raise APIError("некорректный курсор") from exception
+    if not isinstance(values, list) or len(values) != length:
+        raise APIError("некорректный курсор")
+    return values
+
+def keyset_after(
+        field: str,
+        value: Any,
+        last_id: Any,
+        descending: bool = False,
+        nulls_last: bool = True,
+        id_field: str = "global_id",
+) -> Q:
+    """
+    Условие "после курсора" для сортировки по (field, id_field), пустые
+    значения field - в конце (nulls_last) или в начале списка
+    """
+    after_id = Q(**{f"{id_field}__gt": last_id})
+    if value is None:
+        after = Q(**{f"{field}__isnull": True}) & after_id
+        if not nulls_last:
+            after |= Q(**{f"{field}__isnull": False})
+        return after
+    lookup = "lt" if descending else "gt"
+    after = Q(**{f"{field}__{lookup}": value}) | (Q(**{field: value}) & after_id)
+    if nulls_last:
+        after |= Q(**{f"{field}__isnull": True})
+    return after
+
+def get_page_size(query: QueryDict, default: int = API_PAGE_SIZE) -> int:
+    try:
+        size = int(query.get("size", default))
+    except ValueError as exception:
+        raise APIError("некорректный размер страницы") from exception
+    return max(1, min(size, API_MAX_PAGE_SIZE))
+
+def get_fields(
+        query: QueryDict,
+        allowed: Union[Iterable[str], None],
+        default: Iterable[str],
+) -> Tuple[str, ...]:
+    """
+    Поля ответа из параметра fields, неизвестное поле - APIError, allowed
+    None - любые поля
+    """
+    if not query.get("fields"):
+        return tuple(default)
+    fields = tuple(field.strip() for field in query["fields"].split(",") if field.strip())
+    if allowed is None:
+        return fields
+    allowed = tuple(allowed)
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise APIError(f"неизвестные поля: {', '.join(unknown)}")
+    return fields
+
+def pick(rows: Iterable[dict], fields: Iterable[str]) -> List[dict]:
+    fields = tuple(fields)
+    return [{field: row.get(field) for field in fields} for row in rows]
+
+def json_response(request, data: Any) -> HttpResponse:
+    """
+    JSON ответ с ETag, 304 - если ETag совпадает с If-None-Match
+    """
+    body = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False).encode("utf-8")
+    etag = quote_etag(hashlib.sha1(body).hexdigest())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type="application/json; charset=utf-8")
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+def json_api(view: Callable) -> Callable:
+    """
+    Декоратор: результат view - JSON ответ с ETag, APIError и Http404 - JSON
+    ошибка
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            data = view(request, *args, **kwargs)
+        except Http404 as exception:
+            error = APIError(str(exception) or "не найдено", 404)
+        except APIError as exception:
+            error = exception
+        else:
+            return json_response(request, data)
+        return JsonResponse(
+            {"error": str(error)},
+            status = error.status,
+            json_dumps_params = {"ensure_ascii": False},
+        )
+    return wrapper
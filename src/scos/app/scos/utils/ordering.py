@@ -0,0 +1,189 @@
+"""
+Упорядоченная отправка событий обучения одного слушателя на курсе.
+
+События одного слушателя на одном курсе (запись, оценки, отчисление)
+отправляются на СЦОС строго в порядке получения, события разных слушателей
+обрабатываются параллельно всеми воркерами.
+
+SCOSEventTrackingBackend присваивает событию номер в последовательности
+(user_id, course_id) - cache.incr в общем кэше платформы (Redis) - и передает
+его в заголовках задачи. Выполненная задача отмечается в кэше отдельным
+ключом своего номера (cache.set без чтения, поэтому отметки параллельных
+задач не перезаписывают друг друга). Задача выполняется, когда отмечена задача
+с предыдущим номером, иначе повторяется с увеличивающимся интервалом: от
+SCOS_ORDERING_RETRY_DELAY секунд, удваивая его до RETRY_DELAY_MAX. Если
+предыдущая задача не выполнена за SCOS_ORDERING_TIMEOUT секунд (потеряна),
+задача выполняется без ожидания.
+
+Ожидание предыдущей задачи считается в заголовке WAITS_HEADER и не расходует
+повторы задачи после ошибки (request.retries, max_retries). Задача, которая
+будет повторена после ошибки (autoretry_for), не отмечается выполненной:
+следующая задача ждет ее повтора. Отметка ставится после успешного выполнения
+или окончательной ошибки.
+"""
+
+import os
+import codecs
+import functools
+import logging
+import time
+from typing import Callable, Union
+import yaml
+
+from celery import current_task
+from celery.exceptions import Retry
+
+from django.core.cache import cache
+
+
+
+LOGGER = logging.getLogger(__name__)
+
+CONFIG_FILE = os.environ["CMS_CFG"]
+with codecs.open(CONFIG_FILE, encoding="utf-8") as f:
+    __config__ = yaml.safe_load(f)
+    SCOS_ORDERED_DELIVERY = __config__.get("SCOS_ORDERED_DELIVERY", True)
+    SCOS_ORDERING_TIMEOUT = __config__.get("SCOS_ORDERING_TIMEOUT", 300)
+    SCOS_ORDERING_RETRY_DELAY = __config__.get("SCOS_ORDERING_RETRY_DELAY", 1)
+
+PARTITION_HEADER = "scos_partition"
+SEQUENCE_HEADER = "scos_sequence"
+SEQUENCED_AT_HEADER = "scos_sequenced_at"
+WAITS_HEADER = "scos_waits"
+SEQUENCE_KEY = "scos.ordering.sequence.{partition}"
+DONE_KEY = "scos.ordering.done.{partition}.{sequence}"
+# Номера последовательности хранятся дольше ожидания задач
+KEY_TIMEOUT = 7 * 24 * 60 * 60
+# Максимальный интервал повтора задачи, ожидающей предыдущую, секунд
+RETRY_DELAY_MAX = 30
+
+
+
+def partition_key(event: dict) -> Union[str, None]:
+    data = event.get("data") or {}
+    if data.get("user_id") is None or not data.get("course_id"):
+        return None
+    return f"{data['user_id']}.{data['course_id']}"
+
+def next_sequence(partition: str) -> int:
+    key = SEQUENCE_KEY.format(partition=partition)
+    cache.add(key, 0, KEY_TIMEOUT)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Ключ удален из кэша между add и incr
+        cache.add(key, 1, KEY_TIMEOUT)
+        return 1
+
+def ordering_headers(event: dict) -> dict:
+    """
+    Заголовки задачи с номером события в последовательности слушателя
+    """
+    if not SCOS_ORDERED_DELIVERY:
+        return {}
+    partition = partition_key(event)
+    if partition is None:
+        return {}
+    try:
+        sequence = next_sequence(partition)
+    except Exception as exception:  # pylint: disable=broad-except
+        LOGGER.warning("СЦОС. Событие отправляется без упорядочивания: %s", exception)
+        return {}
+    return {
+        PARTITION_HEADER: partition,
+        SEQUENCE_HEADER: sequence,
+        SEQUENCED_AT_HEADER: time.time(),
+    }
+
+def mark_done(partition: str, sequence: int) -> None:
+    """
+    Отмечает задачу выполненной. Отметка предыдущей задачи больше не нужна:
+    ее проверяет только эта задача
+    """
+    cache.set(DONE_KEY.format(partition=partition, sequence=sequence), True, KEY_TIMEOUT)
+    cache.delete(DONE_KEY.format(partition=partition, sequence=sequence - 1))
+
+def is_turn(
+    partition: str,
+    sequence: int,
+    sequenced_at: Union[float, None],
+) -> bool:
+    """
+    True - задачу можно выполнять: предыдущая задача выполнена, порядок не
+    известен (номер последовательности удален из кэша), задача уже
+    выполнена (повторная доставка) или предыдущая задача не выполнена за
+    SCOS_ORDERING_TIMEOUT
+    """
+    if sequence <= 1:
+        return True
+    sequence_key = SEQUENCE_KEY.format(partition=partition)
+    done_key = DONE_KEY.format(partition=partition, sequence=sequence - 1)
+    own_key = DONE_KEY.format(partition=partition, sequence=sequence)
+    found = cache.get_many([sequence_key, done_key, own_key])
+    if sequence_key not in found or done_key in found or own_key in found:
+        return True
+    if time.time() - (sequenced_at or 0) < SCOS_ORDERING_TIMEOUT:
+        return False
+    LOGGER.warning(
+        "СЦОС. Событие %s %s отправляется без ожидания предыдущих",
+        partition,
+        sequence,
+    )
+    return True
+
+def retry_delay(attempt: int) -> float:
+    """
+    Интервал повтора задачи, ожидающей предыдущую (attempt - номер повтора с 0)
+    """
+    return min(SCOS_ORDERING_RETRY_DELAY * 2 ** min(attempt, 16), RETRY_DELAY_MAX)
+
+def wait_turn(task, request) -> Retry:
+    """
+    Повторяет задачу, ожидающую предыдущую. В отличие от Task.retry число
+    повторов задачи (request.retries) не увеличивается, ожидания считаются в
+    заголовке WAITS_HEADER
+    """
+    waits = request.get(WAITS_HEADER) or 0
+    countdown = retry_delay(waits)
+    signature = task.signature_from_request(
+        request,
+        countdown = countdown,
+        headers = {**(request.headers or {}), WAITS_HEADER: waits + 1},
+    )
+    if not request.is_eager:
+        signature.apply_async()
+    return Retry(when=countdown, is_eager=request.is_eager, sig=signature)
+
+def will_retry(task, request, exception: Exception) -> bool:
+    """
+    Задача будет повторена после ошибки: исключение из autoretry_for задачи,
+    не отмеченное как окончательное (retryable), и повторы не исчерпаны
+    """
+    if not isinstance(exception, tuple(getattr(task, "autoretry_for", ()))):
+        return False
+    if not getattr(exception, "retryable", True):
+        return False
+    return task.max_retries is None or (request.retries or 0) < task.max_retries
+
+def ordered(function: Callable) -> Callable:
+    """
+    Декоратор задачи события обучения: выполнение в порядке последовательности
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        request = current_task.request if current_task else None
+        partition = request.get(PARTITION_HEADER) if request else None
+        sequence = request.get(SEQUENCE_HEADER) if request else None
+        if partition is None or sequence is None:
+            return function(*args, **kwargs)
+        if not is_turn(partition, sequence, request.get(SEQUENCED_AT_HEADER)):
+            raise wait_turn(current_task, request)
+        try:
+            result = function(*args, **kwargs)
+        except Exception as exception:
+            if not will_retry(current_task, request, exception):
+                mark_done(partition, sequence)
+            raise
+        mark_done(partition, sequence)
+        return result
+    return wrapper
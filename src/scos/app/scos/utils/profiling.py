@@ -0,0 +1,270 @@
+"""
+Профилирование панели СЦОС и задач Celery по запросу.
+
+Запрос панели СЦОС профилируется, если пользователь - персонал и передан
+заголовок X-SCOS-Profile: 1 или параметр ?scos_profile=1 (SCOS_PROFILING:
+true - все запросы персонала). Задача Celery профилируется с заголовком
+задачи scos_profile (apply_async(headers={"scos_profile": True})) или при
+SCOS_PROFILING_TASKS: true.
+
+Профиль содержит профиль CPU (cProfile), длительность каждого HTTP запроса к
+API СЦОС и число SQL запросов. Профили сохраняются в каталоге
+SCOS_PROFILING_PATH (последние SCOS_PROFILING_KEEP): <id>.prof для pstats и
+snakeviz, <id>.json - сводка. Сводка запроса панели выводится внизу
+страницы (base.html), профиль скачивается по ссылке.
+"""
+
+import os
+import codecs
+import cProfile
+import functools
+import json
+import logging
+import pstats
+import re
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Union
+from urllib.parse import urlsplit
+import yaml
+
+from celery import signals
+
+from django.db import connections
+from django.template import loader
+
+
+
+LOGGER = logging.getLogger(__name__)
+
+CONFIG_FILE = os.environ["CMS_CFG"]
+with codecs.open(CONFIG_FILE, encoding="utf-8") as f:
+    __config__ = yaml.safe_load(f)
+    SCOS_PROFILING = __config__.get("SCOS_PROFILING", False)
+    SCOS_PROFILING_TASKS = __config__.get("SCOS_PROFILING_TASKS", False)
+    SCOS_PROFILING_PATH = __config__.get("SCOS_PROFILING_PATH", "/openedx/data/scos/profiles")
+    SCOS_PROFILING_KEEP = __config__.get("SCOS_PROFILING_KEEP", 50)
+
+PROFILE_HEADER = "HTTP_X_SCOS_PROFILE"
+PROFILE_PARAMETER = "scos_profile"
+TASK_HEADER = "scos_profile"
+FOOTER_MARKER = b"<!-- scos-profile -->"
+PROFILE_ID = re.compile(r"^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$")
+TOP_FUNCTIONS = 25
+
+_CURRENT: ContextVar = ContextVar("scos_profile", default=None)
+_TASK_PROFILES: Dict[str, "Profile"] = {}
+_LOCK = threading.Lock()
+
+
+
+class Profile:
+    """
+    Профиль одного запроса панели СЦОС или задачи Celery
+    """
+
+    def __init__(self, name: str) -> None:
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.name = name
+        self.profiler: Union[cProfile.Profile, None] = cProfile.Profile()
+        self.http: List[dict] = []
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.started = 0.0
+        self.duration = 0.0
+        self.token = None
+        self.connections: list = []
+        self.result: dict = {}
+
+    def sql_wrapper(self, execute, sql, params, many, context) -> Any:
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_time += time.perf_counter() - start
+
+    def start(self) -> "Profile":
+        self.token = _CURRENT.set(self)
+        for connection in connections.all():
+            connection.execute_wrappers.append(self.sql_wrapper)
+            self.connections.append(connection)
+        self.started = time.perf_counter()
+        try:
+            self.profiler.enable()
+        except ValueError:
+            # Профилировщик уже включен в этом потоке (Python 3.12+ - в процессе)
+            self.profiler = None
+        return self
+
+    def stop(self) -> None:
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.duration = time.perf_counter() - self.started
+        for connection in self.connections:
+            if self.sql_wrapper in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self.sql_wrapper)
+        try:
+            _CURRENT.reset(self.token)
+        except ValueError:
+            _CURRENT.set(None)
+        self.result = self.summary()
+        try:
+            self.save()
+        except OSError as exception:
+            LOGGER.warning("Не получилось сохранить профиль СЦОС: %s", exception)
+
+    def top_functions(self) -> List[dict]:
+        if self.profiler is None:
+            return []
+        stats = pstats.Stats(self.profiler).sort_stats("cumulative")
+        functions = []
+        for function in stats.fcn_list[:TOP_FUNCTIONS]:
+            _, calls, total_time, cumulative_time, _ = stats.stats[function]
+            filename, line, name = function
+            functions.append(
+                {
+                    "function": f"{os.path.basename(filename)}:{line}({name})",
+                    "calls": calls,
+                    "tottime_ms": round(total_time * 1000, 3),
+                    "cumtime_ms": round(cumulative_time * 1000, 3),
+                }
+            )
+        return functions
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "duration_ms": round(self.duration * 1000, 3),
+            "cpu_profile": self.profiler is not None,
+            "sql": {
+                "count": self.sql_count,
+                "time_ms": round(self.sql_time * 1000, 3),
+            },
+            "http": {
+                "count": len(self.http),
+                "time_ms": round(sum(call["ms"] for call in self.http), 3),
+                "calls": self.http,
+            },
+            "functions": self.top_functions(),
+        }
+
+    def save(self) -> None:
+        os.makedirs(SCOS_PROFILING_PATH, exist_ok=True)
+        if self.profiler is not None:
+            self.profiler.dump_stats(profile_path(self.id, "prof"))
+        with open(profile_path(self.id, "json"), "w", encoding="utf-8") as file:
+            json.dump(self.result, file, ensure_ascii=False, indent=2)
+        prune()
+
+
+
+def profile_path(profile_id: str, extension: str) -> str:
+    return os.path.join(SCOS_PROFILING_PATH, f"{profile_id}.{extension}")
+
+def prune() -> None:
+    """
+    Удаляет профили сверх SCOS_PROFILING_KEEP последних
+    """
+    profiles = sorted(
+        name[:-5] for name in os.listdir(SCOS_PROFILING_PATH) if name.endswith(".json")
+    )
+    for profile_id in profiles[:-SCOS_PROFILING_KEEP or None]:
+        for extension in ("json", "prof"):
+            try:
+                os.remove(profile_path(profile_id, extension))
+            except FileNotFoundError:
+                pass
+
+def get_profile_file(profile_id: str, extension: str = "prof") -> Union[str, None]:
+    """
+    Путь к сохраненному профилю, None - профиль не найден
+    """
+    if not PROFILE_ID.match(profile_id):
+        return None
+    path = profile_path(profile_id, extension)
+    if not os.path.exists(path):
+        return None
+    return path
+
+def record_http(
+    method: str,
+    url: str,
+    elapsed: float,
+    status: Union[int, None] = None,
+    exception: Union[Exception, None] = None,
+) -> None:
+    """
+    Добавляет HTTP запрос к API СЦОС в текущий профиль
+    """
+    current = _CURRENT.get()
+    if current is None:
+        return
+    current.http.append(
+        {
+            "method": method,
+            "path": urlsplit(url).path,
+            "status": status if exception is None else type(exception).__name__,
+            "ms": round(elapsed * 1000, 3),
+        }
+    )
+
+def is_profiling_requested(request) -> bool:
+    if not getattr(request.user, "is_staff", False):
+        return False
+    return (
+        SCOS_PROFILING
+        or request.META.get(PROFILE_HEADER) == "1"
+        or request.GET.get(PROFILE_PARAMETER) == "1"
+    )
+
+def profiled(view: Callable) -> Callable:
+    """
+    Декоратор представления панели СЦОС: профилирование по запросу, сводка
+    профиля на месте FOOTER_MARKER в base.html
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not is_profiling_requested(request) or _CURRENT.get() is not None:
+            return view(request, *args, **kwargs)
+        profile = Profile(f"view {view.__name__}").start()
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            profile.stop()
+        response["X-SCOS-Profile-Id"] = profile.id
+        if not getattr(response, "streaming", False) and FOOTER_MARKER in response.content:
+            footer = loader.get_template("scos/components/profile.html").render(
+                {"profile": profile.result}, request
+            )
+            response.content = response.content.replace(
+                FOOTER_MARKER, footer.encode("utf-8")
+            )
+        return response
+    return wrapper
+
+
+
+@signals.task_prerun.connect(weak=False)
+def _start_task_profile(task_id=None, task=None, **kwargs) -> None: # pylint: disable=unused-argument
+    if not task.name.startswith("scos."):
+        return
+    if not (SCOS_PROFILING_TASKS or task.request.get(TASK_HEADER)):
+        return
+    if _CURRENT.get() is not None:
+        return
+    profile = Profile(f"task {task.name.rsplit('.', 1)[-1]}")
+    with _LOCK:
+        _TASK_PROFILES[task_id] = profile
+    profile.start()
+
+@signals.task_postrun.connect(weak=False)
+def _stop_task_profile(task_id=None, **kwargs) -> None: # pylint: disable=unused-argument
+    with _LOCK:
+        profile = _TASK_PROFILES.pop(task_id, None)
+    if profile is not None:
+        profile.stop()
+        LOGGER.info("СЦОС. Профиль задачи %s: %s", profile.name, profile.id)
@@ -0,0 +1,330 @@
+"""
+Асинхронная постановка задач СЦОС в очередь Celery.
+
+При SCOS_ASYNC_PUBLISH: true SCOSEventTrackingBackend не обращается к брокеру
+в запросе LMS: задача добавляется в буфер процесса (SCOS_PUBLISH_QUEUE_SIZE),
+фоновый поток отправляет задачи брокеру пачками по SCOS_PUBLISH_BATCH_SIZE
+через одно соединение.
+
+Если буфер переполнен или брокер недоступен, задачи дописываются в файл
+SCOS_SPOOL_PATH/spool-<host>-<pid>.jsonl. Раз в SCOS_SPOOL_RETRY_INTERVAL
+секунд фоновый поток проверяет брокер и отправляет задачи из файлов (в том
+числе оставленных завершившимися процессами), отправленные файлы удаляются.
+Пока у процесса есть неотправленные задачи в файле, новые задачи тоже
+дописываются в файл, поэтому задачи отправляются брокеру в порядке
+поступления.
+
+При SCOS_ASYNC_DELIVERY: true задачи событий обучения отправляются в очередь
+SCOS_DELIVERY_QUEUE асинхронного воркера отправки (см. delivery).
+"""
+
+import os
+import atexit
+import codecs
+import fcntl
+import glob
+import logging
+import queue
+import socket
+import threading
+import time
+from collections import Counter
+from typing import Iterator, List, Tuple, Union
+import yaml
+
+from celery import current_app
+from kombu.utils.json import dumps, loads
+
+from .tasks import (
+    EVENT_PLANS,
+)
+
+
+
+LOGGER = logging.getLogger(__name__)
+
+CONFIG_FILE = os.environ["CMS_CFG"]
+with codecs.open(CONFIG_FILE, encoding="utf-8") as f:
+    __config__ = yaml.safe_load(f)
+    SCOS_ASYNC_PUBLISH = __config__.get("SCOS_ASYNC_PUBLISH", False)
+    SCOS_PUBLISH_QUEUE_SIZE = __config__.get("SCOS_PUBLISH_QUEUE_SIZE", 10000)
+    SCOS_PUBLISH_BATCH_SIZE = __config__.get("SCOS_PUBLISH_BATCH_SIZE", 100)
+    SCOS_PUBLISH_FLUSH_INTERVAL = __config__.get("SCOS_PUBLISH_FLUSH_INTERVAL", 0.05)
+    SCOS_SPOOL_PATH = __config__.get("SCOS_SPOOL_PATH", "/openedx/data/scos/spool")
+    SCOS_SPOOL_RETRY_INTERVAL = __config__.get("SCOS_SPOOL_RETRY_INTERVAL", 10)
+    SCOS_ASYNC_DELIVERY = __config__.get("SCOS_ASYNC_DELIVERY", False)
+    SCOS_DELIVERY_QUEUE = __config__.get("SCOS_DELIVERY_QUEUE", "scos.delivery")
+
+# Очередь Celery LMS по умолчанию (CELERY_DEFAULT_QUEUE), в нее задачи
+# событий обучения отправляются без асинхронного воркера
+LMS_DEFAULT_QUEUE = "edx.lms.core.default"
+
+# (имя задачи, args, kwargs, заголовки)
+Item = Tuple[str, tuple, dict, dict]
+
+_LOCK = threading.Lock()
+_PUBLISHER: dict = {"publisher": None}
+
+
+
+class EventPublisher:
+    """
+    Буфер задач СЦОС с фоновой отправкой брокеру и файлом на диске
+    """
+
+    def __init__(self) -> None:
+        self.pid: Union[int, None] = None
+        self.queue: queue.Queue = queue.Queue(SCOS_PUBLISH_QUEUE_SIZE)
+        self.spool_lock = threading.Lock()
+        self.broker_down_until = 0.0
+        # В файле процесса есть задачи, ожидающие отправки
+        self.backlog = False
+        self.next_replay = 0.0
+        self.stats: Counter = Counter()
+
+    @property
+    def spool_file(self) -> str:
+        return os.path.join(
+            SCOS_SPOOL_PATH, f"spool-{socket.gethostname()}-{os.getpid()}.jsonl"
+        )
+
+    def ensure_started(self) -> None:
+        """
+        Запускает фоновый поток (после fork процесса - заново)
+        """
+        pid = os.getpid()
+        if self.pid == pid:
+            return
+        with _LOCK:
+            if self.pid == pid:
+                return
+            if self.pid is not None:
+                self.queue = queue.Queue(SCOS_PUBLISH_QUEUE_SIZE)
+                self.spool_lock = threading.Lock()
+                self.backlog = False
+            threading.Thread(target=self.run, name="scos-publisher", daemon=True).start()
+            atexit.register(self.shutdown)
+            self.pid = pid
+
+    def submit(self, task, args: tuple, kwargs: dict, headers: dict) -> None:
+        """
+        Добавляет задачу в буфер, не ожидая брокера
+        """
+        self.ensure_started()
+        item = (task.name, args, kwargs, headers)
+        if self.backlog or time.monotonic() < self.broker_down_until:
+            self.spool([item])
+            return
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.spool([item])
+
+    def take_batch(self) -> List[Item]:
+        try:
+            batch = [self.queue.get(timeout=SCOS_PUBLISH_FLUSH_INTERVAL)]
+        except queue.Empty:
+            return []
+        while len(batch) < SCOS_PUBLISH_BATCH_SIZE:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def publish(self, batch: List[Item]) -> bool:
+        """
+        Отправляет пачку задач брокеру, неотправленные задачи - в файл
+        """
+        sent = 0
+        try:
+            with current_app.producer_or_acquire() as producer:
+                for name, args, kwargs, headers in batch:
+                    current_app.tasks[name].apply_async(
+                        args = args,
+                        kwargs = kwargs,
+                        headers = headers,
+                        producer = producer,
+                        **publish_options(name),
+                    )
+                    sent += 1
+        except Exception as exception:  # pylint: disable=broad-except
+            LOGGER.warning(
+                "СЦОС. Брокер недоступен, задачи (%s) сохранены в %s: %s",
+                len(batch) - sent,
+                SCOS_SPOOL_PATH,
+                exception,
+            )
+            self.broker_down_until = time.monotonic() + SCOS_SPOOL_RETRY_INTERVAL
+            self.spool(batch[sent:])
+            return False
+        finally:
+            self.stats["published"] += sent
+        return True
+
+    def spool(self, items: List[Item]) -> None:
+        if not items:
+            return
+        lines = "".join(dumps(list(item)) + "\n" for item in items)
+        try:
+            with self.spool_lock:
+                os.makedirs(SCOS_SPOOL_PATH, exist_ok=True)
+                append(self.spool_file, lines)
+                self.backlog = True
+            self.stats["spooled"] += len(items)
+        except OSError as exception:
+            self.stats["lost"] += len(items)
+            LOGGER.error(
+                "Не получилось добавить задачу СЦОС в очередь: %s", exception
+            )
+
+    def claim_spool_files(self) -> Iterator[str]:
+        """
+        Забирает файлы задач для отправки по одному: переименование файла
+        атомарно, поэтому файл отправляет только один процесс
+        """
+        host = socket.gethostname()
+        for path in glob.glob(os.path.join(SCOS_SPOOL_PATH, "spool-*.jsonl*")):
+            _, _, suffix = path.partition(".jsonl")
+            if suffix.startswith(".replay-"):
+                # Файл, который не успел отправить завершившийся процесс
+                owner_host, _, owner_pid = suffix[len(".replay-"):].rpartition("-")
+                if owner_host != host or not owner_pid.isdigit() or is_alive(int(owner_pid)):
+                    continue
+                path, _, _ = path.partition(".replay-")
+                source = f"{path}{suffix}"
+            else:
+                source = path
+            target = f"{path}.replay-{host}-{os.getpid()}"
+            try:
+                with self.spool_lock:
+                    os.rename(source, target)
+            except OSError:
+                continue
+            yield target
+
+    def replay(self) -> None:
+        """
+        Отправляет задачи из файлов, если брокер снова доступен
+        """
+        now = time.monotonic()
+        if now < self.next_replay or now < self.broker_down_until:
+            return
+        self.next_replay = now + SCOS_SPOOL_RETRY_INTERVAL
+        if not os.path.isdir(SCOS_SPOOL_PATH):
+            return
+        for path in self.claim_spool_files():
+            with open(path, encoding="utf-8") as spool:
+                # Ожидание записи, начатой до переименования файла
+                fcntl.flock(spool, fcntl.LOCK_EX)
+                items = [tuple(loads(line)) for line in spool if line.strip()]
+                os.remove(path)
+            for start in range(0, len(items), SCOS_PUBLISH_BATCH_SIZE):
+                if not self.publish(items[start:start + SCOS_PUBLISH_BATCH_SIZE]):
+                    self.spool(items[start + SCOS_PUBLISH_BATCH_SIZE:])
+                    return
+            self.stats["replayed"] += len(items)
+            LOGGER.info("СЦОС. Отправлены сохраненные задачи (%s) из %s", len(items), path)
+        with self.spool_lock:
+            # Задачи, дописанные во время отправки, остаются до следующей проверки
+            self.backlog = os.path.exists(self.spool_file)
+
+    def run(self) -> None:
+        while True:
+            try:
+                self.replay()
+                batch = self.take_batch()
+                if batch:
+                    if self.backlog:
+                        # Задачи из буфера отправляются после задач из файла
+                        self.spool(batch)
+                    else:
+                        self.publish(batch)
+                    for _ in batch:
+                        self.queue.task_done()
+            except Exception as exception:  # pylint: disable=broad-except
+                LOGGER.exception("СЦОС. Ошибка отправки задач: %s", exception)
+                time.sleep(SCOS_PUBLISH_FLUSH_INTERVAL)
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """
+        Ожидает отправки задач из буфера
+        """
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(SCOS_PUBLISH_FLUSH_INTERVAL / 10)
+
+    def shutdown(self) -> None:
+        """
+        При завершении процесса задачи из буфера сохраняются в файл
+        """
+        if self.pid != os.getpid():
+            return
+        items = []
+        while True:
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        self.spool(items)
+
+
+
+def publish_options(task_name: str) -> dict:
+    """
+    Параметры apply_async задачи: очередь асинхронного воркера отправки для
+    задач событий обучения
+    """
+    if SCOS_ASYNC_DELIVERY and task_name in EVENT_PLANS:
+        return {"queue": SCOS_DELIVERY_QUEUE}
+    return {}
+
+def get_delivery_queue_depth() -> Tuple[str, Union[int, None]]:
+    """
+    (очередь, число сообщений в ней) задач событий обучения, None - брокер
+    недоступен
+    """
+    queue_name = SCOS_DELIVERY_QUEUE if SCOS_ASYNC_DELIVERY else LMS_DEFAULT_QUEUE
+    try:
+        with current_app.connection_for_read() as connection:
+            connection.ensure_connection(max_retries=1)
+            declared = connection.default_channel.queue_declare(queue=queue_name, passive=True)
+    except Exception as exception:  # pylint: disable=broad-except
+        LOGGER.warning("СЦОС. Не получилось получить размер очереди %s: %s", queue_name, exception)
+        return queue_name, None
+    return queue_name, declared.message_count
+
+def append(path: str, lines: str) -> None:
+    """
+    Дописывает строки в файл под блокировкой. Если файл переименован
+    (забран для отправки) до получения блокировки, создается новый файл.
+    """
+    while True:
+        with open(path, "a", encoding="utf-8") as spool:
+            fcntl.flock(spool, fcntl.LOCK_EX)
+            try:
+                current = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if current.st_ino != os.fstat(spool.fileno()).st_ino:
+                continue
+            spool.write(lines)
+            return
+
+def is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def get_publisher() -> EventPublisher:
+    publisher = _PUBLISHER["publisher"]
+    if publisher is None:
+        with _LOCK:
+            if _PUBLISHER["publisher"] is None:
+                _PUBLISHER["publisher"] = EventPublisher()
+            publisher = _PUBLISHER["publisher"]
+    return publisher
@@ -0,0 +1,172 @@
+"""
+Запись трафика СЦОС для нагрузочного тестирования.
+
+При SCOS_TRAFFIC_RECORD: true события отслеживания, которые получает
+SCOSEventTrackingBackend, и HTTP запросы к API СЦОС записываются в файлы
+JSON Lines в каталоге SCOS_TRAFFIC_PATH (отдельный файл для каждого
+процесса, ротация по размеру SCOS_TRAFFIC_MAX_BYTES). Идентификаторы
+пользователей заменяются HMAC-SHA256 с ключом SCOS_TRAFFIC_SALT (по
+умолчанию SECRET_KEY), персональные данные не записываются.
+
+Записи:
+    {"k": "e", "t": время, "n": событие, "ts": время события,
+     "u": пользователь, "c": курс, "d": данные события}
+    {"k": "r", "t": время, "m": метод, "p": путь, "q": параметры,
+     "j": тело запроса, "s": статус ответа, "ms": длительность, "n": размер
+     ответа, "x": исключение}
+
+Воспроизведение записей: tests/benchmarks/replay.py.
+"""
+
+import os
+import codecs
+import hashlib
+import hmac
+import json
+import logging
+import socket
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Any, Union
+from urllib.parse import parse_qsl, urlsplit
+import yaml
+
+from django.conf import settings
+
+
+
+CONFIG_FILE = os.environ["CMS_CFG"]
+with codecs.open(CONFIG_FILE, encoding="utf-8") as f:
+    __config__ = yaml.safe_load(f)
+    SCOS_TRAFFIC_RECORD = __config__.get("SCOS_TRAFFIC_RECORD", False)
+    SCOS_TRAFFIC_PATH = __config__.get("SCOS_TRAFFIC_PATH", "/openedx/data/scos/traffic")
+    SCOS_TRAFFIC_MAX_BYTES = __config__.get("SCOS_TRAFFIC_MAX_BYTES", 64 * 1024 * 1024)
+    SCOS_TRAFFIC_BACKUPS = __config__.get("SCOS_TRAFFIC_BACKUPS", 4)
+    SCOS_TRAFFIC_SALT = __config__.get("SCOS_TRAFFIC_SALT", "")
+
+EVENT_DATA_FIELDS = (
+    "mode",
+    "block_id",
+    "weighted_graded_earned",
+    "weighted_graded_possible",
+    "percent_grade",
+    "letter_grade",
+)
+ANONYMISED_FIELDS = (
+    "user_id",
+    "username",
+    "email",
+)
+
+_LOCK = threading.Lock()
+_HANDLER: dict = {"pid": None, "handler": None}
+
+
+
+def anonymise(value: Any) -> Union[str, None]:
+    """
+    Псевдоним идентификатора: одинаковые значения дают одинаковый псевдоним
+    """
+    if value is None:
+        return None
+    salt = SCOS_TRAFFIC_SALT or settings.SECRET_KEY
+    return hmac.new(
+        salt.encode("utf-8"), str(value).encode("utf-8"), hashlib.sha256
+    ).hexdigest()[:16]
+
+def anonymise_body(body: Any) -> Any:
+    if isinstance(body, list):
+        return [anonymise_body(item) for item in body]
+    if isinstance(body, dict):
+        return {
+            key: anonymise(value) if key in ANONYMISED_FIELDS else anonymise_body(value)
+            for key, value in body.items()
+        }
+    return body
+
+def get_handler() -> RotatingFileHandler:
+    """
+    Файл записи текущего процесса (после fork воркера создается новый)
+    """
+    pid = os.getpid()
+    with _LOCK:
+        if _HANDLER["pid"] != pid:
+            os.makedirs(SCOS_TRAFFIC_PATH, exist_ok=True)
+            _HANDLER["handler"] = RotatingFileHandler(
+                os.path.join(
+                    SCOS_TRAFFIC_PATH, f"traffic-{socket.gethostname()}-{pid}.jsonl"
+                ),
+                maxBytes=SCOS_TRAFFIC_MAX_BYTES,
+                backupCount=SCOS_TRAFFIC_BACKUPS,
+                encoding="utf-8",
+                delay=True,
+            )
+            _HANDLER["pid"] = pid
+        return _HANDLER["handler"]
+
+def write(record: dict) -> None:
+    try:
+        line = json.dumps(
+            record, ensure_ascii=False, separators=(",", ":"), default=str
+        )
+        get_handler().handle(logging.makeLogRecord({"msg": line}))
+    except Exception as exception:  # pylint: disable=broad-except
+        logging.getLogger(__name__).warning(
+            "Не получилось записать трафик СЦОС: %s", exception
+        )
+
+def record_event(event: dict) -> None:
+    """
+    Записывает событие отслеживания
+    """
+    if not SCOS_TRAFFIC_RECORD:
+        return
+    data = event.get("data") or {}
+    timestamp = event.get("timestamp")
+    write(
+        {
+            "k": "e",
+            "t": round(time.time(), 6),
+            "n": event.get("name"),
+            "ts": timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp,
+            "u": anonymise(data.get("user_id")),
+            "c": data.get("course_id"),
+            "d": {field: data[field] for field in EVENT_DATA_FIELDS if field in data},
+        }
+    )
+
+def record_request(
+    method: str,
+    url: str,
+    kwargs: dict,
+    started: float,
+    elapsed: float,
+    response=None,
+    exception: Union[Exception, None] = None,
+) -> None:
+    """
+    Записывает HTTP запрос к API СЦОС
+    """
+    if not SCOS_TRAFFIC_RECORD:
+        return
+    parts = urlsplit(url)
+    record = {
+        "k": "r",
+        "t": round(started, 6),
+        "m": method,
+        "p": parts.path,
+        "q": kwargs.get("params") or dict(parse_qsl(parts.query)) or None,
+        "j": anonymise_body(kwargs.get("json")),
+        "ms": round(elapsed * 1000, 3),
+    }
+    if response is not None:
+        record["s"] = response.status_code
+        if kwargs.get("stream"):
+            record["n"] = response.headers.get("Content-Length")
+        else:
+            record["n"] = len(response.content)
+    if exception is not None:
+        record["x"] = type(exception).__name__
+    write(record)
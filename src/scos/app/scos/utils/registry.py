@@ -0,0 +1,334 @@
+"""
+Локальная копия реестра СЦОС для панели СЦОС.
+
+sync_registry копирует из реестра СЦОС платформы (3.1.10), Правообладателей
+(3.1.11) и онлайн-курсы платформы (3.1.14) в модели SCOSPlatform,
+SCOSRightholder и SCOSCourse. Синхронизация инкрементальная: подробная
+информация о курсе (3.1.15) запрашивается только для новых курсов и курсов с
+изменившейся business_version (для всех курсов - раз в сутки), записи
+изменяются только при изменении данных, удаленные из реестра записи
+удаляются. Списки реестра читаются итераторами scos_iter_* (потоковый разбор
+при SCOS_STREAM_RESPONSES), подробная информация о курсах запрашивается после
+чтения списка.
+
+Задача registry_sync повторяется каждые SCOS_REGISTRY_SYNC_INTERVAL секунд.
+Если успешной синхронизации не было дольше двух интервалов, синхронизацию
+запускает открытие панели СЦОС, кнопка "Обновить" запускает ее сразу.
+"""
+
+import os
+import codecs
+import logging
+from datetime import timedelta
+from typing import Dict, Iterable, Union
+import yaml
+
+from django.core.cache import cache
+from django.db.models import OuterRef, QuerySet, Subquery
+from django.utils import timezone
+
+from ..models import (
+    SCOSCourse,
+    SCOSPlatform,
+    SCOSRegistrySync,
+    SCOSRightholder,
+)
+from .course import (
+    get_course_key,
+)
+from .tracing import (
+    traced,
+)
+from .scos_api import (
+    SCOS_PARTNER_ID,
+    get_scos_course,
+    scos_get_course,
+    scos_iter_courses,
+    scos_iter_platforms,
+    scos_iter_rightholders,
+)
+
+
+
+LOGGER = logging.getLogger(__name__)
+
+CONFIG_FILE = os.environ["CMS_CFG"]
+with codecs.open(CONFIG_FILE, encoding="utf-8") as f:
+    __config__ = yaml.safe_load(f)
+    SCOS_REGISTRY_SYNC_INTERVAL = __config__.get("SCOS_REGISTRY_SYNC_INTERVAL", 600)
+
+START_KEY = "scos.registry_sync.start"
+RUNNING_KEY = "scos.registry_sync.running"
+TOKEN_KEY = "scos.registry_sync.token"
+# Курс платформы, которого нет на СЦОС, не ищется на СЦОС повторно до
+# следующей синхронизации
+MISSING_KEY = "scos.registry.missing.{}"
+# Повторный запуск синхронизации кнопкой или панелью не чаще
+START_TIMEOUT = 60
+# Синхронизация, не завершившаяся за это время, считается прерванной
+RUNNING_TIMEOUT = 15 * 60
+SYNC_HISTORY = 100
+# Полная синхронизация: подробная информация обо всех курсах
+FULL_SYNC_INTERVAL = 24 * 60 * 60
+
+PARTNER_FIELDS = ("title", "short_title", "data")
+COURSE_FIELDS = (
+    "title",
+    "external_url",
+    "session_id",
+    "institution_id",
+    "language",
+    "started_at",
+    "finished_at",
+    "business_version",
+    "data",
+)
+
+
+
+class RegistrySyncError(Exception):
+    """
+    СЦОС вернул пустой список реестра, а локальная копия не пуста: копия не
+    изменяется
+    """
+
+
+
+def text(value, max_length: int) -> str:
+    return str(value or "")[:max_length]
+
+def partner_fields(row: dict) -> dict:
+    return {
+        "title": text(row.get("title"), 512),
+        "short_title": text(row.get("short_title"), 255),
+        "data": row,
+    }
+
+def course_fields(data: dict) -> dict:
+    external_url = text(data.get("external_url"), 512)
+    business_version = data.get("business_version")
+    return {
+        "title": text(data.get("title"), 512),
+        "external_url": external_url,
+        "session_id": text(get_course_key(external_url), 255),
+        "institution_id": text(data.get("institution_id"), 255),
+        "language": text(data.get("language"), 16),
+        "started_at": text(data.get("started_at"), 32),
+        "finished_at": text(data.get("finished_at"), 32),
+        "business_version": int(business_version) if business_version is not None else None,
+        "data": data,
+    }
+
+def apply_changes(model, rows: Dict[str, dict], fields: tuple) -> dict:
+    """
+    Приводит таблицу model к rows (global_id -> значения полей fields)
+    """
+    now = timezone.now()
+    existing = {record.global_id: record for record in model.objects.all()}
+    created, updated = [], []
+    for global_id, values in rows.items():
+        record = existing.get(global_id)
+        if record is None:
+            created.append(model(global_id=global_id, synced_at=now, **values))
+            continue
+        if any(getattr(record, field) != values[field] for field in fields):
+            for field, value in values.items():
+                setattr(record, field, value)
+            record.synced_at = now
+            updated.append(record)
+    deleted = [global_id for global_id in existing if global_id not in rows]
+    model.objects.bulk_create(created, batch_size=500)
+    model.objects.bulk_update(updated, fields + ("synced_at",), batch_size=500)
+    model.objects.filter(global_id__in=deleted).delete()
+    return {"created": len(created), "updated": len(updated), "deleted": len(deleted)}
+
+def sync_partners(model, partners: Iterable[dict], name: str) -> dict:
+    rows = {row["global_id"]: partner_fields(row) for row in partners}
+    if not rows and model.objects.exists():
+        raise RegistrySyncError(f"пустой список {name}")
+    return apply_changes(model, rows, PARTNER_FIELDS)
+
+def sync_courses(scos_courses: Iterable[dict], full: bool = False) -> dict:
+    """
+    Онлайн-курсы платформы: подробная информация запрашивается для новых и
+    измененных курсов, full - для всех курсов. Подробная информация
+    запрашивается после чтения списка, чтобы не открывать соединения во время
+    потокового получения списка
+    """
+    existing = {
+        course.global_id: course
+        for course in SCOSCourse.objects.only("global_id", "business_version", "data")
+    }
+    rows = {}
+    changed = []
+    for scos_course in scos_courses:
+        global_id = scos_course["global_id"]
+        current = existing.get(global_id)
+        version = scos_course.get("business_version")
+        if (full or current is None or not current.data.get("external_url")
+                or (version is not None and current.business_version != version)):
+            changed.append(scos_course)
+        else:
+            rows[global_id] = course_fields({**current.data, **scos_course})
+    if not rows and not changed and existing:
+        raise RegistrySyncError("пустой список онлайн-курсов")
+    for scos_course in changed:
+        detail = scos_get_course(scos_course["global_id"])
+        rows[scos_course["global_id"]] = course_fields({**scos_course, **(detail or {})})
+    stats = apply_changes(SCOSCourse, rows, COURSE_FIELDS)
+    stats["fetched"] = len(changed)
+    return stats
+
+def is_full_sync_due() -> bool:
+    last_full = SCOSRegistrySync.objects.filter(
+        status=SCOSRegistrySync.SUCCESS, full=True
+    ).first()
+    return last_full is None or (
+        last_full.started_at < timezone.now() - timedelta(seconds=FULL_SYNC_INTERVAL)
+    )
+
+def sync_registry(full: bool = False) -> Union[SCOSRegistrySync, None]:
+    """
+    Синхронизирует локальную копию реестра СЦОС, None - синхронизация уже
+    выполняется
+    """
+    if not cache.add(RUNNING_KEY, True, RUNNING_TIMEOUT):
+        LOGGER.info("СЦОС. Синхронизация реестра уже выполняется")
+        return None
+    full = full or is_full_sync_due()
+    sync = SCOSRegistrySync.objects.create(started_at=timezone.now(), full=full)
+    try:
+        sync.stats = {
+            "platforms": sync_partners(
+                SCOSPlatform, scos_iter_platforms(), "платформ"
+            ),
+            "rightholders": sync_partners(
+                SCOSRightholder, scos_iter_rightholders(), "Правообладателей"
+            ),
+            "courses": sync_courses(scos_iter_courses(), full),
+        }
+        sync.status = SCOSRegistrySync.SUCCESS
+        LOGGER.info("СЦОС. Реестр синхронизирован: %s", sync.stats)
+    except Exception as exception:  # pylint: disable=broad-except
+        sync.status = SCOSRegistrySync.FAILURE
+        sync.error = str(exception)
+        LOGGER.error("СЦОС. Ошибка синхронизации реестра: %s", exception)
+    finally:
+        sync.finished_at = timezone.now()
+        sync.save()
+        cache.delete(RUNNING_KEY)
+    old = SCOSRegistrySync.objects.values_list("id", flat=True)[SYNC_HISTORY:]
+    SCOSRegistrySync.objects.filter(id__in=list(old)).delete()
+    return sync
+
+def acquire_registry_sync() -> bool:
+    """
+    Блокировка запуска синхронизации, чтобы запуски с панели не повторялись
+    """
+    return cache.add(START_KEY, True, START_TIMEOUT)
+
+def set_registry_sync_token(token: str) -> None:
+    """
+    Задача registry_sync с другим токеном не повторяется: повторяется только
+    последняя запущенная цепочка задач
+    """
+    cache.set(TOKEN_KEY, token, None)
+
+def is_registry_sync_token(token: str) -> bool:
+    current = cache.get(TOKEN_KEY)
+    return current is None or current == token
+
+def get_registry_sync_status() -> dict:
+    """
+    Состояние локальной копии реестра для панели СЦОС
+    """
+    now = timezone.now()
+    last = SCOSRegistrySync.objects.first()
+    success = SCOSRegistrySync.objects.filter(status=SCOSRegistrySync.SUCCESS).first()
+    running = (
+        last is not None and last.status == SCOSRegistrySync.RUNNING
+        and last.started_at > now - timedelta(seconds=RUNNING_TIMEOUT)
+    )
+    synced_at = success.finished_at if success is not None else None
+    return {
+        "synced_at": synced_at,
+        "running": running,
+        "error": last.error if last is not None and last.status == SCOSRegistrySync.FAILURE else "",
+        "stale": not running and (
+            synced_at is None
+            or synced_at < now - timedelta(seconds=2 * SCOS_REGISTRY_SYNC_INTERVAL)
+        ),
+    }
+
+def courses_with_rightholders() -> QuerySet:
+    """
+    Онлайн-курсы с названием Правообладателя (institution_short_title)
+    """
+    return SCOSCourse.objects.annotate(
+        institution_short_title=Subquery(
+            SCOSRightholder.objects.filter(
+                global_id=OuterRef("institution_id")
+            ).values("short_title")[:1]
+        ),
+    )
+
+def get_registry_course(global_id: str) -> Union[dict, None]:
+    """
+    Подробная информация об онлайн-курсе: из локальной копии, курс, которого
+    еще нет в копии, запрашивается у СЦОС и сохраняется
+    """
+    course = SCOSCourse.objects.filter(global_id=global_id).first()
+    if course is not None:
+        return course.data
+    scos_course = scos_get_course(global_id)
+    if not isinstance(scos_course, dict) or scos_course.get("global_id") != global_id:
+        return None
+    save_registry_course(scos_course)
+    return scos_course
+
+def save_registry_course(scos_course: dict) -> None:
+    """
+    Сохраняет в локальную копию онлайн-курс платформы, полученный от СЦОС
+    """
+    if scos_course.get("partner_id") in (None, SCOS_PARTNER_ID):
+        SCOSCourse.objects.update_or_create(
+            global_id = scos_course["global_id"],
+            defaults = {**course_fields(scos_course), "synced_at": timezone.now()},
+        )
+
+@traced("find_registry_course")
+def find_registry_course(course_key: str) -> Union[dict, None]:
+    """
+    Онлайн-курс СЦОС курса платформы course_key: из локальной копии по
+    session_id, курс, которого еще нет в копии, ищется на СЦОС (не чаще
+    одного раза за SCOS_REGISTRY_SYNC_INTERVAL секунд) и сохраняется. Ошибка
+    поиска на СЦОС - SCOSError
+    """
+    course = SCOSCourse.objects.filter(session_id=str(course_key)).order_by("global_id").first()
+    if course is not None:
+        return course.data
+    missing_key = MISSING_KEY.format(course_key)
+    if cache.get(missing_key):
+        return None
+    scos_course = get_scos_course(course_key)
+    if not isinstance(scos_course, dict) or not scos_course.get("global_id"):
+        cache.set(missing_key, True, SCOS_REGISTRY_SYNC_INTERVAL)
+        return None
+    save_registry_course(scos_course)
+    return scos_course
+
+def get_registry_platform() -> Union[dict, None]:
+    """
+    Платформа СЦОС с идентификатором SCOS_PARTNER_ID
+    """
+    platform = SCOSPlatform.objects.filter(global_id=SCOS_PARTNER_ID).first()
+    return platform.data if platform is not None else None
+
+def get_registry_rightholders() -> Dict[str, dict]:
+    """
+    Словарь Правообладателей СЦОС, ключ - global_id
+    """
+    return {
+        rightholder.global_id: rightholder.data
+        for rightholder in SCOSRightholder.objects.all()
+    }
@@ -11,14 +11,32 @@ https://tech.online.edu.ru/files/api.pdf - Описание программны
 import os
 import codecs
 import logging
-from typing import Any, List
+from typing import Any, Iterable, Iterator, List, Union
 import yaml
 
 import requests
+import urllib3
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 from .course import (
     get_course_info_from_overview,
 )
+from .http_cache import (
+    cached_get,
+    invalidate,
+)
+from .scos_http import (
+    SCOSError,
+    scos_json,
+    scos_request,
+)
+from .tracing import (
+    traced,
+)
 
 
 LOGGER = logging.getLogger(__name__)
@@ -29,84 +47,82 @@ with codecs.open(CONFIG_FILE, encoding="utf-8") as f:
     SCOS_BASE_URL = __config__["SCOS_BASE_URL"]
     SCOS_X_CN_UUID = __config__["SCOS_X_CN_UUID"]
     SCOS_PARTNER_ID = __config__["SCOS_PARTNER_ID"]
+    SCOS_STREAM_RESPONSES = __config__.get("SCOS_STREAM_RESPONSES", False)
 HEADERS_GET = {
     "X-CN-UUID": SCOS_X_CN_UUID,
     "Accept": "application/json",
 }
+HEADERS_STREAM = {
+    **HEADERS_GET,
+    "Accept-Encoding": "gzip",
+}
 HEADERS = {
     "X-CN-UUID": SCOS_X_CN_UUID,
     "Content-type": "application/json",
     "Accept": "application/json",
 }
+# Отправка событий обучения: вид -> (метод, путь, описание)
+SCOS_WRITE_REQUESTS = {
+    "participation": (
+        "POST", "/api/v2/courses/participation", "Регистрация слушателя на курс",
+    ),
+    "participation_cancel": (
+        "DELETE", "/api/v2/courses/participation", "Отмена регистрации слушателя на курс",
+    ),
+    "results": (
+        "POST", "/api/v2/courses/results", "Публикация результатов обучения",
+    ),
+    "progress": (
+        "POST", "/api/v2/courses/results/progress", "Публикация прогрессов обучения",
+    ),
+}
 
 
 
-def scos_connection_check() -> str:
+def scos_fetch(method: str, url: str, cached: bool = False, **kwargs) -> Any:
     """
-    1. Проверка подключения к API тестового контура ГИС СЦОС
-    https://tech.online.edu.ru/files/3_apllication_instructions.pdf
+    Запрос к API СЦОС, возвращает ответ СЦОС (JSON). GET запрос с cached
+выполняется через HTTP кэш. Ошибки запроса и ответа - SCOSError (см. scos_http).
     """
     try:
-        response: requests.Response = requests.get(
-            url = f"{SCOS_BASE_URL}/api/v2/connections/check",
-            headers = HEADERS_GET,
-            timeout = 5.000,
-        )
-    except requests.exceptions.ConnectTimeout:
-        return "Connection timeout"
-    return str(response.status_code)
+        if cached:
+            response: requests.Response = cached_get(url=url, **kwargs)
+        else:
+            response = scos_request(method=method, url=url, **kwargs)
+    except requests.exceptions.RequestException as exception:
+        raise SCOSError.from_exception(exception) from exception
+    return scos_json(response)
 
-def scos_get_platforms() -> Any:
+def scos_fetch_or_none(description: str, method: str, url: str, **kwargs) -> Any:
     """
-    3.1.10. Список всех платформ
+    Запрос к API СЦОС (см. scos_fetch), при ошибке - None
     """
     try:
-        response: requests.Response = requests.get(
-            url = f"{SCOS_BASE_URL}/api/v2/registry/partners/platforms",
-            headers = HEADERS_GET,
-            timeout = 5.000,
-        )
-    except requests.exceptions.ConnectTimeout:
-        return None
-    try:
-        platforms = response.json()
-    except requests.exceptions.JSONDecodeError:
+        return scos_fetch(method, url, **kwargs)
+    except SCOSError as error:
+        LOGGER.warning("СЦОС api. %s: %s", description, error)
         return None
-    return platforms
 
-def scos_get_rightholders() -> Any:
+def scos_connection_check() -> str:
     """
-    3.1.11. Список всех Правообладателей
+    1. Проверка подключения к API тестового контура ГИС СЦОС
+    https://tech.online.edu.ru/files/3_apllication_instructions.pdf
     """
     try:
-        response: requests.Response = requests.get(
-            url = f"{SCOS_BASE_URL}/api/v2/registry/partners/rightholders",
+        response: requests.Response = scos_request(
+            method = "GET",
+            url = f"{SCOS_BASE_URL}/api/v2/connections/check",
             headers = HEADERS_GET,
-            timeout = 5.000,
         )
-    except requests.exceptions.ConnectTimeout:
-        return None
-    try:
-        rightholders = response.json()
-    except requests.exceptions.JSONDecodeError:
-        return None
-    return rightholders
-
-def scos_partners_dict(partners: dict) -> dict:
-    """
-    Возвращает словарь из списка, ключ - global_id
-    """
-    partners = {row["global_id"]: row for row in partners["rows"]}
-    return partners
+    except requests.exceptions.Timeout:
+        return "Connection timeout"
+    except requests.exceptions.RequestException as exception:
+        return str(SCOSError.from_exception(exception))
+    return str(response.status_code)
 
-def scos_get_courses(**kwargs) -> Any:
+def scos_courses_params(**kwargs) -> dict:
     """
-    3.1.14. Список онлайн-курсов
-    
-    Возвращает список онлайн-курсов. Дополнительно можно задать параметры
-фильтра для следующих атрибутов: language, institution_id, partner_id,
-direction_id, activity_id. По умолчанию используется фильтр по идентификатору
-платформы - partner_id.
+    Параметры фильтра списка онлайн-курсов, см. scos_iter_courses
     """
     params = {"partner_id": SCOS_PARTNER_ID}
     options: set[str] = {
@@ -118,104 +134,176 @@ direction_id, activity_id. По умолчанию используется фи
     }
     for option in options:
         if option in kwargs:
-            params.update(option=kwargs[option])
+            params.update({option: kwargs[option]})
+    return params
+
+def scos_stream_items(
+    url: str,
+    prefix: str,
+    params: Union[dict, None] = None,
+) -> Iterator[dict]:
+    """
+    Потоковый разбор ответа СЦОС: ответ запрашивается в gzip и разбирается
+по мере получения, элементы массива prefix ("results", "rows") возвращаются
+по одному. Ошибки запроса, ответа и разбора - SCOSError.
+    """
     try:
-        response: requests.Response = requests.get(
-            url = f"{SCOS_BASE_URL}/api/v2/registry/courses",
-            headers = HEADERS_GET,
+        with scos_request(
+            method = "GET",
+            url = url,
+            headers = HEADERS_STREAM,
             params = params,
-            timeout = 5.000,
-        )
-    except requests.exceptions.ConnectTimeout:
-        return None
-    try:
-        scos_courses = response.json()
-    except requests.exceptions.JSONDecodeError:
-        return None
-    return scos_courses
+            stream = True,
+        ) as response:
+            if not response.ok:
+                scos_json(response)
+            response.raw.decode_content = True
+            yield from ijson.items(response.raw, f"{prefix}.item", use_float=True)
+    except requests.exceptions.RequestException as exception:
+        raise SCOSError.from_exception(exception) from exception
+    except urllib3.exceptions.HTTPError as exception:
+        # Соединение разорвано во время чтения ответа
+        raise SCOSError(SCOSError.CONNECTION, str(exception)) from exception
+    except ijson.JSONError as exception:
+        raise SCOSError(SCOSError.RESPONSE, str(exception)) from exception
+
+def scos_iter_items(url: str, prefix: str, params: Union[dict, None] = None) -> Iterator[dict]:
+    """
+    Итератор по элементам массива prefix ответа СЦОС: потоковый разбор при
+SCOS_STREAM_RESPONSES, иначе ответ через HTTP кэш. Ошибки - SCOSError.
+    """
+    if SCOS_STREAM_RESPONSES and ijson is not None:
+        yield from scos_stream_items(url, prefix, params)
+        return
+    yield from scos_fetch(
+        method = "GET",
+        url = url,
+        cached = True,
+        headers = HEADERS_GET,
+        params = params,
+    ).get(prefix, [])
+
+def scos_iter_platforms() -> Iterator[dict]:
+    """
+    Итератор по списку всех платформ (3.1.10), ошибки - SCOSError
+    """
+    yield from scos_iter_items(
+        f"{SCOS_BASE_URL}/api/v2/registry/partners/platforms",
+        "rows",
+    )
+
+def scos_iter_rightholders() -> Iterator[dict]:
+    """
+    Итератор по списку всех Правообладателей (3.1.11), ошибки - SCOSError
+    """
+    yield from scos_iter_items(
+        f"{SCOS_BASE_URL}/api/v2/registry/partners/rightholders",
+        "rows",
+    )
+
+def scos_iter_courses(**kwargs) -> Iterator[dict]:
+    """
+    3.1.14. Список онлайн-курсов
+
+    Итератор по списку онлайн-курсов, ошибки - SCOSError. Дополнительно можно
+    задать параметры фильтра для следующих атрибутов: language, institution_id,
+    partner_id, direction_id, activity_id. По умолчанию используется фильтр по
+    идентификатору платформы - partner_id.
+    """
+    yield from scos_iter_items(
+        f"{SCOS_BASE_URL}/api/v2/registry/courses",
+        "results",
+        scos_courses_params(**kwargs),
+    )
 
 def scos_get_course(global_id: str) -> Any:
     """
     3.1.15. Получение одного онлайн-курса
     """
-    try:
-        response: requests.Response = requests.get(
-            url = f"{SCOS_BASE_URL}/api/v2/registry/courses/{global_id}",
-            headers = HEADERS_GET,
-            timeout = 5.000,
-        )
-    except requests.exceptions.ConnectTimeout:
-        return None
-    try:
-        course_info = response.json()
-    except requests.exceptions.JSONDecodeError:
-        return None
-    return course_info
+    return scos_fetch_or_none(
+        f"Онлайн-курс {global_id}",
+        method = "GET",
+        url = f"{SCOS_BASE_URL}/api/v2/registry/courses/{global_id}",
+        cached = True,
+        headers = HEADERS_GET,
+    )
+
+def scos_send_package(method: str, items: List[dict]) -> Any:
+    """
+    Пакет онлайн-курсов: POST - добавление, PUT - обновление (items с "id").
+    Ошибки запроса - SCOSError. После отправки сохраненные ответы списка и
+    онлайн-курсов пакета удаляются из HTTP кэша
+    """
+    response = scos_fetch(
+        method = method,
+        url = f"{SCOS_BASE_URL}/api/v2/registry/courses",
+        json = {
+            "partner_id": SCOS_PARTNER_ID,
+            "package": {
+                "items": items
+            }
+        },
+        headers = HEADERS,
+    )
+    invalidate_courses(item["id"] for item in items if item.get("id"))
+    return response
+
+def invalidate_courses(global_ids: Iterable[str]) -> None:
+    """
+    Удаляет из HTTP кэша список онлайн-курсов платформы (3.1.14) и онлайн-курсы
+    global_ids (3.1.15)
+    """
+    invalidate(
+        f"{SCOS_BASE_URL}/api/v2/registry/courses",
+        HEADERS_GET,
+        scos_courses_params(),
+    )
+    for global_id in global_ids:
+        invalidate(f"{SCOS_BASE_URL}/api/v2/registry/courses/{global_id}", HEADERS_GET)
+
+def scos_send_course(course_info: dict, global_id: Union[str, None] = None) -> Any:
+    """
+    3.1.5. Добавление онлайн-курса, 3.1.6. Обновление онлайн-курса (global_id).
+    Ошибки запроса - SCOSError
+    """
+    if global_id is not None:
+        course_info.update({"id": global_id})
+    return scos_send_package("POST" if global_id is None else "PUT", [course_info])
+
+def scos_put_courses(items: List[dict]) -> Any:
+    """
+    3.1.6. Обновление нескольких онлайн-курсов одним пакетом (items с "id").
+    Ошибки запроса - SCOSError
+    """
+    return scos_send_package("PUT", items)
 
 def scos_post_course(course_info: dict) -> Any:
     """
     3.1.5. Добавление онлайн-курса
     """
-    url = f"{SCOS_BASE_URL}/api/v2/registry/courses"
-    payload = {
-        "partner_id": SCOS_PARTNER_ID,
-        "package": {
-            "items": [course_info]
-        }
-    }
     try:
-        response: requests.Response = requests.post(
-            url = url,
-            json = payload,
-            headers = HEADERS,
-            timeout = 5.000,
-        )
-    except requests.exceptions.ConnectTimeout:
-        return None
-    try:
-        scos_response = response.json()
-    except requests.exceptions.JSONDecodeError:
+        return scos_send_course(course_info)
+    except SCOSError as error:
+        LOGGER.warning("СЦОС api. Добавление онлайн-курса: %s", error)
         return None
-    return scos_response
 
 def scos_put_course(course_info: dict, global_id:str) -> Any:
     """
     3.1.6. Обновление онлайн-курса
     """
-    url = f"{SCOS_BASE_URL}/api/v2/registry/courses"
-    course_info.update({"id": global_id})
-    payload = {
-        "partner_id": SCOS_PARTNER_ID,
-        "package": {
-            "items": [course_info]
-        }
-    }
     try:
-        response: requests.Response = requests.put(
-            url = url,
-            json = payload,
-            headers = HEADERS,
-            timeout = 5.000,
-        )
-    except requests.exceptions.ConnectTimeout:
-        return None
-    try:
-        scos_response = response.json()
-    except requests.exceptions.JSONDecodeError:
+        return scos_send_course(course_info, global_id)
+    except SCOSError as error:
+        LOGGER.warning("СЦОС api. Обновление онлайн-курса %s: %s", global_id, error)
         return None
-    return scos_response
 
-def scos_post_participation(
+def scos_participation_object(
         course_id: str,
         session_id: str,
         user_id: str,
         enroll_date: str,
         **kwargs
-) -> Any:
-    """
-    4.1.1.2. Регистрация списка слушателей на курс
-    """
-    url = f"{SCOS_BASE_URL}/api/v2/courses/participation"
+) -> dict:
     registration_object: dict = {
         "course_id": course_id,
         "session_id": session_id,
@@ -225,68 +313,21 @@ def scos_post_participation(
     options: set[str] = {"session_start", "session_end"}
     for option in options:
         if option in kwargs:
-            registration_object.update(option=kwargs[option])
-    LOGGER.info(
-        "СЦОС api. Регистрация слушателя на курс: %s",
-        registration_object
-    )
-    try:
-        response: requests.Response = requests.post(
-            url = url,
-            json = [registration_object,],
-            headers = HEADERS,
-            timeout = 5.000,
-        )
-    except requests.exceptions.ConnectTimeout:
-        return None
-    try:
-        scos_response = response.json()
-        LOGGER.info(
-            "СЦОС api. Регистрация слушателя на курс, ответ СЦОС: %s",
-            scos_response
-        )
-    except requests.exceptions.JSONDecodeError:
-        return None
-    return scos_response
+            registration_object.update({option: kwargs[option]})
+    return registration_object
 
-def scos_delete_participation(
+def scos_participation_cancel_object(
     course_id: str,
     session_id: str,
     user_id: str,
-) -> Any:
-    """
-    4.1.1.5. Отмена регистрации слушателя на курсе
-    """
-    url = f"{SCOS_BASE_URL}/api/v2/courses/participation"
-    cancellation_object: dict = {
+) -> dict:
+    return {
             "course_id": course_id,
             "session_id": session_id,
             "user_id": user_id,
     }
-    LOGGER.info(
-        "СЦОС api. Отмена регистрации пользователя на курс: %s",
-        cancellation_object
-    )
-    try:
-        response: requests.Response = requests.delete(
-            url = url,
-            json = [cancellation_object,],
-            headers = HEADERS,
-            timeout = 5.000,
-        )
-    except requests.exceptions.ConnectTimeout:
-        return None
-    try:
-        scos_response = response.json()
-        LOGGER.info(
-            "СЦОС api. Отмена регистрации слушателя на курс, ответ СЦОС: %s",
-            scos_response
-        )
-    except requests.exceptions.JSONDecodeError:
-        return None
-    return scos_response
 
-def scos_post_subsection_grade(
+def scos_subsection_grade_object(
     course_id: str,
     session_id: str,
     user_id: str,
@@ -294,12 +335,8 @@ def scos_post_subsection_grade(
     rating: float,
     checkpoint_name: str,
     checkpoint_id: str,
-) -> Any:
-    """
-    4.1.2.3. Публикация результатов обучения
-    """
-    url = f"{SCOS_BASE_URL}/api/v2/courses/results"
-    subsection_grade_object: dict = {
+) -> dict:
+    return {
             "course_id": course_id,
             "session_id": session_id,
             "user_id": user_id,
@@ -308,29 +345,100 @@ def scos_post_subsection_grade(
             "checkpoint_name": checkpoint_name,
             "checkpoint_id": checkpoint_id,
     }
+
+def scos_course_grade_object(
+    course_id: str,
+    session_id: str,
+    user_id: str,
+    progress: float,
+) -> dict:
+    return {
+            "course_id": course_id,
+            "session_id": session_id,
+            "user_id": user_id,
+            "progress": progress,
+    }
+
+def scos_write_request(kind: str, item: dict) -> dict:
+    """
+    Параметры запроса отправки события обучения вида kind (SCOS_WRITE_REQUESTS)
+    """
+    method, path, description = SCOS_WRITE_REQUESTS[kind]
+    LOGGER.info("СЦОС api. %s: %s", description, item)
+    return {
+        "method": method,
+        "url": f"{SCOS_BASE_URL}{path}",
+        "json": [item,],
+        "headers": HEADERS,
+    }
+
+def scos_write_response(kind: str, scos_response: Any) -> Any:
     LOGGER.info(
-        "СЦОС api. Публикация результатов обучения: %s",
-        subsection_grade_object
+        "СЦОС api. %s, ответ СЦОС: %s",
+        SCOS_WRITE_REQUESTS[kind][2],
+        scos_response
     )
-    try:
-        response: requests.Response = requests.post(
-            url = url,
-            json = [subsection_grade_object,],
-            headers = HEADERS,
-            timeout = 5.000,
-        )
-    except requests.exceptions.ConnectTimeout:
-        return None
-    try:
-        scos_response = response.json()
-        LOGGER.info(
-            "СЦОС api. Публикация результатов обучения, ответ СЦОС: %s",
-            scos_response
-        )
-    except requests.exceptions.JSONDecodeError:
-        return None
     return scos_response
 
+def scos_write(kind: str, item: dict) -> Any:
+    """
+    Отправляет на СЦОС событие обучения вида kind (SCOS_WRITE_REQUESTS)
+    """
+    scos_response = scos_fetch_or_none(
+        SCOS_WRITE_REQUESTS[kind][2],
+        **scos_write_request(kind, item),
+    )
+    if scos_response is None:
+        return None
+    return scos_write_response(kind, scos_response)
+
+def scos_post_participation(
+        course_id: str,
+        session_id: str,
+        user_id: str,
+        enroll_date: str,
+        **kwargs
+) -> Any:
+    """
+    4.1.1.2. Регистрация списка слушателей на курс
+    """
+    return scos_write(
+        "participation",
+        scos_participation_object(course_id, session_id, user_id, enroll_date, **kwargs),
+    )
+
+def scos_delete_participation(
+    course_id: str,
+    session_id: str,
+    user_id: str,
+) -> Any:
+    """
+    4.1.1.5. Отмена регистрации слушателя на курсе
+    """
+    return scos_write(
+        "participation_cancel",
+        scos_participation_cancel_object(course_id, session_id, user_id),
+    )
+
+def scos_post_subsection_grade(
+    course_id: str,
+    session_id: str,
+    user_id: str,
+    date: str,
+    rating: float,
+    checkpoint_name: str,
+    checkpoint_id: str,
+) -> Any:
+    """
+    4.1.2.3. Публикация результатов обучения
+    """
+    return scos_write(
+        "results",
+        scos_subsection_grade_object(
+            course_id, session_id, user_id, date, rating, checkpoint_name, checkpoint_id,
+        ),
+    )
+
 def scos_post_course_grade(
     course_id: str,
     session_id: str,
@@ -340,51 +448,41 @@ def scos_post_course_grade(
     """
     4.1.2.6. Публикация прогрессов обучения
     """
-    url = f"{SCOS_BASE_URL}/api/v2/courses/results/progress"
-    course_grade_object: dict = {
-            "course_id": course_id,
-            "session_id": session_id,
-            "user_id": user_id,
-            "progress": progress,
-    }
-    LOGGER.info(
-        "СЦОС api. Публикация прогрессов обучения: %s",
-        course_grade_object
+    return scos_write(
+        "progress",
+        scos_course_grade_object(course_id, session_id, user_id, progress),
     )
-    try:
-        response: requests.Response = requests.post(
-            url = url,
-            json = [course_grade_object,],
-            headers = HEADERS,
-            timeout = 5.000,
-        )
-    except requests.exceptions.ConnectTimeout:
-        return None
-    try:
-        scos_response = response.json()
-        LOGGER.info(
-            "СЦОС api. Публикация прогрессов обучения, ответ СЦОС: %s",
-            scos_response
-        )
-    except requests.exceptions.JSONDecodeError:
-        return None
-    return scos_response
 
+def find_scos_course(
+    scos_courses: Iterable[dict],
+    course_info_from_overview: dict,
+) -> Any:
+    """
+    Ищет в списке онлайн-курсов СЦОС курс с соответствующим названием и
+расположением, возвращает подробную информацию о курсе. Подробная информация
+запрашивается после чтения списка, чтобы не открывать соединения во время
+потокового получения списка.
+    """
+    global_ids = [
+        course["global_id"] for course in scos_courses
+        if course.get("title") == course_info_from_overview["title"]
+    ]
+    for global_id in global_ids:
+        course_in_detail = scos_get_course(global_id)
+        if (isinstance(course_in_detail, dict) and
+            course_in_detail.get("external_url") ==
+            course_info_from_overview["external_url"]):
+            return course_in_detail
+    return None
+
+@traced("get_scos_course")
 def get_scos_course(course_key) -> Any:
     """
     Возвращает подробную информацию об одном онлайн курсе со СЦОС если курс
-с соответствующим названием и расположением найден.
+с соответствующим названием и расположением найден. Ошибки получения списка
+онлайн-курсов - SCOSError.
     """
     course_info_from_overview = get_course_info_from_overview(course_key)
     if course_info_from_overview is None:
         return None
-    scos_courses = scos_get_courses()
-    if scos_courses is None:
-        return None
-    for course in scos_courses["results"]:
-        if course["title"] == course_info_from_overview["title"]:
-            course_in_detail = scos_get_course(course["global_id"])
-            if (course_in_detail["external_url"] ==
-                course_info_from_overview["external_url"]):
-                return course_in_detail
-    return None
+    return find_scos_course(scos_iter_courses(), course_info_from_overview)
@@ -0,0 +1,213 @@
+"""
+HTTP запросы к API СЦОС.
+
+Все запросы scos_api и HTTP кэша выполняются через scos_request: здесь
+подключаются запись трафика (см. recorder), трассировка (см. tracing) и
+профилирование (см. profiling), копия запроса отправляется на второй контур
+СЦОС (см. shadow). Таймауты запроса задаются бюджетом времени
+вызывающего кода (см. deadline).
+
+Повторный (hedged) GET запрос: если СЦОС не ответил за SCOS_HEDGE_DELAY
+секунд, тот же запрос отправляется второй раз, используется первый
+полученный ответ. SCOS_HEDGE_DELAY: 0 - повторные запросы не отправляются.
+
+Ошибки запросов классифицируются (SCOSError.kind): бюджет времени исчерпан,
+таймаут, ошибка соединения, ошибка запроса (4xx), ошибка СЦОС (5xx),
+некорректный ответ, отправка приостановлена выключателем.
+"""
+
+import os
+import codecs
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Union
+from urllib.parse import urlsplit
+import yaml
+
+import requests
+
+from .deadline import (
+    DeadlineExceeded,
+    remaining,
+    request_timeout,
+)
+from .profiling import record_http
+from .recorder import record_request
+from .shadow import mirror_request
+from .tracing import span
+
+
+
+CONFIG_FILE = os.environ["CMS_CFG"]
+with codecs.open(CONFIG_FILE, encoding="utf-8") as f:
+    __config__ = yaml.safe_load(f)
+    SCOS_HEDGE_DELAY = __config__.get("SCOS_HEDGE_DELAY", 0)
+
+HEDGE_THREADS = 32
+EXECUTOR = ThreadPoolExecutor(max_workers=HEDGE_THREADS, thread_name_prefix="scos-hedge")
+
+
+
+class SCOSError(Exception):
+    """
+    Ошибка запроса к API СЦОС, kind - вид ошибки
+    """
+    DEADLINE = "deadline"
+    TIMEOUT = "timeout"
+    CONNECTION = "connection"
+    CLIENT = "client"
+    SERVER = "server"
+    RESPONSE = "response"
+    # Запрос не выполнялся: выключатель отправки разомкнут (см. circuit)
+    CIRCUIT = "circuit"
+    # Запрос можно повторить позже
+    RETRYABLE = (DEADLINE, TIMEOUT, CONNECTION, SERVER, CIRCUIT)
+
+    def __init__(self, kind: str, message: str, status: Union[int, None] = None, body: Any = None):
+        super().__init__(message)
+        self.kind = kind
+        self.status = status
+        self.body = body
+
+    def __str__(self) -> str:
+        if self.status is None:
+            return f"{self.kind}: {self.args[0]}"
+        return f"{self.kind} ({self.status}): {self.args[0]}"
+
+    @property
+    def retryable(self) -> bool:
+        return self.kind in self.RETRYABLE
+
+    def as_dict(self) -> dict:
+        return {
+            "error": self.kind,
+            "status": self.status,
+            "message": self.args[0],
+            "body": self.body,
+        }
+
+    @classmethod
+    def from_exception(cls, exception: requests.exceptions.RequestException) -> "SCOSError":
+        if isinstance(exception, DeadlineExceeded):
+            kind = cls.DEADLINE
+        elif isinstance(exception, requests.exceptions.Timeout):
+            kind = cls.TIMEOUT
+        elif isinstance(exception, requests.exceptions.ConnectionError):
+            kind = cls.CONNECTION
+        else:
+            kind = cls.CLIENT
+        return cls(kind, str(exception))
+
+
+
+def scos_json(response: requests.Response) -> Any:
+    """
+    Ответ СЦОС (JSON), ошибочный статус или некорректный ответ - SCOSError
+    """
+    try:
+        body = response.json()
+    except requests.exceptions.JSONDecodeError:
+        body = None
+    if response.status_code >= 500:
+        raise SCOSError(SCOSError.SERVER, response.reason or "", response.status_code, body)
+    if response.status_code >= 400:
+        raise SCOSError(SCOSError.CLIENT, response.reason or "", response.status_code, body)
+    if body is None and not response.content.strip():
+        return {}
+    if body is None:
+        raise SCOSError(
+            SCOSError.RESPONSE,
+            response.text[:200],
+            response.status_code,
+        )
+    return body
+
+def send_request(method: str, url: str, kwargs: dict, hedge: bool = False) -> requests.Response:
+    with span("http", method=method, path=urlsplit(url).path) as current:
+        started = time.time()
+        start = time.perf_counter()
+        try:
+            response: requests.Response = requests.request(method, url, **kwargs)
+        except requests.exceptions.RequestException as exception:
+            elapsed = time.perf_counter() - start
+            record_request(
+                method, url, kwargs, started, elapsed, exception=exception,
+            )
+            record_http(method, url, elapsed, exception=exception)
+            raise
+        elapsed = time.perf_counter() - start
+        record_request(
+            method, url, kwargs, started, elapsed, response=response,
+        )
+        record_http(method, url, elapsed, status=response.status_code)
+        if current is not None:
+            current.set_attribute("status", response.status_code)
+            if hedge:
+                current.set_attribute("hedge", True)
+        return response
+
+def close_response(future: Future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+def hedged_request(method: str, url: str, kwargs: dict) -> requests.Response:
+    """
+    GET запрос с повторной отправкой, если ответа нет SCOS_HEDGE_DELAY секунд
+    """
+    first = EXECUTOR.submit(
+        contextvars.copy_context().run, send_request, method, url, kwargs,
+    )
+    done, _ = wait((first,), timeout=SCOS_HEDGE_DELAY)
+    if done:
+        return first.result()
+    pending = {
+        first,
+        EXECUTOR.submit(
+            contextvars.copy_context().run, send_request, method, url, kwargs, True,
+        ),
+    }
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is not None:
+                error = future.exception()
+                continue
+            for other in pending:
+                other.add_done_callback(close_response)
+            return future.result()
+    raise error
+
+def scos_request(method: str, url: str, **kwargs) -> requests.Response:
+    """
+    Выполняет HTTP запрос к API СЦОС, параметры как у requests.request.
+    Таймаут по умолчанию - в пределах бюджета времени (см. deadline).
+    Исключения requests не перехватываются.
+    """
+    if kwargs.get("timeout") is None:
+        kwargs["timeout"] = request_timeout()
+    left = remaining()
+    started = time.time()
+    start = time.perf_counter()
+    try:
+        if (SCOS_HEDGE_DELAY > 0 and method == "GET" and not kwargs.get("stream")
+                and (left is None or left > SCOS_HEDGE_DELAY)):
+            response = hedged_request(method, url, kwargs)
+        else:
+            response = send_request(method, url, kwargs)
+    except requests.exceptions.RequestException as exception:
+        mirror_request(
+            method, url, kwargs, started, time.perf_counter() - start, exception=exception,
+        )
+        raise
+    mirror_request(
+        method,
+        url,
+        kwargs,
+        started,
+        time.perf_counter() - start,
+        status = response.status_code,
+        content = None if kwargs.get("stream") else response.content,
+    )
+    return response
@@ -0,0 +1,413 @@
+"""
+Теневая отправка запросов ко второму контуру СЦОС.
+
+При заданном SCOS_SHADOW_BASE_URL копия каждого запроса к API СЦОС после
+ответа основного контура (SCOS_BASE_URL) добавляется в очередь процесса
+(SCOS_SHADOW_QUEUE_SIZE) и отправляется на второй контур фоновыми потоками
+(SCOS_SHADOW_THREADS) через отдельный пул соединений, с заголовком X-CN-UUID
+SCOS_SHADOW_X_CN_UUID. Основной запрос не ожидает второй контур. Отправка
+копий ограничена SCOS_SHADOW_RATE запросов в секунду (token bucket, до
+SCOS_SHADOW_BURST запросов подряд); если очередь заполнена, копия
+отбрасывается.
+
+Ответы контуров сравниваются (статус, тело JSON без полей
+SCOS_SHADOW_IGNORE_FIELDS), результат дописывается в файлы JSON Lines
+SCOS_SHADOW_PATH/shadow-<host>-<pid>.jsonl (тела запросов и ответов не
+записываются, только пути различающихся полей):
+    {"t": время, "m": метод, "p": путь, "s": статус основного контура,
+     "ss": статус второго контура, "ms": длительность основного запроса,
+     "sms": длительность копии, "r": результат сравнения, "d": пути
+     различающихся полей, "x": исключение, "dr": отброшено копий}
+
+Отчет о различиях: ./manage.py cms scos_shadow_report.
+"""
+
+import os
+import codecs
+import glob
+import json
+import logging
+import queue
+import re
+import socket
+import threading
+import time
+from collections import Counter, defaultdict
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
+from urllib.parse import urlsplit
+import yaml
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+
+LOGGER = logging.getLogger(__name__)
+
+CONFIG_FILE = os.environ["CMS_CFG"]
+with codecs.open(CONFIG_FILE, encoding="utf-8") as f:
+    __config__ = yaml.safe_load(f)
+    SCOS_BASE_URL = __config__["SCOS_BASE_URL"]
+    SCOS_SHADOW_BASE_URL = __config__.get("SCOS_SHADOW_BASE_URL", "")
+    SCOS_SHADOW_X_CN_UUID = __config__.get("SCOS_SHADOW_X_CN_UUID", "")
+    SCOS_SHADOW_RATE = __config__.get("SCOS_SHADOW_RATE", 10)
+    SCOS_SHADOW_BURST = __config__.get("SCOS_SHADOW_BURST", 20)
+    SCOS_SHADOW_QUEUE_SIZE = __config__.get("SCOS_SHADOW_QUEUE_SIZE", 1000)
+    SCOS_SHADOW_THREADS = __config__.get("SCOS_SHADOW_THREADS", 4)
+    SCOS_SHADOW_TIMEOUT = __config__.get("SCOS_SHADOW_TIMEOUT", 10)
+    SCOS_SHADOW_IGNORE_FIELDS = __config__.get("SCOS_SHADOW_IGNORE_FIELDS", [])
+    SCOS_SHADOW_PATH = __config__.get("SCOS_SHADOW_PATH", "/openedx/data/scos/shadow")
+
+SHADOW_MAX_BYTES = 64 * 1024 * 1024
+SHADOW_BACKUPS = 4
+# Различающихся полей в записи сравнения
+MAX_DIFF_PATHS = 20
+# Заголовки условных запросов HTTP кэша не копируются: тело ответа второго
+# контура нужно для сравнения
+SKIPPED_HEADERS = ("if-none-match", "if-modified-since")
+# Параметры запроса, которые копируются
+REQUEST_KWARGS = ("params", "json", "data", "headers")
+
+# Результаты сравнения, ERROR - запрос к одному из контуров не выполнен
+SAME = "same"
+STATUS = "status"
+BODY = "body"
+ERROR = "error"
+# Тело ответа основного контура не прочитано (потоковый ответ, 304)
+UNCOMPARED = "uncompared"
+
+# Сегмент пути - идентификатор (UUID, число), в отчете заменяется на {id}
+ID_SEGMENT = re.compile(r"^(\d+|[0-9a-fA-F-]{32,36})$")
+# Различающихся полей в строке отчета
+REPORT_DIFF_PATHS = 5
+
+_LOCK = threading.Lock()
+_SENDER: dict = {"sender": None}
+
+
+
+class TokenBucket:
+    """
+    Ограничение частоты: rate запросов в секунду, до burst запросов подряд
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        """
+        Ожидает свободный запрос
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+
+# (метод, путь и параметры URL, параметры запроса, статус основного контура,
+#  тело основного контура, длительность основного запроса, исключение, время)
+Item = Tuple[str, str, dict, Union[int, None], Union[bytes, None], float, Union[str, None], float]
+
+
+
+class ShadowSender:
+    """
+    Очередь копий запросов с фоновой отправкой на второй контур СЦОС
+    """
+
+    def __init__(self) -> None:
+        self.pid: Union[int, None] = None
+        self.queue: queue.Queue = queue.Queue(SCOS_SHADOW_QUEUE_SIZE)
+        self.bucket = TokenBucket(SCOS_SHADOW_RATE, SCOS_SHADOW_BURST)
+        self.session = requests.Session()
+        self.handler: Union[RotatingFileHandler, None] = None
+        self.dropped = 0
+        self.dropped_lock = threading.Lock()
+
+    def ensure_started(self) -> None:
+        """
+        Запускает фоновые потоки (после fork процесса - заново)
+        """
+        pid = os.getpid()
+        if self.pid == pid:
+            return
+        with _LOCK:
+            if self.pid == pid:
+                return
+            self.queue = queue.Queue(SCOS_SHADOW_QUEUE_SIZE)
+            self.bucket = TokenBucket(SCOS_SHADOW_RATE, SCOS_SHADOW_BURST)
+            self.session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections = 1,
+                pool_maxsize = SCOS_SHADOW_THREADS,
+            )
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+            os.makedirs(SCOS_SHADOW_PATH, exist_ok=True)
+            self.handler = RotatingFileHandler(
+                os.path.join(SCOS_SHADOW_PATH, f"shadow-{socket.gethostname()}-{pid}.jsonl"),
+                maxBytes = SHADOW_MAX_BYTES,
+                backupCount = SHADOW_BACKUPS,
+                encoding = "utf-8",
+                delay = True,
+            )
+            for number in range(SCOS_SHADOW_THREADS):
+                threading.Thread(
+                    target=self.run, name=f"scos-shadow-{number}", daemon=True,
+                ).start()
+            self.pid = pid
+
+    def submit(self, item: Item) -> None:
+        """
+        Добавляет копию запроса в очередь, при переполнении - отбрасывает
+        """
+        self.ensure_started()
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            with self.dropped_lock:
+                self.dropped += 1
+
+    def take_dropped(self) -> int:
+        with self.dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        return dropped
+
+    def send(self, item: Item) -> dict:
+        """
+        Отправляет копию запроса на второй контур и сравнивает ответы
+        """
+        method, path, kwargs, status, content, elapsed, exception, started = item
+        record = {
+            "t": round(started, 6),
+            "m": method,
+            "p": urlsplit(path).path,
+            "s": status,
+            "ms": round(elapsed * 1000, 3),
+            "x": exception,
+        }
+        self.bucket.wait()
+        start = time.perf_counter()
+        try:
+            response = self.session.request(
+                method,
+                f"{SCOS_SHADOW_BASE_URL}{path}",
+                timeout = SCOS_SHADOW_TIMEOUT,
+                **kwargs,
+            )
+        except requests.exceptions.RequestException as shadow_exception:
+            record["sms"] = round((time.perf_counter() - start) * 1000, 3)
+            record["sx"] = type(shadow_exception).__name__
+            record["r"] = ERROR
+            return record
+        record["sms"] = round((time.perf_counter() - start) * 1000, 3)
+        record["ss"] = response.status_code
+        if status is None:
+            record["r"] = ERROR
+        elif status != response.status_code:
+            record["r"] = STATUS
+        elif content is None:
+            record["r"] = UNCOMPARED
+        else:
+            differences = diff_paths(parse_body(content), parse_body(response.content))
+            record["r"] = BODY if differences else SAME
+            if differences:
+                record["d"] = differences
+        return record
+
+    def write(self, record: dict) -> None:
+        dropped = self.take_dropped()
+        if dropped:
+            record["dr"] = dropped
+        try:
+            line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+            self.handler.handle(logging.makeLogRecord({"msg": line}))
+        except Exception as exception:  # pylint: disable=broad-except
+            LOGGER.warning("Не получилось записать сравнение ответов СЦОС: %s", exception)
+
+    def run(self) -> None:
+        while True:
+            item = self.queue.get()
+            try:
+                self.write(self.send(item))
+            except Exception as exception:  # pylint: disable=broad-except
+                LOGGER.exception("СЦОС. Ошибка теневой отправки: %s", exception)
+            finally:
+                self.queue.task_done()
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """
+        Ожидает отправки копий из очереди
+        """
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+
+def parse_body(content: bytes) -> Any:
+    try:
+        return json.loads(content)
+    except ValueError:
+        return content.decode("utf-8", errors="replace").strip()
+
+def diff_paths(primary: Any, shadow: Any, path: str = "") -> List[str]:
+    """
+    Пути различающихся полей тел ответов, поля SCOS_SHADOW_IGNORE_FIELDS не
+    сравниваются
+    """
+    if isinstance(primary, dict) and isinstance(shadow, dict):
+        differences = []
+        for key in sorted(set(primary) | set(shadow)):
+            if key in SCOS_SHADOW_IGNORE_FIELDS:
+                continue
+            differences.extend(
+                diff_paths(primary.get(key), shadow.get(key), f"{path}.{key}" if path else key)
+            )
+        return differences[:MAX_DIFF_PATHS]
+    if isinstance(primary, list) and isinstance(shadow, list):
+        if len(primary) != len(shadow):
+            return [f"{path}[]"]
+        differences = []
+        for index, (primary_item, shadow_item) in enumerate(zip(primary, shadow)):
+            differences.extend(diff_paths(primary_item, shadow_item, f"{path}[{index}]"))
+        return differences[:MAX_DIFF_PATHS]
+    return [] if primary == shadow else [path or "."]
+
+def shadow_kwargs(kwargs: dict) -> dict:
+    """
+    Параметры копии запроса: X-CN-UUID второго контура, без заголовков
+    условного запроса
+    """
+    copy = {key: kwargs[key] for key in REQUEST_KWARGS if kwargs.get(key) is not None}
+    if "headers" in copy:
+        headers = {
+            name: value for name, value in copy["headers"].items()
+            if name.lower() not in SKIPPED_HEADERS
+        }
+        if "X-CN-UUID" in headers:
+            headers["X-CN-UUID"] = SCOS_SHADOW_X_CN_UUID
+        copy["headers"] = headers
+    return copy
+
+def get_sender() -> ShadowSender:
+    sender = _SENDER["sender"]
+    if sender is None:
+        with _LOCK:
+            if _SENDER["sender"] is None:
+                _SENDER["sender"] = ShadowSender()
+            sender = _SENDER["sender"]
+    return sender
+
+def mirror_request(
+    method: str,
+    url: str,
+    kwargs: dict,
+    started: float,
+    elapsed: float,
+    status: Union[int, None] = None,
+    content: Union[bytes, None] = None,
+    exception: Union[Exception, None] = None,
+) -> None:
+    """
+    Ставит копию выполненного запроса к основному контуру СЦОС в очередь
+    отправки на второй контур. content - тело ответа основного контура,
+    None - не прочитано.
+    """
+    if not SCOS_SHADOW_BASE_URL or not url.startswith(SCOS_BASE_URL):
+        return
+    if status == 304:
+        content = None
+    get_sender().submit(
+        (
+            method,
+            url[len(SCOS_BASE_URL):],
+            shadow_kwargs(kwargs),
+            status,
+            content,
+            elapsed,
+            type(exception).__name__ if exception is not None else None,
+            started,
+        )
+    )
+
+def shadow_files(paths: Iterable[str]) -> List[str]:
+    """
+    Файлы сравнения: пути, шаблоны glob и каталоги SCOS_SHADOW_PATH
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "shadow-*.jsonl*")))
+        else:
+            files.extend(glob.glob(path) or [path])
+    return sorted(set(files))
+
+def read_shadow(files: Iterable[str]) -> Iterator[dict]:
+    for path in files:
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+def normalise_path(path: str) -> str:
+    return "/".join(
+        "{id}" if ID_SEGMENT.match(segment) else segment for segment in path.split("/")
+    )
+
+def percentile(values: List[float], share: float) -> Union[float, None]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+def get_shadow_report(paths: Iterable[str]) -> Tuple[List[dict], int]:
+    """
+    Отчет о различиях ответов контуров по запросам (метод, путь): число
+    сравнений по результатам, длительности p50/p95 основного запроса и копии,
+    частые различающиеся поля. Второе значение - отброшено копий.
+    """
+    outcomes: Dict[Tuple[str, str], Counter] = defaultdict(Counter)
+    fields: Dict[Tuple[str, str], Counter] = defaultdict(Counter)
+    primary_ms: Dict[Tuple[str, str], List[float]] = defaultdict(list)
+    shadow_ms: Dict[Tuple[str, str], List[float]] = defaultdict(list)
+    dropped = 0
+    for record in read_shadow(shadow_files(paths)):
+        dropped += record.get("dr", 0)
+        key = (record.get("m", ""), normalise_path(record.get("p", "")))
+        outcomes[key][record.get("r")] += 1
+        fields[key].update(record.get("d", ()))
+        if record.get("ms") is not None:
+            primary_ms[key].append(record["ms"])
+        if record.get("sms") is not None:
+            shadow_ms[key].append(record["sms"])
+    report = []
+    for key in sorted(outcomes):
+        method, path = key
+        counts = outcomes[key]
+        report.append({
+            "method": method,
+            "path": path,
+            "total": sum(counts.values()),
+            **{outcome: counts[outcome] for outcome in (SAME, STATUS, BODY, ERROR, UNCOMPARED)},
+            "primary_p50": percentile(primary_ms[key], 0.5),
+            "primary_p95": percentile(primary_ms[key], 0.95),
+            "shadow_p50": percentile(shadow_ms[key], 0.5),
+            "shadow_p95": percentile(shadow_ms[key], 0.95),
+            "fields": fields[key].most_common(REPORT_DIFF_PATHS),
+        })
+    return report, dropped
@@ -0,0 +1,53 @@
+"""
+СЦОС signal handlers
+"""
+
+import os
+import codecs
+import logging
+import yaml
+
+from django.dispatch import receiver
+
+from opaque_keys.edx.locator import LibraryLocator
+from xmodule.modulestore.django import SignalHandler # pylint: disable=import-error
+
+from .course_update import (
+    set_course_publish_token,
+)
+from .tasks import (
+    course_published,
+)
+
+
+
+LOGGER = logging.getLogger(__name__)
+
+CONFIG_FILE = os.environ["CMS_CFG"]
+with codecs.open(CONFIG_FILE, encoding="utf-8") as f:
+    __config__ = yaml.safe_load(f)
+    SCOS_COURSE_AUTO_UPDATE = __config__.get("SCOS_COURSE_AUTO_UPDATE", True)
+    SCOS_COURSE_UPDATE_DELAY = __config__.get("SCOS_COURSE_UPDATE_DELAY", 60)
+
+
+
+@receiver(SignalHandler.course_published)
+def course_published_handler(sender, course_key, **kwargs) -> None: # pylint: disable=unused-argument
+    """
+    Откладывает обновление курса на СЦОС после публикации курса в Studio.
+    Серия публикаций за SCOS_COURSE_UPDATE_DELAY секунд приводит к одному
+    обновлению.
+    """
+    if not SCOS_COURSE_AUTO_UPDATE or isinstance(course_key, LibraryLocator):
+        return
+    token = set_course_publish_token(str(course_key))
+    try:
+        course_published.apply_async(
+            args = (str(course_key), token),
+            countdown = SCOS_COURSE_UPDATE_DELAY,
+        )
+    except Exception as exception:  # pylint: disable=broad-except
+        LOGGER.error(
+            "Не получилось добавить задачу обновления курса СЦОС в очередь: %s",
+            exception,
+        )
@@ -1,5 +1,7 @@
+import json
 import logging
-from typing import Any
+import uuid
+from typing import Tuple, Union
 
 from celery import shared_task
 
@@ -8,95 +10,364 @@ from opaque_keys.edx.keys import UsageKey
 from lms.djangoapps.course_api.blocks.api import get_blocks # pylint: disable=import-error
 
 from .scos_api import (
-    scos_post_participation,
-    scos_delete_participation,
-    scos_post_subsection_grade,
-    scos_post_course_grade,
-    get_scos_course,
+    scos_put_course,
+    scos_participation_object,
+    scos_participation_cancel_object,
+    scos_subsection_grade_object,
+    scos_course_grade_object,
 )
 
 from .user import (
     get_user_scos_uid,
 )
 
+from .course import (
+    get_course_info,
+)
+
+from .cache import (
+    set_course_widget,
+    release_course_widget_refresh,
+)
+
+from .course_update import (
+    get_course_snapshot,
+    set_course_snapshot,
+    course_info_diff,
+    is_latest_course_publish,
+)
+
+from .registry import (
+    SCOS_REGISTRY_SYNC_INTERVAL,
+    acquire_registry_sync,
+    find_registry_course,
+    is_registry_sync_token,
+    set_registry_sync_token,
+    sync_registry,
+)
+
+from .visitors import (
+    acquire_visitors_push,
+    push_visitors,
+    registry_update,
+)
+
+from .ordering import (
+    ordered,
+)
+
+from .deadline import (
+    SCOS_TASK_DEADLINE,
+    with_deadline,
+)
+
+from .circuit import (
+    SCOS_CIRCUIT_COOLDOWN,
+)
+
+from .delivery_records import (
+    acquire_circuit_retry,
+    acquire_delivery_maintenance,
+    deliver_event,
+    get_failed_count,
+    has_circuit_failures,
+    maintain_deliveries,
+    resend_deliveries,
+    retry_failed_deliveries,
+)
+
+from .scos_http import (
+    SCOSError,
+)
+
+from .tracing import (
+    span,
+)
+
 
 
 LOGGER = logging.getLogger(__name__)
 
 
 
-@shared_task
-def user_enrolled(event: dict) -> None:
+# Запрос к СЦОС по событию обучения: (вид запроса SCOS_WRITE_REQUESTS, объект)
+Plan = Union[Tuple[str, dict], None]
+# Задача события обучения повторяется при временной ошибке поиска курса на СЦОС
+EVENT_TASK_OPTIONS = {
+    "autoretry_for": (SCOSError,),
+    "retry_backoff": True,
+    "max_retries": 5,
+}
+
+
+
+def event_participant(event: dict) -> Union[Tuple[str, str, dict], None]:
+    """
+    (course_key, СЦОС uid слушателя, курс СЦОС) события обучения, None -
+    событие не отправляется на СЦОС
+    """
     user_id: int = int(event["data"]["user_id"])
     course_key: str = event["data"]["course_id"]
     user_scos_uid: str = get_user_scos_uid(user_id)
-    if user_scos_uid is not None:
-        scos_course = get_scos_course(course_key)
-        if scos_course is not None:
-            timestamp = event["timestamp"].replace(microsecond=0).isoformat()
-            scos_post_participation(
-                course_id = scos_course["global_id"],
-                session_id = course_key,
-                user_id = user_scos_uid,
-                enroll_date = timestamp,
-            )
+    if user_scos_uid is None:
+        return None
+    try:
+        scos_course = find_registry_course(course_key)
+    except SCOSError as error:
+        if error.retryable:
+            raise
+        LOGGER.error("СЦОС. Поиск курса %s в реестре СЦОС: %s", course_key, error)
+        return None
+    if scos_course is None:
+        return None
+    return course_key, user_scos_uid, scos_course
 
-@shared_task
+def plan_user_enrolled(event: dict) -> Plan:
+    participant = event_participant(event)
+    if participant is None:
+        return None
+    course_key, user_scos_uid, scos_course = participant
+    timestamp = event["timestamp"].replace(microsecond=0).isoformat()
+    return "participation", scos_participation_object(
+        course_id = scos_course["global_id"],
+        session_id = course_key,
+        user_id = user_scos_uid,
+        enroll_date = timestamp,
+    )
+
+def plan_user_unenrolled(event: dict) -> Plan:
+    participant = event_participant(event)
+    if participant is None:
+        return None
+    course_key, user_scos_uid, scos_course = participant
+    return "participation_cancel", scos_participation_cancel_object(
+        course_id = scos_course["global_id"],
+        session_id = course_key,
+        user_id = user_scos_uid,
+    )
+
+def plan_subsection_grade(event: dict) -> Plan:
+    participant = event_participant(event)
+    if participant is None:
+        return None
+    course_key, user_scos_uid, scos_course = participant
+    timestamp = event["timestamp"].replace(microsecond=0).isoformat()
+    rating: float = round(
+        (event["data"]["weighted_graded_earned"]
+        / event["data"]["weighted_graded_possible"]) * 100.0,
+        2
+    )
+    block_id: str = event["data"]["block_id"]
+    with span("get_blocks", block_id=block_id):
+        subsection_display_name: str = get_blocks(
+            None,
+            UsageKey.from_string(block_id),
+            requested_fields = ["display_name", ]
+        )["blocks"][block_id]["display_name"]
+    return "results", scos_subsection_grade_object(
+        course_id = scos_course["global_id"],
+        session_id = course_key,
+        user_id = user_scos_uid,
+        date = timestamp,
+        rating = rating,
+        checkpoint_name = subsection_display_name,
+        checkpoint_id = block_id,
+    )
+
+def plan_course_grade(event: dict) -> Plan:
+    participant = event_participant(event)
+    if participant is None:
+        return None
+    course_key, user_scos_uid, scos_course = participant
+    progress: float = round(event["data"]["percent_grade"]*100.0, 2)
+    return "progress", scos_course_grade_object(
+        course_id = scos_course["global_id"],
+        session_id = course_key,
+        user_id = user_scos_uid,
+        progress = progress,
+    )
+
+def deliver(plan: Plan, event: dict) -> None:
+    if plan is not None:
+        error = deliver_event(*plan, event["timestamp"])
+        if error is not None and error.kind == SCOSError.CIRCUIT:
+            schedule_circuit_retry()
+
+
+
+@shared_task(**EVENT_TASK_OPTIONS)
+@ordered
+@with_deadline(SCOS_TASK_DEADLINE)
+def user_enrolled(event: dict) -> None:
+    deliver(plan_user_enrolled(event), event)
+
+@shared_task(**EVENT_TASK_OPTIONS)
+@ordered
+@with_deadline(SCOS_TASK_DEADLINE)
 def user_unenrolled(event: dict) -> None:
-    user_id: int = int(event["data"]["user_id"])
-    course_key: str = event["data"]["course_id"]
-    user_scos_uid: str = get_user_scos_uid(user_id)
-    if user_scos_uid is not None:
-        scos_course = get_scos_course(course_key)
-        if scos_course is not None:
-            scos_delete_participation(
-                course_id = scos_course["global_id"],
-                session_id = course_key,
-                user_id = user_scos_uid,
-            )
+    deliver(plan_user_unenrolled(event), event)
 
-@shared_task
+@shared_task(**EVENT_TASK_OPTIONS)
+@ordered
+@with_deadline(SCOS_TASK_DEADLINE)
 def subsection_grade(event: dict) -> None:
-    user_id: int = int(event["data"]["user_id"])
-    course_key: str = event["data"]["course_id"]
-    user_scos_uid: str = get_user_scos_uid(user_id)
-    if user_scos_uid is not None:
-        scos_course = get_scos_course(course_key)
-        if scos_course is not None:
-            timestamp = event["timestamp"].replace(microsecond=0).isoformat()
-            rating: float = round(
-                (event["data"]["weighted_graded_earned"]
-                / event["data"]["weighted_graded_possible"]) * 100.0,
-                2
-            )
-            block_id: str = event["data"]["block_id"]
-            subsection_display_name: str = get_blocks(
-                None,
-                UsageKey.from_string(block_id),
-                requested_fields = ["display_name", ]
-            )["blocks"][block_id]["display_name"]
-            scos_post_subsection_grade(
-                course_id = scos_course["global_id"],
-                session_id = course_key,
-                user_id = user_scos_uid,
-                date = timestamp,
-                rating = rating,
-                checkpoint_name = subsection_display_name,
-                checkpoint_id = block_id,
-            )
+    deliver(plan_subsection_grade(event), event)
 
-@shared_task
+@shared_task(**EVENT_TASK_OPTIONS)
+@ordered
+@with_deadline(SCOS_TASK_DEADLINE)
 def course_grade(event: dict) -> None:
-    user_id: int = int(event["data"]["user_id"])
-    course_key: str = event["data"]["course_id"]
-    user_scos_uid: str = get_user_scos_uid(user_id)
-    if user_scos_uid is not None:
-        scos_course = get_scos_course(course_key)
-        if scos_course is not None:
-            progress: float = round(event["data"]["percent_grade"]*100.0, 2)
-            scos_post_course_grade(
-                course_id = scos_course["global_id"],
-                session_id = course_key,
-                user_id = user_scos_uid,
-                progress = progress,
-            )
+    deliver(plan_course_grade(event), event)
+
+@shared_task
+@with_deadline(SCOS_TASK_DEADLINE)
+def course_published(course_key: str, token: str) -> None:
+    if not is_latest_course_publish(course_key, token):
+        return
+    scos_course = find_registry_course(course_key)
+    if scos_course is None:
+        LOGGER.info(
+            "СЦОС. Курс %s не найден в реестре СЦОС, автоматическое обновление пропущено",
+            course_key,
+        )
+        return
+    global_id: str = scos_course["global_id"]
+    snapshot = get_course_snapshot(course_key)
+    if snapshot is None:
+        # Курс не обновлялся с панели СЦОС: параметры из локальной копии реестра
+        snapshot = registry_update(scos_course)
+    if not snapshot:
+        LOGGER.info(
+            "СЦОС. Нет параметров курса %s в снимке и в реестре СЦОС, "
+            "автоматическое обновление пропущено",
+            course_key,
+        )
+        return
+    course_info = get_course_info(course_key)
+    if course_info is None:
+        return
+    changes = course_info_diff(snapshot, json.loads(course_info.json()))
+    if not changes:
+        return
+    LOGGER.info(
+        "СЦОС. Обновление курса %s, изменены параметры: %s",
+        course_key,
+        list(changes),
+    )
+    course_info_update = {**snapshot, **changes}
+    scos_response = scos_put_course(dict(course_info_update), global_id)
+    if scos_response is not None:
+        set_course_snapshot(course_key, course_info_update)
+
+@shared_task
+@with_deadline(SCOS_TASK_DEADLINE)
+def course_widget_refresh(course_key: str) -> None:
+    try:
+        scos_course = find_registry_course(course_key)
+    except SCOSError as error:
+        # СЦОС недоступен: в кэше остается прежнее значение, блокировка
+        # обновления снимается по таймауту, а не сразу
+        LOGGER.warning("СЦОС. Обновление виджета курса %s: %s", course_key, error)
+        return
+    set_course_widget(course_key, scos_course)
+    release_course_widget_refresh(course_key)
+
+@shared_task
+@with_deadline(SCOS_TASK_DEADLINE)
+def retry_deliveries(ids: list) -> None:
+    if resend_deliveries(ids):
+        schedule_circuit_retry()
+
+@shared_task
+def retry_failed(
+    kind: Union[str, None] = None,
+    after_id: int = 0,
+    error_kind: Union[str, None] = None,
+) -> None:
+    """
+    Повторная отправка страницы записей с ошибкой после after_id, следующая
+    страница - следующей задачей
+    """
+    batches, next_id = retry_failed_deliveries(kind, after_id, error_kind)
+    for batch in batches:
+        retry_deliveries.apply_async(args = (batch,))
+    if next_id is not None:
+        retry_failed.apply_async(args = (kind, next_id, error_kind))
+
+def schedule_circuit_retry() -> None:
+    """
+    Повторная отправка событий, не отправленных из-за разомкнутого
+    выключателя, после SCOS_CIRCUIT_COOLDOWN секунд
+    """
+    if acquire_circuit_retry():
+        retry_failed.apply_async(
+            args = (None, 0, SCOSError.CIRCUIT),
+            countdown = SCOS_CIRCUIT_COOLDOWN,
+        )
+
+@shared_task
+def delivery_maintenance() -> None:
+    maintain_deliveries()
+    if has_circuit_failures():
+        schedule_circuit_retry()
+
+def start_delivery_retry(kind: Union[str, None] = None) -> int:
+    """
+    Запускает повторную отправку событий обучения с ошибкой, возвращает
+    число записей с ошибкой
+    """
+    count = get_failed_count(kind)
+    if count:
+        retry_failed.apply_async(args = (kind,))
+    return count
+
+@shared_task
+def registry_sync(token: str, full: bool = False) -> None:
+    if not is_registry_sync_token(token):
+        # Запущена новая цепочка синхронизаций
+        return
+    try:
+        sync_registry(full)
+    finally:
+        registry_sync.apply_async(
+            args = (token,),
+            countdown = SCOS_REGISTRY_SYNC_INTERVAL,
+        )
+    if acquire_visitors_push():
+        visitors_push.apply_async()
+    if acquire_delivery_maintenance():
+        delivery_maintenance.apply_async()
+
+@shared_task
+def visitors_push() -> None:
+    push_visitors()
+
+def start_registry_sync(full: bool = False) -> bool:
+    """
+    Запускает синхронизацию локальной копии реестра СЦОС и цепочку
+    повторений, False - синхронизация уже запущена
+    """
+    if not acquire_registry_sync():
+        return False
+    token = uuid.uuid4().hex
+    set_registry_sync_token(token)
+    try:
+        registry_sync.apply_async(args = (token, full))
+    except Exception as exception:  # pylint: disable=broad-except
+        LOGGER.error(
+            "Не получилось добавить задачу синхронизации реестра СЦОС в очередь: %s",
+            exception,
+        )
+        return False
+    return True
+
+
+
+# Задачи событий обучения: имя задачи -> подготовка запроса к СЦОС
+# (асинхронный воркер отправки, см. delivery)
+EVENT_PLANS = {
+    user_enrolled.name: plan_user_enrolled,
+    user_unenrolled.name: plan_user_unenrolled,
+    subsection_grade.name: plan_subsection_grade,
+    course_grade.name: plan_course_grade,
+}
@@ -0,0 +1,306 @@
+"""
+Трассировка обработки событий обучения.
+
+При SCOS_TRACING: true обработка события отслеживания записывается как дерево
+интервалов (span): получение события SCOSEventTrackingBackend, постановка
+задачи в очередь, ожидание в очереди и выполнение задачи Celery, запросы к
+базе (get_user_scos_uid), поиск курса СЦОС (find_registry_course), get_blocks и
+HTTP запросы к API СЦОС. Контекст трассировки передается в задачу Celery в
+заголовке scos_traceparent (формат W3C traceparent).
+
+Завершенные интервалы передаются экспортеру SCOS_TRACING_EXPORTER (путь к
+классу с методом export(span: dict)). JSONFileExporter пишет интервалы в
+файлы JSON Lines в каталоге SCOS_TRACING_PATH.
+"""
+
+import os
+import codecs
+import functools
+import json
+import logging
+import random
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, ContextManager, Dict, Iterator, Tuple, Union
+import yaml
+
+from celery import signals
+
+from django.utils.module_loading import import_string
+
+
+
+LOGGER = logging.getLogger(__name__)
+
+CONFIG_FILE = os.environ["CMS_CFG"]
+with codecs.open(CONFIG_FILE, encoding="utf-8") as f:
+    __config__ = yaml.safe_load(f)
+    SCOS_TRACING = __config__.get("SCOS_TRACING", False)
+    SCOS_TRACING_SAMPLE_RATE = __config__.get("SCOS_TRACING_SAMPLE_RATE", 1.0)
+    SCOS_TRACING_EXPORTER = __config__.get(
+        "SCOS_TRACING_EXPORTER", "scos.utils.tracing.JSONFileExporter"
+    )
+    SCOS_TRACING_PATH = __config__.get("SCOS_TRACING_PATH", "/openedx/data/scos/traces")
+
+TRACE_HEADER = "scos_traceparent"
+ENQUEUED_HEADER = "scos_enqueued_at"
+
+_CURRENT: ContextVar = ContextVar("scos_span", default=None)
+_EXPORTER: dict = {"exporter": None}
+_TASK_SPANS: Dict[str, Tuple["Span", Any]] = {}
+_NO_SPAN = nullcontext()
+_LOCK = threading.Lock()
+
+
+
+class Span:
+    """
+    Интервал трассировки
+    """
+
+    __slots__ = (
+        "trace_id", "span_id", "parent_id", "name", "attributes",
+        "start", "started", "duration", "error",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Union[str, None] = None,
+        attributes: Union[dict, None] = None,
+    ) -> None:
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes or {}
+        self.start = time.time()
+        self.started = time.perf_counter()
+        self.duration: Union[float, None] = None
+        self.error: Union[str, None] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self, exception: Union[BaseException, None] = None) -> None:
+        self.duration = time.perf_counter() - self.started
+        if exception is not None:
+            self.error = type(exception).__name__
+        export(self)
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def as_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+class SpanExporter(ABC):
+    """
+    Экспортер интервалов, SCOS_TRACING_EXPORTER - путь к подклассу
+    """
+
+    @abstractmethod
+    def export(self, span: dict) -> None:
+        """
+        Экспортирует законченный интервал (см. Span.as_dict)
+        """
+
+class JSONFileExporter(SpanExporter):
+    """
+    Интервалы в файлах JSON Lines, отдельный файл для каждого процесса
+    """
+
+    max_bytes = 64 * 1024 * 1024
+    backups = 4
+
+    def __init__(self) -> None:
+        self.pid = None
+        self.handler = None
+        self.lock = threading.Lock()
+
+    def get_handler(self) -> RotatingFileHandler:
+        pid = os.getpid()
+        with self.lock:
+            if self.pid != pid:
+                os.makedirs(SCOS_TRACING_PATH, exist_ok=True)
+                self.handler = RotatingFileHandler(
+                    os.path.join(
+                        SCOS_TRACING_PATH, f"traces-{socket.gethostname()}-{pid}.jsonl"
+                    ),
+                    maxBytes=self.max_bytes,
+                    backupCount=self.backups,
+                    encoding="utf-8",
+                    delay=True,
+                )
+                self.pid = pid
+            return self.handler
+
+    def export(self, span: dict) -> None:
+        line = json.dumps(span, ensure_ascii=False, separators=(",", ":"), default=str)
+        self.get_handler().handle(logging.makeLogRecord({"msg": line}))
+
+class LoggingExporter(SpanExporter):
+    """
+    Интервалы в журнал scos.utils.tracing (уровень INFO)
+    """
+
+    def export(self, span: dict) -> None:
+        LOGGER.info("СЦОС. Трассировка: %s", json.dumps(span, ensure_ascii=False, default=str))
+
+
+
+def get_exporter() -> SpanExporter:
+    with _LOCK:
+        if _EXPORTER["exporter"] is None:
+            _EXPORTER["exporter"] = import_string(SCOS_TRACING_EXPORTER)()
+        return _EXPORTER["exporter"]
+
+def export(current: Span) -> None:
+    try:
+        get_exporter().export(current.as_dict())
+    except Exception as exception:  # pylint: disable=broad-except
+        LOGGER.warning("Не получилось экспортировать трассировку СЦОС: %s", exception)
+
+def current_span() -> Union[Span, None]:
+    return _CURRENT.get()
+
+def parse_traceparent(value: Union[str, None]) -> Union[Tuple[str, str], None]:
+    """
+    (trace_id, span_id) из заголовка traceparent
+    """
+    parts = (value or "").split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+def start_span(
+    name: str,
+    traceparent: Union[str, None] = None,
+    **attributes,
+) -> Union[Span, None]:
+    """
+    Начинает интервал: дочерний для текущего, для traceparent или новую
+    трассировку (с вероятностью SCOS_TRACING_SAMPLE_RATE)
+    """
+    if not SCOS_TRACING:
+        return None
+    parent = _CURRENT.get()
+    if parent is not None:
+        return Span(name, parent.trace_id, parent.span_id, attributes)
+    remote = parse_traceparent(traceparent)
+    if remote is not None:
+        return Span(name, remote[0], remote[1], attributes)
+    if traceparent is None and random.random() < SCOS_TRACING_SAMPLE_RATE:
+        return Span(name, f"{random.getrandbits(128):032x}", None, attributes)
+    return None
+
+def span(name: str, **attributes) -> ContextManager[Union[Span, None]]:
+    """
+    Интервал трассировки вокруг блока кода, None - трассировка выключена
+    или трассировка не выбрана
+    """
+    if not SCOS_TRACING:
+        return _NO_SPAN
+    return _span(name, **attributes)
+
+@contextmanager
+def _span(name: str, **attributes) -> Iterator[Union[Span, None]]:
+    current = start_span(name, **attributes)
+    if current is None:
+        yield None
+        return
+    token = _CURRENT.set(current)
+    try:
+        yield current
+    except BaseException as exception:
+        current.end(exception)
+        raise
+    else:
+        current.end()
+    finally:
+        _CURRENT.reset(token)
+
+def traced(name: str) -> Callable:
+    """
+    Декоратор: вызов функции - интервал трассировки name
+    """
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not SCOS_TRACING or _CURRENT.get() is None:
+                return function(*args, **kwargs)
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def inject(headers: Union[dict, None] = None) -> dict:
+    """
+    Заголовки задачи Celery с контекстом текущего интервала
+    """
+    headers = dict(headers or {})
+    current = _CURRENT.get()
+    if current is not None:
+        headers[TRACE_HEADER] = current.traceparent()
+        headers[ENQUEUED_HEADER] = time.time()
+    elif SCOS_TRACING:
+        # Событие не выбрано для трассировки, задача тоже не трассируется
+        headers[TRACE_HEADER] = ""
+    return headers
+
+
+
+@signals.task_prerun.connect(weak=False)
+def _start_task_span(task_id=None, task=None, **kwargs) -> None: # pylint: disable=unused-argument
+    if not SCOS_TRACING or not task.name.startswith("scos."):
+        return
+    traceparent = task.request.get(TRACE_HEADER)
+    current = start_span(
+        f"task {task.name.rsplit('.', 1)[-1]}",
+        traceparent=traceparent,
+        task_id=task_id,
+        retries=task.request.retries,
+    )
+    if current is None:
+        return
+    enqueued = task.request.get(ENQUEUED_HEADER)
+    if enqueued:
+        current.set_attribute("queue_ms", round((current.start - enqueued) * 1000, 3))
+    with _LOCK:
+        _TASK_SPANS[task_id] = (current, _CURRENT.set(current))
+
+@signals.task_postrun.connect(weak=False)
+def _end_task_span(task_id=None, state=None, **kwargs) -> None: # pylint: disable=unused-argument
+    with _LOCK:
+        started = _TASK_SPANS.pop(task_id, None)
+    if started is None:
+        return
+    current, token = started
+    current.set_attribute("state", state)
+    try:
+        _CURRENT.reset(token)
+    except ValueError:
+        _CURRENT.set(None)
+    current.end()
+
+@signals.task_failure.connect(weak=False)
+def _fail_task_span(task_id=None, exception=None, **kwargs) -> None: # pylint: disable=unused-argument
+    with _LOCK:
+        started = _TASK_SPANS.get(task_id)
+    if started is not None:
+        started[0].error = type(exception).__name__
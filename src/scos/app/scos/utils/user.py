@@ -1,28 +1,147 @@
 
-from typing import Any
+import base64
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
 
 from social_django.models import UserSocialAuth
-from django.contrib.auth.models import User
-from django.db.models import Q
+from django.db.models import Q, Count, Exists, OuterRef, QuerySet, Subquery
 
 from common.djangoapps.student.models.course_enrollment import ( # pylint: disable=import-error
     CourseEnrollment,
  )
 
+from .tracing import traced
 
 
-def get_course_enrollments(course_key: str) -> Any:
-    user_in_usersocialauth = Q(
-        user_id__in = UserSocialAuth.objects.filter(
-            provider = "scos"
-        ).values_list("user_id", flat=True)
+
+ROSTER_FIELDS = (
+    "user_id",
+    "user__username",
+    "user__email",
+    "scos_uid",
+    "mode",
+    "is_active",
+    "created",
+)
+
+
+
+def scos_learner() -> Exists:
+    """
+    Условие: пользователь записи на курс авторизован через СЦОС
+    """
+    return Exists(
+        UserSocialAuth.objects.filter(
+            user_id = OuterRef("user_id"),
+            provider = "scos",
+        )
     )
+
+def get_course_enrollments(course_key: str) -> Any:
     enrollments = CourseEnrollment.objects.filter(
-        user_in_usersocialauth,
+        scos_learner(),
         course_id = course_key
     ).order_by("created")
     return enrollments
 
+def get_course_enrollment_counts(
+    course_keys: Union[Iterable[str], None] = None,
+) -> Dict[str, dict]:
+    """
+    Количество записей слушателей СЦОС на курсы: активных, неактивных и по
+режимам (mode). Считается одним запросом с группировкой по course_id, mode.
+Если course_keys не указан, считается по всем курсам.
+    """
+    enrollments = CourseEnrollment.objects.filter(scos_learner())
+    if course_keys is not None:
+        enrollments = enrollments.filter(course_id__in=list(course_keys))
+    rows = enrollments.order_by().values("course_id", "mode").annotate(
+        active = Count("id", filter=Q(is_active=True)),
+        inactive = Count("id", filter=Q(is_active=False)),
+    )
+    counts: Dict[str, dict] = {}
+    for row in rows:
+        course_counts = counts.setdefault(
+            str(row["course_id"]),
+            {"active": 0, "inactive": 0, "modes": {}}
+        )
+        course_counts["active"] += row["active"]
+        course_counts["inactive"] += row["inactive"]
+        course_counts["modes"][row["mode"]] = row["active"] + row["inactive"]
+    return counts
+
+def get_course_visitor_counts(course_keys: Iterable[str]) -> Dict[str, int]:
+    """
+    Количество активных записей всех пользователей на курсы (visitors).
+Считается одним запросом с группировкой по course_id.
+    """
+    rows = CourseEnrollment.objects.filter(
+        course_id__in = list(course_keys),
+        is_active = True,
+    ).order_by().values("course_id").annotate(visitors=Count("id"))
+    return {str(row["course_id"]): row["visitors"] for row in rows}
+
+def encode_enrollments_cursor(created: datetime, enrollment_id: int) -> str:
+    """
+    Курсор страницы записей на курс - (created, id) последней записи
+    """
+    cursor = f"{created.isoformat()}|{enrollment_id}"
+    return base64.urlsafe_b64encode(cursor.encode("utf-8")).decode("ascii")
+
+def decode_enrollments_cursor(cursor: str) -> Union[Tuple[datetime, int], None]:
+    try:
+        created, enrollment_id = base64.urlsafe_b64decode(
+            cursor.encode("ascii")
+        ).decode("utf-8").split("|")
+        return datetime.fromisoformat(created), int(enrollment_id)
+    except ValueError:
+        return None
+
+def get_course_roster(course_key: str) -> QuerySet:
+    """
+    Записи слушателей СЦОС на курс с uid СЦОС (scos_uid) в порядке created, id
+    """
+    scos_uid = UserSocialAuth.objects.filter(
+        user_id = OuterRef("user_id"),
+        provider = "scos",
+    ).values("uid")[:1]
+    return get_course_enrollments(course_key).annotate(
+        scos_uid = Subquery(scos_uid)
+    ).order_by("created", "id")
+
+def get_course_roster_page(
+    course_key: str,
+    cursor: Union[str, None] = None,
+    size: int = 100,
+) -> Tuple[List[dict], Union[str, None]]:
+    """
+    Возвращает страницу списка слушателей СЦОС курса (поля ROSTER_FIELDS) и
+курсор следующей страницы (keyset pagination по created, id)
+    """
+    roster = get_course_roster(course_key)
+    after = decode_enrollments_cursor(cursor) if cursor else None
+    if after is not None:
+        created, enrollment_id = after
+        roster = roster.filter(
+            Q(created__gt=created) | Q(created=created, id__gt=enrollment_id)
+        )
+    page = list(roster.values("id", *ROSTER_FIELDS)[:size + 1])
+    next_cursor = None
+    if len(page) > size:
+        page = page[:size]
+        next_cursor = encode_enrollments_cursor(page[-1]["created"], page[-1]["id"])
+    return [{field: row[field] for field in ROSTER_FIELDS} for row in page], next_cursor
+
+def iter_course_roster(course_key: str, chunk_size: int = 2000) -> Iterator[dict]:
+    """
+    Итератор по списку слушателей СЦОС курса для выгрузки, записи читаются
+из базы частями по chunk_size
+    """
+    roster = get_course_roster(course_key).values_list(*ROSTER_FIELDS)
+    for row in roster.iterator(chunk_size=chunk_size):
+        yield dict(zip(ROSTER_FIELDS, row))
+
+@traced("get_user_scos_uid")
 def get_user_scos_uid(user_id: int) -> Any:
     try:
         scos_auth = UserSocialAuth.objects.get(
@@ -0,0 +1,156 @@
+"""
+Количество записей на сессии онлайн-курсов (visitors) на СЦОС.
+
+push_visitors считает активные записи на курсы платформы всех онлайн-курсов
+локальной копии реестра СЦОС (см. registry) одним запросом с группировкой и
+отправляет обновление онлайн-курсов (3.1.6) пакетами по
+SCOS_VISITORS_BATCH_SIZE курсов, бюджет времени каждого пакета -
+SCOS_TASK_DEADLINE (см. deadline). Отправляются только курсы, у которых число
+записей изменилось относительно последней отправки (снимок, см.
+course_update) больше чем на долю SCOS_VISITORS_THRESHOLD. Обновление
+содержит параметры курса из снимка, а у курсов без снимка (ни разу не
+обновлявшихся с панели СЦОС) - параметры курса из локальной копии реестра
+(SCOSCourse.data). Курсы без параметров пропускаются.
+
+Отправка запускается задачей синхронизации реестра не чаще одного раза в
+SCOS_VISITORS_INTERVAL секунд, 0 - отправка отключена.
+"""
+
+import os
+import codecs
+import logging
+from typing import Dict, List, Tuple, Union
+import yaml
+
+from django.core.cache import cache
+
+from ..models import (
+    SCOSCourse,
+)
+from .course import (
+    CourseInfo,
+)
+from .deadline import (
+    SCOS_TASK_DEADLINE,
+    deadline,
+)
+from .course_update import (
+    get_course_snapshots,
+    set_course_snapshot,
+)
+from .scos_api import (
+    scos_put_courses,
+)
+from .scos_http import (
+    SCOSError,
+)
+from .user import (
+    get_course_visitor_counts,
+)
+
+
+
+LOGGER = logging.getLogger(__name__)
+
+CONFIG_FILE = os.environ["CMS_CFG"]
+with codecs.open(CONFIG_FILE, encoding="utf-8") as f:
+    __config__ = yaml.safe_load(f)
+    SCOS_VISITORS_INTERVAL = __config__.get("SCOS_VISITORS_INTERVAL", 3600)
+    SCOS_VISITORS_THRESHOLD = __config__.get("SCOS_VISITORS_THRESHOLD", 0.05)
+    SCOS_VISITORS_BATCH_SIZE = __config__.get("SCOS_VISITORS_BATCH_SIZE", 50)
+
+DUE_KEY = "scos.visitors.due"
+RUNNING_KEY = "scos.visitors.running"
+# Отправка, не завершившаяся за это время, считается прерванной
+RUNNING_TIMEOUT = 15 * 60
+# Параметры онлайн-курса в обновлении (3.1.6), остальные поля реестра не отправляются
+COURSE_FIELDS = frozenset(attr.name for attr in vars(CourseInfo()).values())
+
+
+
+def visitors_changed(sent: Union[int, None], visitors: int) -> bool:
+    """
+    Число записей изменилось относительно отправленного больше порога
+    """
+    if sent is None:
+        return True
+    return abs(visitors - sent) >= max(1, sent * SCOS_VISITORS_THRESHOLD)
+
+def registry_update(data: dict) -> dict:
+    """
+    Параметры онлайн-курса для обновления из подробной информации реестра (3.1.15)
+    """
+    return {attr: value for attr, value in data.items() if attr in COURSE_FIELDS}
+
+def get_visitors_updates() -> Dict[str, Tuple[str, dict]]:
+    """
+    Обновления онлайн-курсов с изменившимся числом записей, ключ - global_id,
+    значение - (курс платформы, обновление)
+    """
+    courses = {
+        global_id: (session_id, data)
+        for global_id, session_id, data in SCOSCourse.objects.exclude(
+            session_id="",
+        ).values_list("global_id", "session_id", "data")
+    }
+    session_ids = {session_id for session_id, _ in courses.values()}
+    visitors = get_course_visitor_counts(session_ids)
+    snapshots = get_course_snapshots(session_ids)
+    updates = {}
+    skipped = 0
+    for global_id, (session_id, data) in courses.items():
+        snapshot = snapshots.get(session_id)
+        if snapshot is None:
+            update = registry_update(data)
+            if not update:
+                skipped += 1
+                continue
+            snapshot = {**update, "visitors": data.get("visitors")}
+        count = visitors.get(session_id, 0)
+        if visitors_changed(snapshot.get("visitors"), count):
+            updates[global_id] = (session_id, {**snapshot, "visitors": count})
+    if skipped:
+        LOGGER.info("СЦОС. Число записей не отправляется для %s курсов без параметров", skipped)
+    return updates
+
+def push_visitors() -> Union[dict, None]:
+    """
+    Отправляет на СЦОС изменившееся число записей на онлайн-курсы, None -
+    отправка уже выполняется
+    """
+    if not cache.add(RUNNING_KEY, True, RUNNING_TIMEOUT):
+        LOGGER.info("СЦОС. Отправка числа записей на курсы уже выполняется")
+        return None
+    try:
+        updates = list(get_visitors_updates().items())
+        stats = {"changed": len(updates), "sent": 0, "failed": 0}
+        for start in range(0, len(updates), SCOS_VISITORS_BATCH_SIZE):
+            batch: List[tuple] = updates[start:start + SCOS_VISITORS_BATCH_SIZE]
+            try:
+                with deadline(SCOS_TASK_DEADLINE):
+                    scos_put_courses([
+                        {**update, "id": global_id} for global_id, (_, update) in batch
+                    ])
+            except SCOSError as error:
+                LOGGER.warning(
+                    "СЦОС api. Обновление числа записей на курсы %s: %s",
+                    [global_id for global_id, _ in batch],
+                    error,
+                )
+                stats["failed"] += len(batch)
+                continue
+            for _, (session_id, update) in batch:
+                set_course_snapshot(session_id, update)
+            stats["sent"] += len(batch)
+    finally:
+        cache.delete(RUNNING_KEY)
+    LOGGER.info("СЦОС. Число записей на курсы отправлено: %s", stats)
+    return stats
+
+def acquire_visitors_push() -> bool:
+    """
+    Отправка числа записей не чаще одного раза в SCOS_VISITORS_INTERVAL секунд
+    """
+    if not SCOS_VISITORS_INTERVAL:
+        return False
+    return cache.add(DUE_KEY, True, SCOS_VISITORS_INTERVAL)
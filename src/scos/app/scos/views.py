@@ -4,12 +4,23 @@ Views for the scos app.
 
 import os
 import codecs
+import csv
 from importlib import import_module
 import json
+from typing import Iterator
 import yaml
 
-from django.http import HttpResponse
+from django.http import (
+    FileResponse,
+    HttpResponse,
+    HttpResponseRedirect,
+    Http404,
+    StreamingHttpResponse,
+)
 from django.template import loader
+from django.urls import reverse
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import (
     login_required,
     user_passes_test,
@@ -18,13 +29,16 @@ from django.contrib.auth.models import User
 
 from .utils.scos_api import (
     scos_connection_check,
-    scos_get_courses,
-    scos_get_rightholders,
-    scos_get_platforms,
-    scos_partners_dict,
-    scos_get_course,
-    scos_post_course,
-    scos_put_course,
+    scos_send_course,
+)
+
+from .utils.scos_http import (
+    SCOSError,
+)
+
+from .utils.deadline import (
+    SCOS_VIEW_DEADLINE,
+    with_deadline,
 )
 
 from .utils.course import (
@@ -34,7 +48,42 @@ from .utils.course import (
 )
 
 from .utils.user import (
-    get_course_enrollments,
+    ROSTER_FIELDS,
+    iter_course_roster,
+)
+
+from .utils.course_update import (
+    set_course_snapshot,
+)
+
+from .utils.course_list import (
+    get_course_list_filters,
+    get_course_list_sort,
+    get_scos_platform,
+    get_scos_rightholders,
+)
+
+from .utils.registry import (
+    get_registry_course,
+    get_registry_sync_status,
+)
+
+from .utils.tasks import (
+    start_delivery_retry,
+    start_registry_sync,
+)
+
+from .utils.delivery_records import (
+    get_delivery_stats,
+)
+
+from .utils.circuit import (
+    get_circuit_status,
+)
+
+from .utils.profiling import (
+    get_profile_file,
+    profiled,
 )
 
 
@@ -45,6 +94,8 @@ with codecs.open(CONFIG_FILE, encoding="utf-8") as f:
     SCOS_BASE_URL = __config__["SCOS_BASE_URL"]
     SCOS_X_CN_UUID = __config__["SCOS_X_CN_UUID"]
     SCOS_PARTNER_ID = __config__["SCOS_PARTNER_ID"]
+    SCOS_COURSES_PAGE_SIZE = __config__.get("SCOS_COURSES_PAGE_SIZE", 50)
+    SCOS_ROSTER_PAGE_SIZE = __config__.get("SCOS_ROSTER_PAGE_SIZE", 100)
 
 SETTINGS = import_module(os.environ["DJANGO_SETTINGS_MODULE"])
 LMS_BASE_URL = SETTINGS.LMS_BASE
@@ -62,48 +113,91 @@ common_context = {
     "scos_partner_id": SCOS_PARTNER_ID,
 }
 
+def get_common_context() -> dict:
+    """
+    Общий контекст страниц панели: состояние локальной копии реестра СЦОС,
+    устаревшая копия синхронизируется
+    """
+    registry_sync = get_registry_sync_status()
+    if registry_sync["stale"]:
+        registry_sync["running"] = start_registry_sync()
+    return {**common_context, "registry_sync": registry_sync}
+
+def get_registry_course_or_404(global_id: str) -> dict:
+    scos_course = get_registry_course(global_id)
+    if scos_course is None:
+        raise Http404("онлайн-курс не найден")
+    return scos_course
+
 def is_staff_check(user: User) -> bool:
     '''
     Проверка наличия у пользователя статуса персонала
     '''
     return user.is_staff
 
+class Echo:
+    '''
+    Буфер для потоковой записи csv
+    '''
+    def write(self, value: str) -> str:
+        return value
+
+def roster_csv(roster: Iterator[dict]) -> Iterator[str]:
+    writer = csv.writer(Echo())
+    yield writer.writerow(ROSTER_FIELDS)
+    for row in roster:
+        yield writer.writerow([row[field] for field in ROSTER_FIELDS])
+
+def roster_json(roster: Iterator[dict]) -> Iterator[str]:
+    yield "["
+    separator = ""
+    for row in roster:
+        yield separator + json.dumps(row, ensure_ascii=False, default=str)
+        separator = ","
+    yield "]"
+
 
 
 @login_required
 @user_passes_test(is_staff_check, login_url=LMS_URL)
+@profiled
 def scos(request) -> HttpResponse:
     template = loader.get_template("scos/scos.html")
-    scos_platform = scos_partners_dict(scos_get_platforms())[SCOS_PARTNER_ID]
     context = {
-        "scos_platform": scos_platform,
+        "scos_platform": get_scos_platform(),
     }
-    context.update(common_context)
+    context.update(get_common_context())
     return HttpResponse(template.render(context, request))
 
 @login_required
 @user_passes_test(is_staff_check, login_url=LMS_URL)
+@profiled
 def course_all(request) -> HttpResponse:
     template = loader.get_template("scos/course/all.html")
-    scos_courses = scos_get_courses()
-    scos_rightholders = scos_partners_dict(scos_get_rightholders())
-    scos_platform = scos_partners_dict(scos_get_platforms())[SCOS_PARTNER_ID]
-    for scos_course in scos_courses["results"]:
-        scos_course.update(
-            {
-                "institution_short_title": scos_rightholders\
-                    [scos_course["institution_id"]]["short_title"],
-            }
-        )
+    filters = get_course_list_filters(request.GET)
+    sort = get_course_list_sort(request.GET)
+    query = request.GET.copy()
+    query.pop("cursor", None)
+    sort_query = query.copy()
+    sort_query.pop("sort", None)
+    rightholders = get_scos_rightholders() or {}
     context = {
-        "scos_courses": scos_courses,
-        "scos_platform": scos_platform,
+        "scos_platform": get_scos_platform(),
+        "scos_rightholders": sorted(
+            rightholders.values(),
+            key=lambda rightholder: rightholder["short_title"] or "",
+        ),
+        "filters": filters,
+        "sort": sort,
+        "query": query.urlencode(),
+        "sort_query": sort_query.urlencode(),
     }
-    context.update(common_context)
+    context.update(get_common_context())
     return HttpResponse(template.render(context, request))
 
 @login_required
 @user_passes_test(is_staff_check, login_url=LMS_URL)
+@profiled
 def course_add(request) -> HttpResponse:
     template = loader.get_template("scos/course/add.html")
     course_url: str = request.GET.get("course_url")
@@ -117,14 +211,16 @@ def course_add(request) -> HttpResponse:
             "course_json": course_info.json(),
             "course": course_info.dictionary(),
         }
-    context.update(common_context)
+    context.update(get_common_context())
     return HttpResponse(template.render(context, request))
 
 @login_required
 @user_passes_test(is_staff_check, login_url=LMS_URL)
+@profiled
+@with_deadline(SCOS_VIEW_DEADLINE)
 def course_update(request, global_id) -> HttpResponse:
     template = loader.get_template("scos/course/update.html")
-    scos_course = scos_get_course(global_id)
+    scos_course = get_registry_course_or_404(global_id)
     course_url = scos_course.get("external_url")
     course_key = get_course_key(course_url)
     course_info = get_course_info(course_key)
@@ -133,65 +229,132 @@ def course_update(request, global_id) -> HttpResponse:
         "course_json": course_info.json(),
         "course": course_info.dictionary(),
     }
-    context.update(common_context)
+    context.update(get_common_context())
     return HttpResponse(template.render(context, request))
 
 @login_required
 @user_passes_test(is_staff_check, login_url=LMS_URL)
+@with_deadline(SCOS_VIEW_DEADLINE)
 def course_send(request, global_id: str = None) -> HttpResponse:
     if request.method == "POST":
         course_info = json.loads(request.body)
-        if global_id is None:
-            scos_response = scos_post_course(course_info)
-            return HttpResponse(json.dumps(scos_response))
-        scos_response = scos_put_course(course_info, global_id)
+        try:
+            scos_response = scos_send_course(dict(course_info), global_id)
+        except SCOSError as error:
+            return HttpResponse(json.dumps(error.as_dict()))
+        course_key = get_course_key(course_info.get("external_url") or "")
+        if course_key is not None:
+            set_course_snapshot(course_key, course_info)
+        start_registry_sync()
         return HttpResponse(json.dumps(scos_response))
 
 @login_required
 @user_passes_test(is_staff_check, login_url=LMS_URL)
+@profiled
+@with_deadline(SCOS_VIEW_DEADLINE)
 def course(request, global_id) -> HttpResponse:
     template = loader.get_template("scos/course/course.html")
     context = {
         "global_id": global_id,
-        "scos_course": scos_get_course(global_id),
+        "scos_course": get_registry_course(global_id),
     }
-    context.update(common_context)
+    context.update(get_common_context())
     return HttpResponse(template.render(context, request))
 
 @login_required
 @user_passes_test(is_staff_check, login_url=LMS_URL)
+@profiled
 def user_courses(request) -> HttpResponse:
     template = loader.get_template("scos/user/courses.html")
-    scos_courses = scos_get_courses()
-    scos_rightholders = scos_partners_dict(scos_get_rightholders())
-    scos_platform = scos_partners_dict(scos_get_platforms())[SCOS_PARTNER_ID]
-    for scos_course in scos_courses["results"]:
-        scos_course.update(
-            {
-                "institution_short_title": scos_rightholders\
-                    [scos_course["institution_id"]]["short_title"],
-                "session_id": get_course_key(
-                    scos_get_course(scos_course["global_id"])["external_url"]\
-                )
-            }
-        )
     context = {
-        "scos_courses": scos_courses,
-        "scos_platform": scos_platform,
+        "scos_platform": get_scos_platform(),
     }
-    context.update(common_context)
+    context.update(get_common_context())
     return HttpResponse(template.render(context, request))
 
 @login_required
 @user_passes_test(is_staff_check, login_url=LMS_URL)
+@profiled
+@with_deadline(SCOS_VIEW_DEADLINE)
 def user_course(request, global_id) -> HttpResponse:
     template = loader.get_template("scos/user/course.html")
-    course_id = get_course_key(scos_get_course(global_id)["external_url"])
-    enrollments = get_course_enrollments(course_id)
+    course_id = get_course_key(get_registry_course_or_404(global_id)["external_url"])
     context = {
         "global_id": global_id,
         "course_id": course_id,
-        "enrollments": enrollments,
     }
-    context.update(common_context)
+    context.update(get_common_context())
     return HttpResponse(template.render(context, request))
+
+@login_required
+@user_passes_test(is_staff_check, login_url=LMS_URL)
+@with_deadline(SCOS_VIEW_DEADLINE)
+def user_course_export(request, global_id, export_format) -> StreamingHttpResponse:
+    exports = {
+        "csv": (roster_csv, "text/csv"),
+        "json": (roster_json, "application/json"),
+    }
+    if export_format not in exports:
+        raise Http404
+    course_id = get_course_key(get_registry_course_or_404(global_id)["external_url"])
+    export, content_type = exports[export_format]
+    response = StreamingHttpResponse(
+        export(iter_course_roster(course_id)),
+        content_type = f"{content_type}; charset=utf-8",
+    )
+    response["Content-Disposition"] = \
+        f'attachment; filename="scos_{global_id}.{export_format}"'
+    return response
+
+@login_required
+@user_passes_test(is_staff_check, login_url=LMS_URL)
+def profile(request, profile_id) -> FileResponse:
+    if request.GET.get("format") == "json":
+        path = get_profile_file(profile_id, "json")
+        content_type = "application/json"
+    else:
+        path = get_profile_file(profile_id, "prof")
+        content_type = "application/octet-stream"
+    if path is None:
+        raise Http404
+    return FileResponse(
+        open(path, "rb"), # pylint: disable=consider-using-with
+        as_attachment = content_type != "application/json",
+        filename = os.path.basename(path),
+        content_type = content_type,
+    )
+
+@login_required
+@user_passes_test(is_staff_check, login_url=LMS_URL)
+@require_POST
+def registry_sync(request) -> HttpResponseRedirect:
+    start_registry_sync(full=request.POST.get("full") == "1")
+    redirect_to = request.POST.get("next", "")
+    if not url_has_allowed_host_and_scheme(
+        redirect_to, allowed_hosts={request.get_host()}, require_https=request.is_secure()
+    ):
+        redirect_to = reverse("scos:scos")
+    return HttpResponseRedirect(redirect_to)
+
+@login_required
+@user_passes_test(is_staff_check, login_url=LMS_URL)
+@profiled
+def delivery(request) -> HttpResponse:
+    template = loader.get_template("scos/delivery.html")
+    stats = get_delivery_stats()
+    context = {
+        "scos_platform": get_scos_platform(),
+        "delivery_stats": stats,
+        "failed": sum(row["failed"] for row in stats),
+        "circuit": get_circuit_status(),
+        "retried": request.GET.get("retried"),
+    }
+    context.update(get_common_context())
+    return HttpResponse(template.render(context, request))
+
+@login_required
+@user_passes_test(is_staff_check, login_url=LMS_URL)
+@require_POST
+def delivery_retry(request) -> HttpResponseRedirect:
+    count = start_delivery_retry(request.POST.get("kind") or None)
+    return HttpResponseRedirect(f"{reverse('scos:delivery')}?retried={count}")
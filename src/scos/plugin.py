@@ -3,12 +3,11 @@ from __future__ import annotations
 import os
 import os.path
 import shutil
-from glob import glob
-from typing import Union
-from importlib.metadata import entry_points
+import hashlib
+from importlib.resources import files
+from typing import Iterator, Union
 
 import appdirs
-import pkg_resources
 from tutor import hooks, fmt, serialize
 from tutor import config as tutor_config
 from tutor.types import Config
@@ -20,32 +19,161 @@ from .__about__ import __version__
 ROOT_PATH: str = (os.path.expanduser(os.environ.get("TUTOR_ROOT", ""))
     or appdirs.user_data_dir(__app__)
 )
-SCOS_BUILD: str = pkg_resources.resource_filename("scos", "app")
-SCOS_TEMPLATES: str = pkg_resources.resource_filename("scos", "templates")
-SCOS_PATCHES: str = pkg_resources.resource_filename("scos", "patches")
+PLUGIN_NAME: str = __name__.split(".", maxsplit=1)[0]
+SCOS_BUILD = files("scos") / "app"
+SCOS_PATCHES = files("scos") / "patches"
+SCOS_BUILD_DST: str = os.path.join(ROOT_PATH, "env/build/openedx/openedx-scos")
+# Признак скопированной версии пакета в SCOS_BUILD_DST
+SCOS_BUILD_STAMP: str = os.path.join(SCOS_BUILD_DST, ".scos-build-stamp")
+
+# Настройки, которые необходимо заполнить в config.yml
+SCOS_REQUIRED: dict = {
+    "SCOS_OIDC_ENDPOINT": "https://auth-test.online.edu.ru/realms/portfolio",
+    "SCOS_BASE_URL": "https://test.online.edu.ru",
+    "SCOS_X_CN_UUID": "",
+    "SCOS_PARTNER_ID": "",
+}
 
 
 
 hooks.Filters.CONFIG_DEFAULTS.add_items(
     [
         ("SCOS_VERSION", __version__),
+        *SCOS_REQUIRED.items(),
+        ("SCOS_OIDC_CACHE_TIMEOUT", 3600),
+        ("SCOS_OIDC_REFRESH_BEFORE", 300),
+        ("SCOS_COURSE_AUTO_UPDATE", True),
+        ("SCOS_COURSE_UPDATE_DELAY", 60),
+        ("SCOS_COURSES_PAGE_SIZE", 50),
+        ("SCOS_ROSTER_PAGE_SIZE", 100),
+        ("SCOS_WIDGET_FRESH", 600),
+        ("SCOS_WIDGET_TIMEOUT", 86400),
+        ("SCOS_WIDGET_TIME_BUDGET", 0.1),
+        ("SCOS_HTTP_CACHE", "default"),
+        ("SCOS_HTTP_CACHE_TIMEOUT", 300),
+        ("SCOS_HTTP_CACHE_STORE_TIMEOUT", 604800),
+        ("SCOS_HTTP_CACHE_LOCK_TIMEOUT", 30),
+        ("SCOS_HTTP_CACHE_LOCK_WAIT", 5),
+        ("SCOS_CONNECT_TIMEOUT", 3.05),
+        ("SCOS_READ_TIMEOUT", 5.0),
+        ("SCOS_VIEW_DEADLINE", 10.0),
+        ("SCOS_TASK_DEADLINE", 60.0),
+        ("SCOS_HEDGE_DELAY", 0),
+        ("SCOS_STREAM_RESPONSES", False),
+        ("SCOS_TRAFFIC_RECORD", False),
+        ("SCOS_TRAFFIC_PATH", "/openedx/data/scos/traffic"),
+        ("SCOS_TRAFFIC_MAX_BYTES", 67108864),
+        ("SCOS_TRAFFIC_BACKUPS", 4),
+        ("SCOS_TRAFFIC_SALT", ""),
+        ("SCOS_TRACING", False),
+        ("SCOS_TRACING_SAMPLE_RATE", 1.0),
+        ("SCOS_TRACING_EXPORTER", "scos.utils.tracing.JSONFileExporter"),
+        ("SCOS_TRACING_PATH", "/openedx/data/scos/traces"),
+        ("SCOS_PROFILING", False),
+        ("SCOS_PROFILING_TASKS", False),
+        ("SCOS_PROFILING_PATH", "/openedx/data/scos/profiles"),
+        ("SCOS_PROFILING_KEEP", 50),
+        ("SCOS_ASYNC_PUBLISH", False),
+        ("SCOS_PUBLISH_QUEUE_SIZE", 10000),
+        ("SCOS_PUBLISH_BATCH_SIZE", 100),
+        ("SCOS_PUBLISH_FLUSH_INTERVAL", 0.05),
+        ("SCOS_SPOOL_PATH", "/openedx/data/scos/spool"),
+        ("SCOS_SPOOL_RETRY_INTERVAL", 10),
+        ("SCOS_ORDERED_DELIVERY", True),
+        ("SCOS_ORDERING_TIMEOUT", 300),
+        ("SCOS_ORDERING_RETRY_DELAY", 1),
+        ("SCOS_ASYNC_DELIVERY", False),
+        ("SCOS_DELIVERY_QUEUE", "scos.delivery"),
+        ("SCOS_ASYNC_CONCURRENCY", 200),
+        ("SCOS_ASYNC_PREPARE_THREADS", 8),
+        ("SCOS_REGISTRY_SYNC_INTERVAL", 600),
+        ("SCOS_CIRCUIT_FAILURES", 5),
+        ("SCOS_CIRCUIT_COOLDOWN", 60),
+        ("SCOS_DELIVERY_RETENTION_DAYS", 30),
+        ("SCOS_DELIVERY_PENDING_TIMEOUT", 3600),
+        ("SCOS_VISITORS_INTERVAL", 3600),
+        ("SCOS_VISITORS_THRESHOLD", 0.05),
+        ("SCOS_VISITORS_BATCH_SIZE", 50),
+        ("SCOS_SHADOW_BASE_URL", ""),
+        ("SCOS_SHADOW_X_CN_UUID", ""),
+        ("SCOS_SHADOW_RATE", 10),
+        ("SCOS_SHADOW_BURST", 20),
+        ("SCOS_SHADOW_QUEUE_SIZE", 1000),
+        ("SCOS_SHADOW_THREADS", 4),
+        ("SCOS_SHADOW_TIMEOUT", 10),
+        ("SCOS_SHADOW_IGNORE_FIELDS", []),
+        ("SCOS_SHADOW_PATH", "/openedx/data/scos/shadow"),
     ]
 )
 
 
 
-# Копируем Django приложение и дополнительные модули СЦОС в папку с Dockerfile openedX
-shutil.copytree(
-    os.path.join(SCOS_BUILD, "scos"),
-    os.path.join(ROOT_PATH, "env/build/openedx/scos"),
-    dirs_exist_ok=True
-)
+def file_hash(path: str) -> str:
+    with open(path, "rb") as hash_file:
+        return hashlib.sha256(hash_file.read()).hexdigest()
+
+def iter_build_files(root: str, prefix: str = "") -> Iterator[str]:
+    for name in sorted(os.listdir(os.path.join(root, prefix))):
+        if name == "__pycache__":
+            continue
+        path = os.path.join(prefix, name)
+        if os.path.isdir(os.path.join(root, path)):
+            yield from iter_build_files(root, path)
+        else:
+            yield path
+
+def build_stamp(root: str) -> str:
+    """
+    Признак изменения пакета без чтения файлов: версия плагина, число,
+    суммарный размер и последнее время изменения файлов
+    """
+    stats = [os.stat(os.path.join(root, path)) for path in iter_build_files(root)]
+    return ":".join(str(value) for value in (
+        __version__,
+        len(stats),
+        sum(stat.st_size for stat in stats),
+        max((stat.st_mtime_ns for stat in stats), default=0),
+    ))
+
+def copy_scos_build() -> None:
+    """
+    Копируем пакет Django приложения СЦОС в папку с Dockerfile openedX.
+    Копируются только измененные файлы, пакет без изменений с последнего
+    копирования (SCOS_BUILD_STAMP) не проверяется.
+    """
+    src_root = str(SCOS_BUILD)
+    stamp = build_stamp(src_root)
+    if os.path.exists(SCOS_BUILD_STAMP):
+        with open(SCOS_BUILD_STAMP, encoding="utf-8") as stamp_file:
+            if stamp_file.read() == stamp:
+                return
+    for path in iter_build_files(src_root):
+        if path == "__init__.py":
+            continue
+        src = os.path.join(src_root, path)
+        dst = os.path.join(SCOS_BUILD_DST, path)
+        if os.path.exists(dst) and file_hash(src) == file_hash(dst):
+            continue
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.copy2(src, dst)
+    with open(SCOS_BUILD_STAMP, "w", encoding="utf-8") as stamp_file:
+        stamp_file.write(stamp)
+
+@hooks.Actions.CONFIG_LOADED.add()
+def _copy_scos_build_on_config_loaded(config: Config) -> None: # pylint: disable=unused-argument
+    # Команды с полной конфигурацией: tutor config save, tutor images build и др.
+    # Фильтры (ENV_TEMPLATE_TARGETS, IMAGES_BUILD) только возвращают значения,
+    # поэтому копирование выполняется в действии. Действие вызывается каждой
+    # командой tutor, файлы пакета сравниваются только при изменении признака
+    copy_scos_build()
 
 
 
 CONFIG_MOD: dict = {
         "OPENEDX_EXTRA_PIP_REQUIREMENTS": [
             "python-jose>=3.0.0",
+            "ijson>=3.2",
+            "aiohttp>=3.10",
         ],
 }
 
@@ -54,7 +182,7 @@ def add_scos_config_mod_to_environ(plugin: str) -> None:
     """
     Add scos config modifications to os.environ
     """
-    if plugin != entry_points(value=__name__)[0].name:
+    if plugin != PLUGIN_NAME:
         return
     env_var: str = os.environ.get("CONFIG_MOD")
     if env_var is None:
@@ -74,14 +202,13 @@ def add_scos_config_mod_to_environ(plugin: str) -> None:
 @hooks.Actions.PLUGINS_LOADED.add()
 def write_changes_to_config():
     """
-    Add config modifications from os.environ to config 
+    Add config modifications from os.environ and missing scos settings
+    to config. Config is read once and saved only if it was changed.
     """
     config: Config = tutor_config.load_minimal(ROOT_PATH)
-    env_var: str = os.environ.get("CONFIG_MOD")
-    if env_var is None:
-        return
-    env_mod: dict = serialize.parse(env_var)
     config_mod: bool = False
+    env_var: Union[str, None] = os.environ.get("CONFIG_MOD")
+    env_mod: dict = serialize.parse(env_var) if env_var is not None else {}
     for key, value in env_mod.items():
         if not key in config:
             config.update({key: value})
@@ -92,70 +219,24 @@ def write_changes_to_config():
                     e for e in value if e not in config[key]
                 ]
                 config_mod = True
+    for key, default in SCOS_REQUIRED.items():
+        if config.get(key) is None:
+            config.update({key: default})
+            config_mod = True
+        if config[key] == default:
+            fmt.echo_info(
+                f"Обновите переменную {key} в конфигурационном файле:\n"
+                f"{ROOT_PATH + '/config.yml'}"
+            )
     if config_mod:
         tutor_config.save_config_file(ROOT_PATH, config)
 
 
 
-def check_defaults(key: str, default: str = "") -> str:
-    """
-    Проверяем изменены ли настройки по умолчанию
-    """
-    config: Config = tutor_config.load_minimal(ROOT_PATH)
-    value: Union[str, None] = config.get(key)
-    if value is None:
-        value = default
-        config.update({key: value})
-        tutor_config.save_config_file(ROOT_PATH, config)
-    if value == default:
-        fmt.echo_info(
-            f"Обновите переменную {key} в конфигурационном файле:\n"
-            f"{ROOT_PATH + '/config.yml'}"
-        )
-    return value
-
-SCOS_OIDC_ENDPOINT: str = check_defaults(
-    "SCOS_OIDC_ENDPOINT",
-    "https://auth-test.online.edu.ru/realms/portfolio"
-)
-SCOS_BASE_URL: str = check_defaults(
-    "SCOS_BASE_URL",
-    "https://test.online.edu.ru"
-)
-SCOS_X_CN_UUID: str = check_defaults(
-    "SCOS_X_CN_UUID",
-)
-SCOS_PARTNER_ID: str = check_defaults(
-    "SCOS_PARTNER_ID",
-)
-
-
-
-hooks.Filters.ENV_PATCHES.add_items(
-    [
-        (
-            "lms-env",
-            f"SCOS_OIDC_ENDPOINT: \"{SCOS_OIDC_ENDPOINT}\""
-        ),
-        (
-            "cms-env",
-            f"SCOS_BASE_URL: \"{SCOS_BASE_URL}\""
-        ),
-                (
-            "cms-env",
-            f"SCOS_X_CN_UUID: \"{SCOS_X_CN_UUID}\""
-        ),
-                (
-            "cms-env",
-            f"SCOS_PARTNER_ID: \"{SCOS_PARTNER_ID}\""
-        ),
-    ]
-)
-
-
-
-for path in glob(os.path.join(SCOS_PATCHES, "*")):
-    with open(path, encoding="utf-8") as patch_file:
-        hooks.Filters.ENV_PATCHES.add_item(
-            (os.path.basename(path), patch_file.read())
-        )
+for patch in sorted(SCOS_PATCHES.iterdir(), key=lambda patch: patch.name):
+    if patch.name.startswith(".") or not patch.is_file():
+        # Служебные файлы (.DS_Store, .gitkeep) и каталоги - не патчи
+        continue
+    hooks.Filters.ENV_PATCHES.add_item(
+        (patch.name, patch.read_text(encoding="utf-8"))
+    )
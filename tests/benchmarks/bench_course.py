@@ -0,0 +1,53 @@
+"""
+Разбор страницы описания курса (OverviewHTMLParser, TeachersHTMLParser),
+CourseInfo и get_course_key
+"""
+
+import fixtures
+from benchmark import benchmark
+
+from scos.utils.course import (
+    CourseInfo,
+    OverviewHTMLParser,
+    TeachersHTMLParser,
+    get_course_info,
+    get_course_key,
+)
+
+
+
+ABOUT_PAGE = fixtures.about_page()
+COURSE_URL = f"https://lms.benchmark/courses/{fixtures.COURSE_KEY}/about"
+COURSE_INFO = get_course_info(fixtures.COURSE_KEY)
+
+
+
+@benchmark("course", iterations=200)
+def overview_parser():
+    parser = OverviewHTMLParser()
+    parser.feed(ABOUT_PAGE)
+
+@benchmark("course", iterations=200)
+def teachers_parser():
+    parser = TeachersHTMLParser()
+    parser.feed(ABOUT_PAGE)
+
+@benchmark("course", iterations=2000)
+def course_info_init():
+    CourseInfo()
+
+@benchmark("course", iterations=2000)
+def course_info_json():
+    COURSE_INFO.json()
+
+@benchmark("course", iterations=200)
+def get_course_info_about_page():
+    get_course_info(fixtures.COURSE_KEY)
+
+@benchmark("course", iterations=100000)
+def get_course_key_about_url():
+    get_course_key(COURSE_URL)
+
+@benchmark("course", iterations=100000)
+def get_course_key_no_match():
+    get_course_key("https://lms.benchmark/dashboard")
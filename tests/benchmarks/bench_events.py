@@ -0,0 +1,54 @@
+"""
+SCOSEventTrackingBackend.send: накладные расходы на одно событие
+отслеживания (постановка задачи Celery в очередь брокера в памяти).
+submit_async - постановка задачи в режиме SCOS_ASYNC_PUBLISH (буфер
+процесса, отправку брокеру выполняет фоновый поток).
+"""
+
+import environment
+import fixtures
+from benchmark import benchmark
+
+from scos.utils.events import SCOSEventTrackingBackend
+from scos.utils.publisher import get_publisher
+from scos.utils.tasks import user_enrolled
+
+
+
+BACKEND = SCOSEventTrackingBackend()
+ENROLLMENT = fixtures.enrollment_event()
+UNENROLLMENT = fixtures.unenrollment_event()
+SUBSECTION_GRADE = fixtures.subsection_grade_event()
+COURSE_GRADE = fixtures.course_grade_event()
+OTHER = fixtures.other_event()
+PUBLISHER = get_publisher()
+
+
+
+@benchmark("events", iterations=2000, teardown=environment.purge_queue)
+def send_enrollment():
+    BACKEND.send(ENROLLMENT)
+
+def flush_publisher():
+    PUBLISHER.flush()
+    environment.purge_queue()
+
+@benchmark("events", iterations=2000, teardown=flush_publisher)
+def submit_async():
+    PUBLISHER.submit(user_enrolled, (ENROLLMENT,), {}, {})
+
+@benchmark("events", iterations=2000, teardown=environment.purge_queue)
+def send_unenrollment():
+    BACKEND.send(UNENROLLMENT)
+
+@benchmark("events", iterations=2000, teardown=environment.purge_queue)
+def send_subsection_grade():
+    BACKEND.send(SUBSECTION_GRADE)
+
+@benchmark("events", iterations=2000, teardown=environment.purge_queue)
+def send_course_grade():
+    BACKEND.send(COURSE_GRADE)
+
+@benchmark("events", iterations=100000)
+def send_ignored():
+    BACKEND.send(OTHER)
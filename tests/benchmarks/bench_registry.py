@@ -0,0 +1,49 @@
+"""
+Локальная копия реестра СЦОС: синхронизация и список курсов панели СЦОС
+"""
+
+from django.core.cache import cache
+
+import fixtures
+from benchmark import benchmark
+
+from scos.models import SCOSCourse
+from scos.utils.course_list import get_course_list, get_course_list_page
+from scos.utils.registry import sync_registry
+
+
+
+FILTERS = {"title": "курс", "started_from": "2024-01-01"}
+
+
+
+def synced_registry() -> None:
+    if not SCOSCourse.objects.exists():
+        sync_registry()
+
+def empty_registry() -> None:
+    SCOSCourse.objects.all().delete()
+    cache.clear()
+
+
+
+@benchmark("registry", iterations=20, setup=synced_registry)
+def sync_registry_unchanged():
+    sync_registry()
+
+@benchmark("registry", iterations=5, setup=empty_registry)
+def sync_registry_initial():
+    sync_registry()
+
+@benchmark("registry", iterations=200, setup=synced_registry)
+def course_list_page():
+    list(get_course_list({}, "title")[:50])
+
+@benchmark("registry", iterations=200, setup=synced_registry)
+def course_list_filtered_sorted():
+    list(get_course_list(FILTERS, "-institution_short_title")[:50])
+
+@benchmark("registry", iterations=200, setup=synced_registry)
+def course_list_cursor_pages():
+    _, cursor = get_course_list_page({}, "-institution_short_title", size=50)
+    get_course_list_page({}, "-institution_short_title", cursor, 50)
@@ -0,0 +1,37 @@
+"""
+Поиск курса СЦОС get_scos_course по названию и адресу курса платформы
+"""
+
+from django.core.cache import cache
+
+import fixtures
+from benchmark import benchmark
+
+from scos.utils.scos_api import (
+    find_scos_course,
+    get_scos_course,
+)
+from scos.utils.course import get_course_info_from_overview
+
+
+
+REGISTRY = fixtures.registry_courses()["results"]
+COURSE_INFO = get_course_info_from_overview(fixtures.COURSE_KEY)
+
+
+
+@benchmark("scos_api", iterations=500)
+def get_scos_course_cached():
+    get_scos_course(fixtures.COURSE_KEY)
+
+@benchmark("scos_api", iterations=20, setup=cache.clear)
+def get_scos_course_cold_cache():
+    get_scos_course(fixtures.COURSE_KEY)
+
+@benchmark("scos_api", iterations=2000)
+def find_scos_course_in_registry():
+    find_scos_course(REGISTRY, COURSE_INFO)
+
+@benchmark("scos_api", iterations=2000)
+def get_scos_course_missing():
+    get_scos_course("course-v1:SSAU+MISSING+2024")
@@ -0,0 +1,70 @@
+"""
+Тела задач Celery tasks.py (без очереди): запросы к СЦОС выполняются
+заглушкой HTTP, список курсов СЦОС - из HTTP кэша, если не указано иное
+"""
+
+from django.core.cache import cache
+
+import fixtures
+from benchmark import benchmark
+
+from scos.utils.tasks import (
+    user_enrolled,
+    user_unenrolled,
+    subsection_grade,
+    course_grade,
+    course_published,
+    course_widget_refresh,
+)
+from scos.utils.course_update import (
+    set_course_publish_token,
+    set_course_snapshot,
+)
+
+
+
+ENROLLMENT = fixtures.enrollment_event()
+UNENROLLMENT = fixtures.unenrollment_event()
+SUBSECTION_GRADE = fixtures.subsection_grade_event()
+COURSE_GRADE = fixtures.course_grade_event()
+PUBLISH = {"token": ""}
+
+
+
+def stale_publish() -> None:
+    """
+    Последняя публикация курса и устаревший снимок: задача отправляет
+    обновление на СЦОС
+    """
+    PUBLISH["token"] = set_course_publish_token(fixtures.COURSE_KEY)
+    set_course_snapshot(fixtures.COURSE_KEY, {"title": "Прежнее название", "lectures": 20})
+
+
+
+@benchmark("tasks", iterations=500)
+def user_enrolled_body():
+    user_enrolled.run(ENROLLMENT)
+
+@benchmark("tasks", iterations=20, setup=cache.clear)
+def user_enrolled_body_cold_cache():
+    user_enrolled.run(ENROLLMENT)
+
+@benchmark("tasks", iterations=500)
+def user_unenrolled_body():
+    user_unenrolled.run(UNENROLLMENT)
+
+@benchmark("tasks", iterations=500)
+def subsection_grade_body():
+    subsection_grade.run(SUBSECTION_GRADE)
+
+@benchmark("tasks", iterations=500)
+def course_grade_body():
+    course_grade.run(COURSE_GRADE)
+
+@benchmark("tasks", iterations=100, setup=stale_publish)
+def course_published_body():
+    course_published.run(fixtures.COURSE_KEY, PUBLISH["token"])
+
+@benchmark("tasks", iterations=500)
+def course_widget_refresh_body():
+    course_widget_refresh.run(fixtures.COURSE_KEY)
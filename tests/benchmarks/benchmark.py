@@ -0,0 +1,101 @@
+"""
+Регистрация и измерение бенчмарков
+"""
+
+import gc
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Union
+
+
+
+@dataclass
+class Benchmark:
+    name: str
+    group: str
+    func: Callable[[], object]
+    setup: Union[Callable[[], object], None] = None
+    teardown: Union[Callable[[], object], None] = None
+    iterations: int = 1000
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+
+def benchmark(
+    group: str,
+    iterations: int = 1000,
+    setup: Union[Callable[[], object], None] = None,
+    teardown: Union[Callable[[], object], None] = None,
+) -> Callable:
+    """
+    Регистрирует функцию как бенчмарк "<group>.<имя функции>".
+
+    setup вызывается перед каждым вызовом функции и в измерение не входит,
+    teardown - после каждого повтора.
+    """
+    def register(func: Callable[[], object]) -> Callable[[], object]:
+        name = f"{group}.{func.__name__}"
+        BENCHMARKS[name] = Benchmark(
+            name=name,
+            group=group,
+            func=func,
+            setup=setup,
+            teardown=teardown,
+            iterations=iterations,
+        )
+        return func
+    return register
+
+def measure(bench: Benchmark, iterations: int) -> float:
+    """
+    Время (нс) выполнения iterations вызовов
+    """
+    func = bench.func
+    if bench.setup is None:
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            func()
+        return time.perf_counter_ns() - start
+    elapsed = 0
+    for _ in range(iterations):
+        bench.setup()
+        start = time.perf_counter_ns()
+        func()
+        elapsed += time.perf_counter_ns() - start
+    return elapsed
+
+def run(bench: Benchmark, repeat: int = 5, scale: float = 1.0) -> dict:
+    """
+    Выполняет бенчмарк repeat раз, возвращает время одного вызова (нс)
+    """
+    iterations = max(1, int(bench.iterations * scale))
+    measure(bench, max(1, iterations // 10))
+    if bench.teardown is not None:
+        bench.teardown()
+    timings: List[float] = []
+    gc_enabled = gc.isenabled()
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            timings.append(measure(bench, iterations) / iterations)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        if bench.teardown is not None:
+            bench.teardown()
+    median = statistics.median(timings)
+    return {
+        "name": bench.name,
+        "group": bench.group,
+        "unit": "ns",
+        "iterations": iterations,
+        "repeat": repeat,
+        "min": round(min(timings), 1),
+        "median": round(median, 1),
+        "mean": round(statistics.fmean(timings), 1),
+        "stdev": round(statistics.stdev(timings), 1) if repeat > 1 else 0.0,
+        "ops_per_sec": round(1e9 / median, 1) if median else None,
+    }
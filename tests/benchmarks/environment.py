@@ -0,0 +1,255 @@
+"""
+Окружение бенчмарков: заглушки модулей Open edX, настройки Django, Celery с
+брокером в памяти и ответы СЦОС/LMS без обращения к сети.
+
+setup() необходимо вызвать до импорта модулей приложения scos.
+"""
+
+import atexit
+import os
+import sys
+import tempfile
+import types
+from datetime import datetime, timezone
+
+import requests
+from django.apps import AppConfig
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+import fixtures
+
+
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+APP_PATH = os.path.join(ROOT_PATH, "src", "scos", "app")
+SETTINGS_MODULE = "scos_benchmark_settings"
+
+SCOS_BASE_URL = "https://scos.benchmark"
+LMS_BASE = "lms.benchmark"
+LMS_URL = f"https://{LMS_BASE}"
+
+# Ответы заглушки HTTP: (метод, адрес без параметров) -> (код, тело)
+ROUTES = {}
+
+
+
+def stub_module(name: str, **attrs) -> types.ModuleType:
+    """
+    Создает модуль-заглушку (и родительские пакеты) в sys.modules
+    """
+    parts = name.split(".")
+    for i in range(1, len(parts)):
+        parent = ".".join(parts[:i])
+        if parent not in sys.modules:
+            package = types.ModuleType(parent)
+            package.__path__ = []
+            sys.modules[parent] = package
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+class BaseBackend:
+
+    def __init__(self, **kwargs) -> None:
+        self.options = kwargs
+
+class CourseOverview:
+
+    def __init__(self, course_key: str) -> None:
+        self.id = course_key
+        self.display_name = fixtures.course_title(course_key)
+        self.start = datetime(2024, 9, 1, tzinfo=timezone.utc)
+        self.end = datetime(2024, 12, 31, tzinfo=timezone.utc)
+        self.enrollment_end = datetime(2024, 9, 15, tzinfo=timezone.utc)
+        self.course_image_url = "/asset-v1:SSAU+BENCH+2024+type@asset+block@course_image.jpg"
+        self.effort = "04:00"
+        self.course_video_url = "https://www.youtube.com/watch?v=benchmark"
+
+    @classmethod
+    def get_from_id(cls, course_key):
+        return cls(str(course_key))
+
+class UserSocialAuth:
+
+    class DoesNotExist(Exception):
+        pass
+
+    class objects: # pylint: disable=invalid-name
+
+        @staticmethod
+        def get(user_id, provider):
+            return types.SimpleNamespace(
+                user_id=user_id, provider=provider, uid=f"scos-{user_id}"
+            )
+
+class SCOSBenchmarkConfig(AppConfig):
+    """
+    Приложение scos без ready(): модели без сигналов платформы
+    """
+    name = "scos"
+    label = "scos"
+    default_auto_field = "django.db.models.AutoField"
+
+def get_blocks(request, usage_key, requested_fields=None): # pylint: disable=unused-argument
+    return {"blocks": {str(usage_key): {"display_name": "Контрольная работа 1"}}}
+
+def database_file() -> str:
+    """
+    Файл базы sqlite: база в памяти (":memory:") у каждого потока своя, а
+    задачи Celery в load.py и replay.py выполняются в потоках воркера
+    """
+    handle, path = tempfile.mkstemp(suffix=".sqlite3", prefix="scos-benchmark-")
+    os.close(handle)
+    atexit.register(os.remove, path)
+    return path
+
+def install_stubs() -> None:
+    """
+    Заглушки модулей edx-platform, которые импортирует приложение scos
+    """
+    stub_module(
+        SETTINGS_MODULE,
+        SCOSBenchmarkConfig=SCOSBenchmarkConfig,
+        DEBUG=False,
+        SECRET_KEY="benchmark",
+        USE_TZ=True,
+        LMS_BASE=LMS_BASE,
+        HTTPS="on",
+        INSTALLED_APPS=[
+            "django.contrib.auth",
+            "django.contrib.contenttypes",
+            f"{SETTINGS_MODULE}.SCOSBenchmarkConfig",
+        ],
+        DATABASES={
+            "default": {
+                "ENGINE": "django.db.backends.sqlite3",
+                "NAME": database_file(),
+                "OPTIONS": {"timeout": 30},
+            },
+        },
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        },
+    )
+    stub_module("common.djangoapps.track.backends", BaseBackend=BaseBackend)
+    stub_module(
+        "common.djangoapps.student.models.course_enrollment",
+        CourseEnrollment=type("CourseEnrollment", (), {}),
+    )
+    stub_module(
+        "openedx.core.djangoapps.content.course_overviews.models",
+        CourseOverview=CourseOverview,
+    )
+    stub_module("lms.djangoapps.course_api.blocks.api", get_blocks=get_blocks)
+    stub_module("social_django.models", UserSocialAuth=UserSocialAuth)
+
+def write_config(scos_base_url: str) -> str:
+    """
+    Конфигурационный файл CMS с настройками СЦОС
+    """
+    config_file = tempfile.NamedTemporaryFile( # pylint: disable=consider-using-with
+        "w", suffix=".yml", prefix="scos-benchmark-", delete=False, encoding="utf-8"
+    )
+    with config_file:
+        config_file.write(
+            f"SCOS_BASE_URL: {scos_base_url}\n"
+            "SCOS_X_CN_UUID: benchmark\n"
+            f"SCOS_PARTNER_ID: {fixtures.PARTNER_ID}\n"
+        )
+    atexit.register(os.remove, config_file.name)
+    return config_file.name
+
+def http_send(adapter, request, **kwargs) -> requests.Response: # pylint: disable=unused-argument
+    """
+    Заглушка HTTPAdapter.send: ответ из ROUTES без обращения к сети
+    """
+    url = request.url.split("?", 1)[0]
+    status_code, content = ROUTES.get((request.method, url), (404, b"{}"))
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict(
+        {"Content-Type": "application/json; charset=utf-8"}
+    )
+    response.encoding = "utf-8"
+    response._content = content # pylint: disable=protected-access
+    response.url = request.url
+    response.request = request
+    return response
+
+def install_routes() -> None:
+    registry = fixtures.registry_courses()
+    ROUTES.update(
+        {
+            ("GET", f"{SCOS_BASE_URL}/api/v2/registry/courses"):
+                (200, fixtures.dumps(registry)),
+            ("GET", f"{SCOS_BASE_URL}/api/v2/registry/partners/platforms"):
+                (200, fixtures.dumps(fixtures.platforms())),
+            ("GET", f"{SCOS_BASE_URL}/api/v2/registry/partners/rightholders"):
+                (200, fixtures.dumps(fixtures.rightholders())),
+            ("PUT", f"{SCOS_BASE_URL}/api/v2/registry/courses"):
+                (200, b"{}"),
+            ("POST", f"{SCOS_BASE_URL}/api/v2/courses/participation"):
+                (200, b"{}"),
+            ("DELETE", f"{SCOS_BASE_URL}/api/v2/courses/participation"):
+                (200, b"{}"),
+            ("POST", f"{SCOS_BASE_URL}/api/v2/courses/results"):
+                (200, b"{}"),
+            ("POST", f"{SCOS_BASE_URL}/api/v2/courses/results/progress"):
+                (200, b"{}"),
+        }
+    )
+    for course in registry["results"]:
+        ROUTES[("GET", f"{SCOS_BASE_URL}/api/v2/registry/courses/{course['global_id']}")] = (
+            200, fixtures.dumps(course)
+        )
+    ROUTES[("GET", f"{LMS_URL}/courses/{fixtures.COURSE_KEY}/about")] = (
+        200, fixtures.about_page().encode("utf-8")
+    )
+
+def setup(scos_base_url: str = "") -> None:
+    """
+    Подготавливает окружение, импорт модулей scos после вызова.
+
+    Без scos_base_url запросы к СЦОС и LMS обрабатывает заглушка HTTP в
+    процессе, иначе запросы отправляются на scos_base_url (см. stub_server).
+    """
+    if APP_PATH not in sys.path:
+        sys.path.insert(0, APP_PATH)
+    os.environ["DJANGO_SETTINGS_MODULE"] = SETTINGS_MODULE
+    if "CMS_CFG" not in os.environ:
+        os.environ["CMS_CFG"] = write_config(scos_base_url or SCOS_BASE_URL)
+    install_stubs()
+    if not scos_base_url:
+        install_routes()
+        HTTPAdapter.send = http_send
+
+    import django # pylint: disable=import-outside-toplevel
+    django.setup()
+    create_tables()
+
+    from celery import Celery # pylint: disable=import-outside-toplevel
+    app = Celery("scos_benchmark", broker="memory://", set_as_current=True)
+    app.conf.task_always_eager = False
+    app.conf.broker_transport_options = {"polling_interval": 0.001}
+    app.set_default()
+
+def create_tables() -> None:
+    """
+    Таблицы моделей scos во временной базе (миграции scos зависят от таблиц
+    edx-platform)
+    """
+    from django.apps import apps # pylint: disable=import-outside-toplevel
+    from django.db import connection # pylint: disable=import-outside-toplevel
+    with connection.schema_editor() as editor:
+        for model in apps.get_app_config("scos").get_models():
+            editor.create_model(model)
+
+def purge_queue() -> None:
+    """
+    Очищает очередь брокера в памяти
+    """
+    from celery import current_app # pylint: disable=import-outside-toplevel
+    with current_app.connection_for_write() as connection:
+        current_app.control.purge(connection=connection)
@@ -0,0 +1,251 @@
+"""
+Данные бенчмарков: реестр курсов СЦОС, страница описания курса LMS с
+разметкой data-scos, события отслеживания
+"""
+
+import json
+from datetime import datetime, timezone
+from typing import Iterable, Union
+
+
+
+PARTNER_ID = "benchmark-partner"
+COURSE_KEY = "course-v1:SSAU+BENCH+2024"
+REGISTRY_SIZE = 500
+# Позиция курса COURSE_KEY в реестре: поиск проходит большую часть списка
+COURSE_POSITION = 400
+TEACHERS = 4
+BLOCK_ID = "block-v1:SSAU+BENCH+2024+type@sequential+block@a1b2c3d4e5f6"
+
+DESCRIPTION = (
+    "Курс знакомит слушателей с основами проектирования программных систем, "
+    "методами анализа требований и современными подходами к разработке. "
+)
+
+
+
+def dumps(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+def course_title(course_key: str) -> str:
+    return f"Онлайн-курс {course_key}"
+
+def course_key(position: int) -> str:
+    """
+    Курс платформы, размещенный на СЦОС под номером position
+    """
+    if position == COURSE_POSITION:
+        return COURSE_KEY
+    return f"course-v1:SSAU+C{position:04d}+2024"
+
+def registry_course(position: int, key: Union[str, None] = None) -> dict:
+    """
+    Онлайн-курс реестра СЦОС, key - курс платформы вместо course_key(position)
+    """
+    key = key or course_key(position)
+    return {
+        "global_id": f"00000000-0000-0000-0000-{position:012d}",
+        "title": course_title(key),
+        "external_url": f"https://lms.benchmark/courses/{key}/about",
+        "institution_id": f"institution-{position % 20}",
+        "partner_id": PARTNER_ID,
+        "language": "ru",
+        "business_version": 3,
+        "started_at": "2024-09-01",
+        "finished_at": "2024-12-31",
+        "description": DESCRIPTION * 3,
+        "image": f"https://lms.benchmark/asset-v1:SSAU+C{position:04d}+2024.jpg",
+    }
+
+def registry_courses(size: int = REGISTRY_SIZE, extra_keys: Iterable[str] = ()) -> dict:
+    """
+    3.1.14. Список онлайн-курсов платформы, extra_keys - дополнительные курсы
+    платформы (например, из записанного трафика)
+    """
+    results = [registry_course(position) for position in range(size)]
+    known = {course_key(position) for position in range(size)}
+    for key in extra_keys:
+        if key not in known:
+            known.add(key)
+            results.append(registry_course(len(results), key))
+    return {
+        "total_count": len(results),
+        "results": results,
+    }
+
+def overview_section() -> str:
+    paragraphs = "\n".join(
+        f"<p data-scos=\"description\">{DESCRIPTION} Раздел {i}.</p>" for i in range(6)
+    )
+    competences = "\n".join(
+        f"<li data-scos=\"competences\">Компетенция {i}: способность применять "
+        f"методы проектирования <strong>в профессиональной деятельности</strong></li>"
+        for i in range(8)
+    )
+    content = "\n".join(
+        f"<li data-scos=\"content\">Неделя {i}. Тема {i}: <em>лекция</em>, "
+        f"практическое задание, тест</li>" for i in range(12)
+    )
+    teachers = "\n".join(
+        f"""
+        <article class="teacher" data-scos-teacher="teacher">
+          <div class="teacher-image">
+            <img data-scos-teacher="image" src="/asset-v1:SSAU+BENCH+2024+type@asset+block@teacher{i}.jpg" alt="">
+          </div>
+          <h3 data-scos-teacher="display_name">Преподаватель Номер {i}</h3>
+          <p data-scos-teacher="description">Доцент кафедры программных систем,
+          кандидат технических наук. <br> Автор более 50 научных работ.</p>
+        </article>""" for i in range(TEACHERS)
+    )
+    return f"""
+    <section class="about">
+      <h2>О курсе</h2>
+      {paragraphs}
+    </section>
+    <section class="prerequisites">
+      <h2>Требования</h2>
+      <p data-scos="requirements">Знание основ программирования</p>
+      <p data-scos="requirements">Базовые знания математики</p>
+    </section>
+    <section class="course-staff">
+      <h2>Преподаватели</h2>
+      {teachers}
+    </section>
+    <section class="competences">
+      <h2>Формируемые компетенции</h2>
+      <ul>{competences}</ul>
+    </section>
+    <section class="content">
+      <h2>Содержание</h2>
+      <ul>{content}</ul>
+    </section>
+    <section class="details">
+      <p>Длительность: <span data-scos="duration">12</span> недель</p>
+      <p>Лекций: <span data-scos="lectures">24</span></p>
+      <p>Язык: <span data-scos="language">Русский</span></p>
+      <p>Сертификат: <span data-scos="cert">Есть</span></p>
+      <p>Трудоемкость: <span data-scos="credits">3</span> з.е.</p>
+      <p data-scos="results">Слушатель <b>будет знать</b> методы проектирования и
+      <b>уметь</b> применять их на практике.</p>
+    </section>
+    """
+
+def about_page() -> str:
+    """
+    Страница описания курса LMS (courseware/course_about.html) с разметкой
+    data-scos в разделе overview
+    """
+    navigation = "\n".join(
+        f"<li class=\"nav-item\"><a href=\"/courses/{i}\">Раздел {i}</a></li>"
+        for i in range(40)
+    )
+    footer = "\n".join(
+        f"<li><a href=\"/about/{i}\">Ссылка {i}</a></li>" for i in range(30)
+    )
+    scripts = "\n".join(
+        f"<script type=\"text/javascript\" src=\"/static/js/bundle{i}.js\"></script>"
+        for i in range(25)
+    )
+    return f"""<!DOCTYPE html>
+<html lang="ru">
+<head>
+  <meta charset="UTF-8">
+  <title>{course_title(COURSE_KEY)} | Open edX</title>
+  {scripts}
+</head>
+<body class="view-in-course">
+  <header class="global-header"><nav><ul>{navigation}</ul></nav></header>
+  <main id="main">
+    <section class="course-info">
+      <header class="course-profile"><h1>{course_title(COURSE_KEY)}</h1></header>
+      <div class="details">
+        <div class="inner-wrapper">
+          {overview_section()}
+        </div>
+      </div>
+    </section>
+  </main>
+  <footer><ul>{footer}</ul></footer>
+</body>
+</html>
+"""
+
+def platforms() -> dict:
+    """
+    3.1.10. Список всех платформ
+    """
+    return {
+        "rows": [
+            {
+                "global_id": PARTNER_ID,
+                "title": "Платформа онлайн-обучения",
+                "short_title": "Платформа",
+            },
+        ],
+    }
+
+def rightholders(size: int = 20) -> dict:
+    """
+    3.1.11. Список всех Правообладателей
+    """
+    return {
+        "rows": [
+            {
+                "global_id": f"institution-{i}",
+                "title": f"Университет {i}",
+                "short_title": f"ВУЗ {i}",
+            }
+            for i in range(size)
+        ],
+    }
+
+def tracking_event(
+    name: str,
+    user_id: int = 42,
+    course_id: str = COURSE_KEY,
+    **data,
+) -> dict:
+    """
+    Событие отслеживания, как его получает SCOSEventTrackingBackend
+    """
+    return {
+        "name": name,
+        "timestamp": datetime(2024, 9, 2, 10, 30, 15, 123456, tzinfo=timezone.utc),
+        "context": {
+            "course_id": course_id,
+            "org_id": "SSAU",
+            "user_id": user_id,
+            "path": "/api/enrollment/v1/enrollment",
+        },
+        "data": {
+            "user_id": user_id,
+            "course_id": course_id,
+            **data,
+        },
+    }
+
+def enrollment_event(**kwargs) -> dict:
+    return tracking_event("edx.course.enrollment.activated", mode="audit", **kwargs)
+
+def unenrollment_event(**kwargs) -> dict:
+    return tracking_event("edx.course.enrollment.deactivated", mode="audit", **kwargs)
+
+def subsection_grade_event(**kwargs) -> dict:
+    return tracking_event(
+        "edx.grades.subsection.grade_calculated",
+        block_id=BLOCK_ID,
+        weighted_graded_earned=7.0,
+        weighted_graded_possible=10.0,
+        **kwargs,
+    )
+
+def course_grade_event(**kwargs) -> dict:
+    return tracking_event(
+        "edx.grades.course.grade_calculated",
+        percent_grade=0.73,
+        letter_grade="Pass",
+        **kwargs,
+    )
+
+def other_event(**kwargs) -> dict:
+    return tracking_event("edx.ui.lms.sequence.tab_selected", tab_count=5, **kwargs)
@@ -0,0 +1,375 @@
+"""
+Нагрузочный тест обработки событий обучения.
+
+Синтетический поток событий записи на курс и оценок проходит через
+SCOSEventTrackingBackend, очередь Celery (брокер в памяти) и задачи
+tasks.py, запросы к СЦОС выполняются к заглушке stub_server:
+
+    python tests/benchmarks/load.py --events 2000 --rate 200 --concurrency 8 \\
+        --latency 80 --jitter 40 --error-rate 0.02 --rate-limit 100 -o load.json
+
+Длительный тест (soak) с внешней заглушкой:
+
+    python tests/benchmarks/load.py --duration 1800 --rate 20 \\
+        --scos-url http://127.0.0.1:8800
+
+Результат - пропускная способность, процентили задержек и число потерянных
+событий в JSON, краткий отчет выводится в stderr.
+"""
+
+import argparse
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Union
+
+import requests
+
+import environment
+import fixtures
+import stub_server
+
+
+
+EVENT_MIX = {
+    "enrollment": 0.30,
+    "unenrollment": 0.05,
+    "subsection_grade": 0.50,
+    "course_grade": 0.15,
+}
+EVENT_FACTORIES = {
+    "enrollment": fixtures.enrollment_event,
+    "unenrollment": fixtures.unenrollment_event,
+    "subsection_grade": fixtures.subsection_grade_event,
+    "course_grade": fixtures.course_grade_event,
+}
+WRITE_ENDPOINTS = (
+    "POST /api/v2/courses/participation",
+    "DELETE /api/v2/courses/participation",
+    "POST /api/v2/courses/results",
+    "POST /api/v2/courses/results/progress",
+)
+
+
+
+class Recorder:
+    """
+    Время постановки и выполнения задач по сигналам Celery
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.published: Dict[str, float] = {}
+        self.started: Dict[str, float] = {}
+        self.latency: Dict[str, List[float]] = defaultdict(list)
+        self.runtime: Dict[str, List[float]] = defaultdict(list)
+        self.succeeded: Counter = Counter()
+        self.failed: Counter = Counter()
+        # Повторы задач, ожидающих предыдущее событие слушателя (см. ordering)
+        self.retried: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.enqueue_failed = 0
+        self.done = threading.Condition(self.lock)
+
+    def connect(self) -> None:
+        from celery import signals # pylint: disable=import-outside-toplevel
+        signals.after_task_publish.connect(self.on_publish, weak=False)
+        signals.task_prerun.connect(self.on_prerun, weak=False)
+        signals.task_postrun.connect(self.on_postrun, weak=False)
+        signals.task_failure.connect(self.on_failure, weak=False)
+
+    def on_publish(self, sender=None, headers=None, **kwargs) -> None: # pylint: disable=unused-argument
+        with self.lock:
+            self.published[headers["id"]] = time.monotonic()
+
+    def on_prerun(self, task_id=None, **kwargs) -> None: # pylint: disable=unused-argument
+        with self.lock:
+            self.started[task_id] = time.monotonic()
+
+    def on_postrun(self, task_id=None, task=None, state=None, **kwargs) -> None: # pylint: disable=unused-argument
+        now = time.monotonic()
+        name = task.name.rsplit(".", 1)[-1]
+        with self.lock:
+            published = self.published.pop(task_id, None)
+            started = self.started.pop(task_id, None)
+            if published is not None:
+                self.latency[name].append(now - published)
+            if started is not None:
+                self.runtime[name].append(now - started)
+            if state == "SUCCESS":
+                self.succeeded[name] += 1
+            elif state == "RETRY":
+                self.retried[name] += 1
+            else:
+                self.failed[name] += 1
+            self.done.notify_all()
+
+    def on_failure(self, exception=None, **kwargs) -> None: # pylint: disable=unused-argument
+        with self.lock:
+            self.errors[type(exception).__name__] += 1
+
+    def pending(self) -> int:
+        with self.lock:
+            return len(self.published)
+
+    def wait(self, timeout: float) -> int:
+        """
+        Ожидает выполнения поставленных задач, возвращает число невыполненных
+        """
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            while self.published:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.done.wait(remaining)
+            return len(self.published)
+
+class EnqueueFailures(logging.Handler):
+    """
+    Считает события, которые не удалось поставить в очередь
+    (SCOSEventTrackingBackend.send_to_celery пишет ошибку в лог)
+    """
+
+    def __init__(self, recorder: Recorder) -> None:
+        super().__init__(logging.ERROR)
+        self.recorder = recorder
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if "задачу СЦОС в очередь" in record.getMessage():
+            with self.recorder.lock:
+                self.recorder.enqueue_failed += 1
+
+
+
+def percentiles(values: List[float]) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+    def percentile(p: float) -> float:
+        index = min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))
+        return round(values[index] * 1000, 3)
+    return {
+        "count": len(values),
+        "p50": percentile(50),
+        "p90": percentile(90),
+        "p95": percentile(95),
+        "p99": percentile(99),
+        "max": round(values[-1] * 1000, 3),
+        "mean": round(sum(values) / len(values) * 1000, 3),
+    }
+
+def event_stream(args: argparse.Namespace, rng: random.Random):
+    """
+    Синтетический поток событий: (тип, событие)
+    """
+    kinds = list(EVENT_MIX)
+    weights = [EVENT_MIX[kind] for kind in kinds]
+    count = 0
+    deadline = time.monotonic() + args.duration if args.duration else None
+    while True:
+        if deadline is not None:
+            if time.monotonic() >= deadline:
+                return
+        elif count >= args.events:
+            return
+        kind = rng.choices(kinds, weights)[0]
+        event = EVENT_FACTORIES[kind](
+            user_id=rng.randrange(1, args.users + 1),
+            course_id=fixtures.course_key(rng.randrange(args.courses)),
+        )
+        count += 1
+        yield kind, event
+
+def produce(args: argparse.Namespace, backend, recorder: Recorder) -> dict:
+    rng = random.Random(args.seed)
+    sent: Counter = Counter()
+    interval = 1.0 / args.rate if args.rate else 0.0
+    started = time.monotonic()
+    next_send = started
+    for kind, event in event_stream(args, rng):
+        if interval:
+            now = time.monotonic()
+            if next_send > now:
+                time.sleep(next_send - now)
+            next_send += interval
+        backend.send(event)
+        sent[kind] += 1
+        if args.max_pending and recorder.pending() > args.max_pending:
+            # Очередь растет быстрее, чем выполняются задачи
+            while recorder.pending() > args.max_pending // 2:
+                time.sleep(0.01)
+    return {
+        "sent": dict(sent),
+        "total": sum(sent.values()),
+        "seconds": time.monotonic() - started,
+    }
+
+def scos_stats(url: str) -> dict:
+    try:
+        response = requests.get(f"{url}/__stub/stats", timeout=5)
+        return response.json()
+    except (requests.exceptions.RequestException, ValueError):
+        return {}
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест событий СЦОС")
+    parser.add_argument("--events", type=int, default=1000, help="число событий")
+    parser.add_argument("--duration", type=float, default=0.0,
+        help="длительность теста, секунд (вместо --events)")
+    parser.add_argument("--rate", type=float, default=0.0,
+        help="событий в секунду, 0 - без ограничения")
+    parser.add_argument("--concurrency", type=int, default=8,
+        help="потоков воркера Celery")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--courses", type=int, default=50)
+    parser.add_argument("--max-pending", type=int, default=10000,
+        help="максимум невыполненных задач, после - пауза отправки")
+    parser.add_argument("--drain-timeout", type=float, default=120.0,
+        help="ожидание выполнения задач после отправки, секунд")
+    parser.add_argument("--scos-url", default="",
+        help="адрес запущенной заглушки СЦОС, иначе заглушка запускается в процессе")
+    parser.add_argument("-o", "--output", help="файл результатов JSON (по умолчанию stdout)")
+    stub_server.add_config_arguments(parser)
+    return parser.parse_args(argv)
+
+def start_stub(args: argparse.Namespace, course_keys=()):
+    """
+    Запускает заглушку СЦОС в процессе, если не задан --scos-url:
+    (server или None, адрес)
+    """
+    if args.scos_url:
+        return None, args.scos_url
+    config = stub_server.config_from_args(args)
+    config.course_keys = tuple(course_keys)
+    server = stub_server.start_server(config)
+    return server, stub_server.server_url(server)
+
+def run(args: argparse.Namespace, scos_url: str, producer, suite: str = "scos-load") -> dict:
+    """
+    Запускает воркер Celery, producer(backend, recorder) отправляет события
+    и возвращает {"sent", "total", "seconds"}; результат - отчет теста
+    """
+    from celery import current_app # pylint: disable=import-outside-toplevel
+    from celery.contrib.testing.worker import start_worker # pylint: disable=import-outside-toplevel
+    from scos.utils.events import SCOSEventTrackingBackend # pylint: disable=import-outside-toplevel
+    from scos.utils import tasks # pylint: disable=import-outside-toplevel,unused-import
+    from scos.utils.registry import sync_registry # pylint: disable=import-outside-toplevel
+
+    recorder = Recorder()
+    recorder.connect()
+    logging.getLogger().addHandler(EnqueueFailures(recorder))
+    logging.getLogger("scos").setLevel(logging.WARNING)
+    backend = SCOSEventTrackingBackend()
+    # Без ограничения предвыборки: с брокером в памяти воркер иначе ждет
+    # новые сообщения по 2 секунды после каждой пачки
+    current_app.conf.worker_prefetch_multiplier = 0
+    # Локальная копия реестра СЦОС, как после задачи registry_sync
+    sync_registry()
+    stats_before = scos_stats(scos_url)
+
+    with start_worker(
+        current_app,
+        pool="threads",
+        concurrency=args.concurrency,
+        perform_ping_check=False,
+        shutdown_timeout=args.drain_timeout,
+    ):
+        started = time.monotonic()
+        produced = producer(backend, recorder)
+        unfinished = recorder.wait(args.drain_timeout)
+        elapsed = time.monotonic() - started
+
+    stats = scos_stats(scos_url)
+    requests_before = Counter(stats_before.get("requests", {}))
+    scos_requests = Counter(stats.get("requests", {}))
+    scos_requests.subtract(requests_before)
+    rejected = {
+        key: count for key, count in scos_requests.items()
+        if count and key.rsplit(" ", 1)[0] in WRITE_ENDPOINTS and not key.endswith(" 200")
+    }
+    succeeded = sum(recorder.succeeded.values())
+    failed = sum(recorder.failed.values())
+    return {
+        "suite": suite,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "scos_url": scos_url,
+        "options": {
+            key: value for key, value in vars(args).items() if key != "output"
+        },
+        "events": produced["sent"],
+        "throughput": {
+            "events_per_sec": round(produced["total"] / produced["seconds"], 1)
+                if produced["seconds"] else None,
+            "tasks_per_sec": round((succeeded + failed) / elapsed, 1) if elapsed else None,
+            "seconds": round(elapsed, 3),
+        },
+        "latency_ms": {
+            name: percentiles(values) for name, values in recorder.latency.items()
+        },
+        "task_runtime_ms": {
+            name: percentiles(values) for name, values in recorder.runtime.items()
+        },
+        "tasks": {
+            "succeeded": dict(recorder.succeeded),
+            "failed": dict(recorder.failed),
+            "retried": dict(recorder.retried),
+            "errors": dict(recorder.errors),
+        },
+        "drops": {
+            "enqueue_failed": recorder.enqueue_failed,
+            "task_failed": failed,
+            "unfinished": unfinished,
+            "scos_rejected": sum(rejected.values()),
+            "total": recorder.enqueue_failed + failed + unfinished + sum(rejected.values()),
+        },
+        "scos_requests": {key: count for key, count in scos_requests.items() if count},
+    }
+
+def print_latency(latency: Dict[str, dict]) -> None:
+    for name, values in latency.items():
+        print(
+            f"  {name:<20} p50 {values['p50']:>9} мс  p95 {values['p95']:>9} мс  "
+            f"p99 {values['p99']:>9} мс  max {values['max']:>9} мс",
+            file=sys.stderr,
+        )
+
+def write_report(report: dict, output: Union[str, None]) -> None:
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    args.registry_size = max(args.registry_size, args.courses)
+    server, scos_url = start_stub(args)
+    environment.setup(scos_base_url=scos_url)
+    report = run(
+        args, scos_url, lambda backend, recorder: produce(args, backend, recorder)
+    )
+    if server is not None:
+        server.shutdown()
+    print(
+        f"События: {sum(report['events'].values())}, "
+        f"{report['throughput']['events_per_sec']}/с; "
+        f"задачи: {sum(report['tasks']['succeeded'].values()) + report['drops']['task_failed']}, "
+        f"{report['throughput']['tasks_per_sec']}/с; "
+        f"потери: {report['drops']}",
+        file=sys.stderr,
+    )
+    print_latency(report["latency_ms"])
+    write_report(report, args.output)
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
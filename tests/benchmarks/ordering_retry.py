@@ -0,0 +1,141 @@
+"""
+Проверка упорядоченной отправки событий слушателя (см. scos.utils.ordering).
+
+Событие с номером 2 ставится в очередь раньше события с номером 1: задача
+ожидает предыдущую повтором. Повтор задачи должен сохранить заголовки
+последовательности, считать ожидания в заголовке scos_waits без расходования
+повторов после ошибки (request.retries), а события - выполниться по порядку:
+
+    python tests/benchmarks/ordering_retry.py
+
+Результат выводится в stderr, код возврата 1 - проверка не пройдена.
+"""
+
+import sys
+import threading
+import time
+from typing import List
+
+import environment
+import fixtures
+
+
+
+# Максимальное ожидание выполнения задач, секунд
+TIMEOUT = 30
+
+
+
+def check(runs: List[dict], headers: dict) -> List[str]:
+    """
+    Ошибки проверки выполнений задач, пустой список - проверка пройдена
+    """
+    from celery import states # pylint: disable=import-outside-toplevel
+
+    errors = []
+    second = [run for run in runs if run["sequence"] == 2]
+    if not any(not run["waits"] and run["state"] == states.RETRY for run in second):
+        errors.append("задача 2 не ожидала задачу 1 повтором")
+    retried = [run for run in second if run["waits"]]
+    if not retried:
+        errors.append("задача 2 не повторялась")
+    for run in retried:
+        if run["headers"] != headers[2]:
+            errors.append(
+                f"заголовки ожидания {run['waits']} задачи 2: {run['headers']}, "
+                f"ожидались {headers[2]}"
+            )
+    if any(run["retries"] for run in second):
+        errors.append("ожидание задачи 1 расходует повторы задачи 2 после ошибки")
+    done = [run["sequence"] for run in runs if run["state"] == states.SUCCESS]
+    if done != [1, 2]:
+        errors.append(f"порядок выполнения задач: {done}, ожидался [1, 2]")
+    return errors
+
+def main() -> int:
+    environment.setup()
+
+    from celery import current_app, signals, states # pylint: disable=import-outside-toplevel
+    from celery.contrib.testing.worker import start_worker # pylint: disable=import-outside-toplevel
+    from scos.utils import tasks # pylint: disable=import-outside-toplevel
+    from scos.utils.ordering import ( # pylint: disable=import-outside-toplevel
+        PARTITION_HEADER,
+        SEQUENCE_HEADER,
+        SEQUENCED_AT_HEADER,
+        WAITS_HEADER,
+        next_sequence,
+        partition_key,
+    )
+    from scos.utils.registry import sync_registry # pylint: disable=import-outside-toplevel
+
+    runs: List[dict] = []
+    finished = threading.Condition()
+
+    def on_postrun(task=None, state=None, **kwargs): # pylint: disable=unused-argument
+        request = task.request
+        with finished:
+            runs.append({
+                "sequence": request.get(SEQUENCE_HEADER),
+                "retries": request.retries,
+                "waits": request.get(WAITS_HEADER) or 0,
+                "state": state,
+                "headers": {
+                    header: request.get(header)
+                    for header in (PARTITION_HEADER, SEQUENCE_HEADER, SEQUENCED_AT_HEADER)
+                },
+            })
+            finished.notify_all()
+
+    signals.task_postrun.connect(on_postrun, weak=False)
+    current_app.conf.worker_prefetch_multiplier = 0
+    sync_registry()
+
+    enrollment = fixtures.enrollment_event()
+    grade = fixtures.course_grade_event()
+    partition = partition_key(enrollment)
+    headers = {}
+    for _ in range(2):
+        sequence = next_sequence(partition)
+        headers[sequence] = {
+            PARTITION_HEADER: partition,
+            SEQUENCE_HEADER: sequence,
+            SEQUENCED_AT_HEADER: time.time(),
+        }
+
+    with start_worker(
+        current_app,
+        pool="threads",
+        concurrency=2,
+        perform_ping_check=False,
+    ):
+        tasks.course_grade.apply_async(args=(grade,), headers=headers[2])
+        time.sleep(0.2)
+        tasks.user_enrolled.apply_async(args=(enrollment,), headers=headers[1])
+        deadline = time.monotonic() + TIMEOUT
+        with finished:
+            while not any(
+                run["sequence"] == 2 and run["state"] != states.RETRY for run in runs
+            ):
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                finished.wait(left)
+
+    errors = check(runs, headers)
+    for run in runs:
+        print(
+            f"Задача {run['sequence']}, ожидание {run['waits']}, "
+            f"повтор {run['retries']}: {run['state']}",
+            file=sys.stderr,
+        )
+    for error in errors:
+        print(f"Ошибка: {error}", file=sys.stderr)
+    if errors:
+        return 1
+    print("Заголовки последовательности сохраняются при повторе задачи", file=sys.stderr)
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
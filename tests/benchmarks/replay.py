@@ -0,0 +1,261 @@
+"""
+Воспроизведение записанного трафика СЦОС (см. scos.utils.recorder).
+
+Записи из файлов traffic-*.jsonl (включая ротированные .1, .2, ...)
+объединяются по времени и воспроизводятся с исходными интервалами
+(--speed 1), ускоренно (--speed 10) или без пауз (--speed 0):
+
+    python tests/benchmarks/replay.py /openedx/data/scos/traffic --speed 10 \\
+        --latency 80 --jitter 40 -o replay.json
+
+--mode events - события отслеживания проходят через SCOSEventTrackingBackend,
+очередь Celery и задачи tasks.py, как в load.py. --mode requests - записанные
+HTTP запросы к API СЦОС повторяются без участия приложения. Запросы
+выполняются к заглушке stub_server (реестр дополняется курсами из записи)
+или к --scos-url.
+"""
+
+import argparse
+import glob
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List
+
+import requests
+
+import environment
+import load
+import stub_server
+
+
+
+def traffic_files(paths: List[str]) -> List[str]:
+    """
+    Файлы записи: пути, шаблоны glob и каталоги SCOS_TRAFFIC_PATH
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "traffic-*.jsonl*")))
+        else:
+            files.extend(glob.glob(path) or [path])
+    return sorted(set(files))
+
+def read_file(path: str, kind: str) -> Iterator[dict]:
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("k") == kind:
+                yield record
+
+def read_traffic(files: List[str], kind: str) -> Iterator[dict]:
+    """
+    Записи вида kind ("e" - события, "r" - запросы) всех файлов по времени
+    """
+    return heapq.merge(
+        *(read_file(path, kind) for path in files), key=lambda record: record["t"]
+    )
+
+def schedule(records: Iterator[dict], speed: float, limit: int) -> Iterator[dict]:
+    """
+    Выдает записи в моменты, соответствующие записанным с ускорением speed
+    """
+    first = None
+    started = time.monotonic()
+    for count, record in enumerate(records):
+        if limit and count >= limit:
+            return
+        if first is None:
+            first = record["t"]
+        if speed:
+            delay = started + (record["t"] - first) / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        yield record
+
+def tracking_event(record: dict, users: Dict[str, int]) -> dict:
+    """
+    Событие отслеживания из записи, псевдонимы пользователей заменяются
+    последовательными номерами
+    """
+    user_id = users.setdefault(record.get("u"), len(users) + 1)
+    try:
+        timestamp = datetime.fromisoformat(record["ts"])
+    except (KeyError, TypeError, ValueError):
+        timestamp = datetime.now(timezone.utc)
+    return {
+        "name": record["n"],
+        "timestamp": timestamp,
+        "context": {
+            "course_id": record.get("c"),
+            "user_id": user_id,
+        },
+        "data": {
+            "user_id": user_id,
+            "course_id": record.get("c"),
+            **(record.get("d") or {}),
+        },
+    }
+
+def replay_events(args: argparse.Namespace, backend, recorder: load.Recorder) -> dict:
+    users: Dict[str, int] = {}
+    sent: Counter = Counter()
+    started = time.monotonic()
+    records = read_traffic(traffic_files(args.paths), "e")
+    for record in schedule(records, args.speed, args.limit):
+        backend.send(tracking_event(record, users))
+        sent[record["n"]] += 1
+        if args.max_pending and recorder.pending() > args.max_pending:
+            while recorder.pending() > args.max_pending // 2:
+                time.sleep(0.01)
+    return {
+        "sent": dict(sent),
+        "total": sum(sent.values()),
+        "seconds": time.monotonic() - started,
+    }
+
+def run_events(args: argparse.Namespace, scos_url: str) -> dict:
+    return load.run(
+        args,
+        scos_url,
+        lambda backend, recorder: replay_events(args, backend, recorder),
+        suite="scos-replay-events",
+    )
+
+def run_requests(args: argparse.Namespace, scos_url: str) -> dict:
+    """
+    Повторяет записанные запросы к API СЦОС, сравнивает длительность с записанной
+    """
+    lock = threading.Lock()
+    latency: Dict[str, List[float]] = defaultdict(list)
+    recorded: Dict[str, List[float]] = defaultdict(list)
+    statuses: Counter = Counter()
+    session = requests.Session()
+    session.mount("http", requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency))
+
+    def endpoint(record: dict) -> str:
+        path = stub_server.COURSE_PATH.sub("/api/v2/registry/courses/{id}", record["p"])
+        return f"{record['m']} {path}"
+
+    def send(record: dict) -> None:
+        name = endpoint(record)
+        start = time.perf_counter()
+        try:
+            response = session.request(
+                record["m"],
+                scos_url + record["p"],
+                params=record.get("q"),
+                json=record.get("j"),
+                headers={"X-CN-UUID": "replay", "Accept": "application/json"},
+                timeout=args.timeout,
+            )
+            status = str(response.status_code)
+        except requests.exceptions.RequestException as exception:
+            status = type(exception).__name__
+        elapsed = time.perf_counter() - start
+        with lock:
+            latency[name].append(elapsed)
+            statuses[f"{name} {status}"] += 1
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        records = read_traffic(traffic_files(args.paths), "r")
+        for record in schedule(records, args.speed, args.limit):
+            if record.get("ms") is not None:
+                recorded[endpoint(record)].append(record["ms"] / 1000)
+            executor.submit(send, record)
+    elapsed = time.monotonic() - started
+    total = sum(statuses.values())
+    return {
+        "suite": "scos-replay-requests",
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "scos_url": scos_url,
+        "options": {
+            key: value for key, value in vars(args).items() if key != "output"
+        },
+        "throughput": {
+            "requests_per_sec": round(total / elapsed, 1) if elapsed else None,
+            "seconds": round(elapsed, 3),
+        },
+        "latency_ms": {
+            name: load.percentiles(values) for name, values in latency.items()
+        },
+        "recorded_latency_ms": {
+            name: load.percentiles(values) for name, values in recorded.items()
+        },
+        "statuses": dict(statuses),
+    }
+
+def recorded_courses(files: List[str]) -> List[str]:
+    return sorted({
+        record["c"] for record in read_traffic(files, "e") if record.get("c")
+    })
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Воспроизведение трафика СЦОС")
+    parser.add_argument("paths", nargs="+",
+        help="файлы записи, шаблоны или каталог SCOS_TRAFFIC_PATH")
+    parser.add_argument("--mode", choices=("events", "requests"), default="events")
+    parser.add_argument("--speed", type=float, default=1.0,
+        help="ускорение относительно записи, 0 - без пауз")
+    parser.add_argument("--limit", type=int, default=0,
+        help="воспроизвести не больше записей, 0 - все")
+    parser.add_argument("--concurrency", type=int, default=8,
+        help="потоков воркера Celery или отправки запросов")
+    parser.add_argument("--timeout", type=float, default=30.0,
+        help="таймаут запроса в режиме requests, секунд")
+    parser.add_argument("--max-pending", type=int, default=10000,
+        help="максимум невыполненных задач, после - пауза отправки")
+    parser.add_argument("--drain-timeout", type=float, default=120.0,
+        help="ожидание выполнения задач после отправки, секунд")
+    parser.add_argument("--scos-url", default="",
+        help="адрес запущенной заглушки СЦОС, иначе заглушка запускается в процессе")
+    parser.add_argument("-o", "--output", help="файл результатов JSON (по умолчанию stdout)")
+    stub_server.add_config_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    files = traffic_files(args.paths)
+    if not files:
+        print("Нет файлов записи трафика", file=sys.stderr)
+        return 1
+    server, scos_url = load.start_stub(
+        args, recorded_courses(files) if not args.scos_url else ()
+    )
+    if args.mode == "events":
+        environment.setup(scos_base_url=scos_url)
+        report = run_events(args, scos_url)
+        print(
+            f"События: {sum(report['events'].values())}, "
+            f"{report['throughput']['events_per_sec']}/с; "
+            f"потери: {report['drops']}",
+            file=sys.stderr,
+        )
+    else:
+        report = run_requests(args, scos_url)
+        print(
+            f"Запросы: {sum(report['statuses'].values())}, "
+            f"{report['throughput']['requests_per_sec']}/с",
+            file=sys.stderr,
+        )
+    if server is not None:
+        server.shutdown()
+    load.print_latency(report["latency_ms"])
+    load.write_report(report, args.output)
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
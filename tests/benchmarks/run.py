@@ -0,0 +1,159 @@
+"""
+Бенчмарки горячих путей приложения scos.
+
+Запуск без сети и без edx-platform, модули Open edX заменены заглушками:
+
+    python tests/benchmarks/run.py -o benchmarks.json
+    python tests/benchmarks/run.py -k events --compare benchmarks.json
+
+Результат - JSON (время одного вызова в наносекундах) для сравнения между
+версиями, таблица выводится в stderr.
+"""
+
+import argparse
+import fnmatch
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from importlib.metadata import PackageNotFoundError, version
+
+import environment
+
+
+
+MODULES = (
+    "bench_events",
+    "bench_tasks",
+    "bench_scos_api",
+    "bench_course",
+    "bench_registry",
+)
+
+
+
+def get_version() -> str:
+    try:
+        return version("tutor-scos")
+    except PackageNotFoundError:
+        return "unknown"
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=environment.ROOT_PATH,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарки приложения scos")
+    parser.add_argument("-o", "--output", help="файл результатов JSON (по умолчанию stdout)")
+    parser.add_argument("-k", "--filter", action="append", default=[],
+        help="шаблон имени бенчмарка, например events.* или *parser")
+    parser.add_argument("--repeat", type=int, default=5, help="число повторов")
+    parser.add_argument("--scale", type=float, default=1.0,
+        help="множитель числа вызовов в повторе")
+    parser.add_argument("--compare", help="результаты JSON предыдущей версии")
+    parser.add_argument("--max-regression", type=float, default=None,
+        help="допустимое отношение медиан к --compare, при превышении код выхода 1")
+    parser.add_argument("--list", action="store_true", help="список бенчмарков")
+    return parser.parse_args(argv)
+
+def selected(name: str, patterns) -> bool:
+    if not patterns:
+        return True
+    return any(
+        fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(name, f"*{pattern}*")
+        for pattern in patterns
+    )
+
+def compare(results: list, baseline_file: str) -> dict:
+    """
+    Отношение медиан к предыдущим результатам: {имя: отношение}
+    """
+    with open(baseline_file, encoding="utf-8") as baseline_json:
+        baseline = {
+            result["name"]: result for result in json.load(baseline_json)["benchmarks"]
+        }
+    ratios = {}
+    for result in results:
+        previous = baseline.get(result["name"])
+        if previous and previous["median"]:
+            ratios[result["name"]] = round(result["median"] / previous["median"], 3)
+    return ratios
+
+def print_table(results: list, ratios: dict) -> None:
+    print(f"{'benchmark':<48} {'median, us':>12} {'min, us':>12} {'ops/s':>12} {'ratio':>7}",
+        file=sys.stderr)
+    for result in results:
+        ratio = ratios.get(result["name"])
+        print(
+            f"{result['name']:<48} {result['median'] / 1000:>12.2f} "
+            f"{result['min'] / 1000:>12.2f} {result['ops_per_sec'] or 0:>12.0f} "
+            f"{'' if ratio is None else f'{ratio:.2f}':>7}",
+            file=sys.stderr,
+        )
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    environment.setup()
+    for module in MODULES:
+        importlib.import_module(module)
+    from benchmark import BENCHMARKS, run # pylint: disable=import-outside-toplevel
+
+    benchmarks = [
+        bench for name, bench in BENCHMARKS.items() if selected(name, args.filter)
+    ]
+    if args.list:
+        for bench in benchmarks:
+            print(bench.name)
+        return 0
+    results = []
+    for bench in benchmarks:
+        print(f"{bench.name} ...", file=sys.stderr)
+        results.append(run(bench, repeat=args.repeat, scale=args.scale))
+    ratios = compare(results, args.compare) if args.compare else {}
+    print_table(results, ratios)
+    report = {
+        "suite": "scos-benchmarks",
+        "version": get_version(),
+        "commit": get_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "repeat": args.repeat,
+        "scale": args.scale,
+        "benchmarks": results,
+    }
+    if ratios:
+        report["compare"] = {"baseline": args.compare, "ratios": ratios}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    if args.max_regression is not None:
+        regressions = {
+            name: ratio for name, ratio in ratios.items() if ratio > args.max_regression
+        }
+        if regressions:
+            print(f"Регрессии: {regressions}", file=sys.stderr)
+            return 1
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+"""
+Локальная заглушка API СЦОС для нагрузочного тестирования.
+
+Реализует запросы, которые выполняет scos_api: проверка подключения, реестр
+платформ, Правообладателей и онлайн-курсов, регистрация слушателей,
+результаты и прогресс обучения. Задержка ответа, доля ошибок, ограничение
+частоты запросов (429) и постраничная выдача списка курсов настраиваются:
+
+    python tests/benchmarks/stub_server.py --port 8800 --latency 80 \\
+        --jitter 40 --error-rate 0.01 --rate-limit 50 --page-size 100
+
+Служебные адреса: GET /__stub/stats - статистика запросов,
+POST /__stub/reset - сброс статистики.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple, Union
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import fixtures
+
+
+
+PARTICIPATION_FIELDS = ("course_id", "session_id", "user_id")
+RESULTS_FIELDS = ("course_id", "session_id", "user_id", "date", "rating", "checkpoint_id")
+PROGRESS_FIELDS = ("course_id", "session_id", "user_id", "progress")
+COURSE_PATH = re.compile(r"^/api/v2/registry/courses/(?P<global_id>[^/]+)/?$")
+
+
+
+@dataclass
+class StubConfig:
+    latency: float = 0.0 # средняя задержка ответа, секунд
+    jitter: float = 0.0 # разброс задержки, секунд
+    error_rate: float = 0.0 # доля ответов 500/503
+    rate_limit: float = 0.0 # запросов в секунду, сверх - 429 (0 - без ограничения)
+    page_size: int = 0 # курсов на странице списка (0 - весь список)
+    registry_size: int = fixtures.REGISTRY_SIZE
+    course_keys: Tuple[str, ...] = () # дополнительные курсы реестра
+    seed: Union[int, None] = None
+
+class TokenBucket:
+    """
+    Ограничение частоты запросов: rate запросов в секунду, всплеск до rate
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self.tokens = max(rate, 1.0)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                max(self.rate, 1.0), self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens < 1.0:
+                return False
+            self.tokens -= 1.0
+            return True
+
+class StubState:
+
+    def __init__(self, config: StubConfig) -> None:
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.bucket = TokenBucket(config.rate_limit) if config.rate_limit else None
+        self.courses = fixtures.registry_courses(
+            config.registry_size, config.course_keys
+        )["results"]
+        self.courses_by_id = {course["global_id"]: course for course in self.courses}
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests: Counter = Counter()
+        self.items: Counter = Counter()
+
+    def count(self, method: str, endpoint: str, status: int, items: int = 0) -> None:
+        with self.lock:
+            self.requests[f"{method} {endpoint} {status}"] += 1
+            if items:
+                self.items[f"{method} {endpoint} {status}"] += items
+
+    def delay(self) -> float:
+        config = self.config
+        if not config.latency and not config.jitter:
+            return 0.0
+        with self.lock:
+            value = self.random.uniform(
+                config.latency - config.jitter, config.latency + config.jitter
+            )
+        return max(value, 0.0)
+
+    def failure(self) -> bool:
+        if not self.config.error_rate:
+            return False
+        with self.lock:
+            return self.random.random() < self.config.error_rate
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "uptime": round(time.time() - self.started, 3),
+                "config": asdict(self.config),
+                "requests": dict(self.requests),
+                "items": dict(self.items),
+            }
+
+    def reset(self) -> None:
+        with self.lock:
+            self.requests.clear()
+            self.items.clear()
+            self.started = time.time()
+
+
+
+class SCOSStubHandler(BaseHTTPRequestHandler):
+
+    server_version = "SCOSStub/1.0"
+    protocol_version = "HTTP/1.1"
+    # Заголовки и тело отправляются отдельно, без TCP_NODELAY ответ задерживается
+    disable_nagle_algorithm = True
+
+    @property
+    def state(self) -> StubState:
+        return self.server.state
+
+    def log_message(self, format, *args) -> None: # pylint: disable=redefined-builtin
+        pass
+
+    def do_GET(self) -> None: # pylint: disable=invalid-name
+        self.dispatch("GET")
+
+    def do_POST(self) -> None: # pylint: disable=invalid-name
+        self.dispatch("POST")
+
+    def do_PUT(self) -> None: # pylint: disable=invalid-name
+        self.dispatch("PUT")
+
+    def do_DELETE(self) -> None: # pylint: disable=invalid-name
+        self.dispatch("DELETE")
+
+    def read_json(self) -> Union[dict, list, None]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return None
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return None
+
+    def send_json(self, status: int, body, headers: Union[dict, None] = None) -> None:
+        content = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def dispatch(self, method: str) -> None:
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        body = self.read_json()
+        if url.path.startswith("/__stub/"):
+            self.control(method, url.path)
+            return
+        endpoint = COURSE_PATH.sub("/api/v2/registry/courses/{id}", url.path)
+        items = len(body) if isinstance(body, list) else 0
+        if not self.headers.get("X-CN-UUID"):
+            self.state.count(method, endpoint, 401, items)
+            self.send_json(401, {"message": "X-CN-UUID required"})
+            return
+        if self.state.bucket is not None and not self.state.bucket.take():
+            self.state.count(method, endpoint, 429, items)
+            self.send_json(429, {"message": "Too Many Requests"}, {"Retry-After": "1"})
+            return
+        time.sleep(self.state.delay())
+        if self.state.failure():
+            status = self.state.random.choice((500, 503))
+            self.state.count(method, endpoint, status, items)
+            self.send_json(status, {"message": "Internal Server Error"})
+            return
+        status, response = self.route(method, url.path, query, body)
+        self.state.count(method, endpoint, status, items)
+        self.send_json(status, response)
+
+    def control(self, method: str, path: str) -> None:
+        if method == "GET" and path == "/__stub/stats":
+            self.send_json(200, self.state.stats())
+        elif method == "POST" and path == "/__stub/reset":
+            self.state.reset()
+            self.send_json(200, {"status": "ok"})
+        else:
+            self.send_json(404, {"message": "Not Found"})
+
+    def route(self, method: str, path: str, query: dict, body) -> Tuple[int, object]:
+        path = path.rstrip("/")
+        if method == "GET" and path == "/api/v2/connections/check":
+            return 200, {"status": "ok"}
+        if method == "GET" and path == "/api/v2/registry/partners/platforms":
+            return 200, fixtures.platforms()
+        if method == "GET" and path == "/api/v2/registry/partners/rightholders":
+            return 200, fixtures.rightholders()
+        if method == "GET" and path == "/api/v2/registry/courses":
+            return 200, self.course_list(path, query)
+        match = COURSE_PATH.match(path)
+        if method == "GET" and match:
+            course = self.state.courses_by_id.get(match.group("global_id"))
+            if course is None:
+                return 404, {"message": "Not Found"}
+            return 200, course
+        if method in ("POST", "PUT") and path == "/api/v2/registry/courses":
+            return self.course_package(body)
+        if method in ("POST", "DELETE") and path == "/api/v2/courses/participation":
+            return self.package(body, PARTICIPATION_FIELDS)
+        if method == "POST" and path == "/api/v2/courses/results":
+            return self.package(body, RESULTS_FIELDS)
+        if method == "POST" and path == "/api/v2/courses/results/progress":
+            return self.package(body, PROGRESS_FIELDS)
+        return 404, {"message": "Not Found"}
+
+    def course_list(self, path: str, query: dict) -> dict:
+        courses = [
+            course for course in self.state.courses
+            if all(
+                course.get(option) == query[option]
+                for option in ("partner_id", "language", "institution_id")
+                if option in query
+            )
+        ]
+        page_size = int(query.get("page_size") or self.state.config.page_size or 0)
+        if not page_size:
+            return {"total_count": len(courses), "results": courses}
+        page = max(int(query.get("page") or 1), 1)
+        start = (page - 1) * page_size
+        def page_url(number: int) -> str:
+            return f"{path}?{urlencode({**query, 'page': number, 'page_size': page_size})}"
+        return {
+            "total_count": len(courses),
+            "next": page_url(page + 1) if start + page_size < len(courses) else None,
+            "previous": page_url(page - 1) if page > 1 else None,
+            "results": courses[start:start + page_size],
+        }
+
+    @staticmethod
+    def package(body, fields) -> Tuple[int, object]:
+        if not isinstance(body, list) or not body:
+            return 400, {"message": "Ожидается непустой массив объектов"}
+        for item in body:
+            missing = [field for field in fields if field not in item]
+            if missing:
+                return 400, {"message": f"Отсутствуют поля: {', '.join(missing)}"}
+        return 200, [{"status": "ok"} for _ in body]
+
+    def course_package(self, body) -> Tuple[int, object]:
+        if not isinstance(body, dict) or "package" not in body:
+            return 400, {"message": "Ожидается объект package"}
+        items = body["package"].get("items") or []
+        return 200, {
+            "course_id": [item.get("id") or f"stub-{i}" for i, item in enumerate(items)],
+        }
+
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    """
+    Очередь соединений для сотен одновременных запросов (асинхронный воркер
+    отправки), по умолчанию socketserver принимает 5
+    """
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+
+def start_server(
+    config: StubConfig,
+    host: str = "127.0.0.1",
+    port: int = 0,
+) -> StubHTTPServer:
+    """
+    Запускает заглушку в фоновом потоке, адрес - server.server_address
+    """
+    server = StubHTTPServer((host, port), SCOSStubHandler)
+    server.state = StubState(config)
+    threading.Thread(
+        target=server.serve_forever, name="scos-stub", daemon=True
+    ).start()
+    return server
+
+def server_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", type=float, default=0.0,
+        help="средняя задержка ответа, мс")
+    parser.add_argument("--jitter", type=float, default=0.0,
+        help="разброс задержки ответа, мс")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+        help="доля ответов 500/503")
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+        help="запросов в секунду, сверх - ответ 429")
+    parser.add_argument("--page-size", type=int, default=0,
+        help="курсов на странице списка курсов, 0 - весь список")
+    parser.add_argument("--registry-size", type=int, default=fixtures.REGISTRY_SIZE,
+        help="число курсов в реестре")
+    parser.add_argument("--seed", type=int, default=None)
+
+def config_from_args(args: argparse.Namespace) -> StubConfig:
+    return StubConfig(
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        page_size=args.page_size,
+        registry_size=args.registry_size,
+        seed=args.seed,
+    )
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Заглушка API СЦОС")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+    server = StubHTTPServer((args.host, args.port), SCOSStubHandler)
+    server.state = StubState(config_from_args(args))
+    print(f"Заглушка API СЦОС: {server_url(server)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Модульные тесты приложения scos в окружении бенчмарков (заглушки модулей
+Open edX, база sqlite, Celery с брокером в памяти, см.
+tests/benchmarks/environment.py):
+
+    python -m pytest tests/unit
+"""
+
+import os
+import sys
+
+import pytest
+
+BENCHMARKS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"
+)
+if BENCHMARKS_PATH not in sys.path:
+    sys.path.insert(0, BENCHMARKS_PATH)
+
+import environment # pylint: disable=wrong-import-position
+
+environment.setup()
+
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """
+    Каждый тест начинается с пустого кэша Django
+    """
+    from django.core.cache import caches # pylint: disable=import-outside-toplevel
+    for alias in caches:
+        caches[alias].clear()
+    yield
@@ -0,0 +1,121 @@
+"""
+Страницы списка онлайн-курсов панели СЦОС (scos.utils.course_list):
+границы страниц курсорной пагинации при равных и пустых значениях сортировки
+"""
+
+from typing import Union
+
+import pytest
+
+from django.utils import timezone
+
+from scos.models import SCOSCourse
+from scos.utils.course_list import SORT_FIELDS, get_course_list, get_course_list_page
+from scos.utils.json_api import APIError, encode_cursor
+
+
+
+# (global_id, title, started_at): равные названия с разным регистром, пустые
+# значения сортировки и global_id не в порядке названий (латиница: Lower в
+# sqlite не меняет регистр кириллицы)
+COURSES = (
+    ("c01", "Physics", "2024-09-01T00:00:00"),
+    ("c02", "algebra", "2024-02-01T00:00:00"),
+    ("c03", "Algebra", ""),
+    ("c04", "", "2024-09-01T00:00:00"),
+    ("c05", "Biology", "2023-09-01T00:00:00"),
+    ("c06", "algebra", "2024-09-01T00:00:00"),
+    ("c07", "", ""),
+    ("c08", "Chemistry", "2024-09-01T00:00:00"),
+    ("c09", "Biology", ""),
+)
+SORTS = tuple(
+    sort for field in ("title", "started_at") for sort in (field, f"-{field}")
+)
+
+
+
+@pytest.fixture(autouse=True)
+def courses():
+    synced_at = timezone.now()
+    SCOSCourse.objects.bulk_create(
+        SCOSCourse(
+            global_id = global_id,
+            title = title,
+            started_at = started_at,
+            institution_id = "rightholder",
+            synced_at = synced_at,
+        )
+        for global_id, title, started_at in COURSES
+    )
+    yield
+    SCOSCourse.objects.all().delete()
+
+def read_pages(sort: str, size: int, filters: Union[dict, None] = None) -> list:
+    """
+    Все страницы списка по курсору, global_id курсов по страницам
+    """
+    pages = []
+    cursor = None
+    while True:
+        page, cursor = get_course_list_page(filters or {}, sort, cursor, size)
+        pages.append([course["global_id"] for course in page])
+        if cursor is None:
+            return pages
+        assert len(pages) <= len(COURSES)
+
+def full_list(sort: str, filters: Union[dict, None] = None) -> list:
+    return [course["global_id"] for course in get_course_list(filters or {}, sort)]
+
+
+
+@pytest.mark.parametrize("sort", SORTS)
+@pytest.mark.parametrize("size", range(1, len(COURSES) + 2))
+def test_pages_cover_list_once(sort, size):
+    pages = read_pages(sort, size)
+    assert [global_id for page in pages for global_id in page] == full_list(sort)
+    assert all(len(page) == size for page in pages[:-1])
+
+def test_empty_values_are_last_in_ascending_order():
+    order = full_list("title")
+    assert order[:3] == ["c02", "c03", "c06"]
+    assert order[-2:] == ["c04", "c07"]
+
+def test_empty_values_are_first_in_descending_order():
+    order = full_list("-title")
+    assert order[:2] == ["c04", "c07"]
+    assert order[-3:] == ["c02", "c03", "c06"]
+
+def test_page_of_exact_size_has_no_cursor():
+    page, cursor = get_course_list_page({}, "title", None, len(COURSES))
+    assert len(page) == len(COURSES)
+    assert cursor is None
+
+def test_cursor_at_empty_value():
+    cursor = encode_cursor(["title", None, "c04"])
+    page, next_cursor = get_course_list_page({}, "title", cursor, 10)
+    assert [course["global_id"] for course in page] == ["c07"]
+    assert next_cursor is None
+
+def test_descending_cursor_at_empty_value():
+    cursor = encode_cursor(["-title", None, "c04"])
+    page, _ = get_course_list_page({}, "-title", cursor, 10)
+    assert [course["global_id"] for course in page] == full_list("-title")[1:]
+
+def test_cursor_of_filtered_list():
+    assert read_pages("title", 1, {"title": "algebra"}) == [["c02"], ["c03"], ["c06"]]
+
+def test_cursor_of_other_sort_is_rejected():
+    _, cursor = get_course_list_page({}, "title", None, 2)
+    with pytest.raises(APIError):
+        get_course_list_page({}, "-title", cursor, 2)
+
+@pytest.mark.parametrize("cursor", ["not a cursor", encode_cursor(["title", "a"])])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(APIError):
+        get_course_list_page({}, "title", cursor, 2)
+
+def test_sort_fields_are_paged():
+    for field in SORT_FIELDS:
+        pages = read_pages(field, 2)
+        assert [global_id for page in pages for global_id in page] == full_list(field)
@@ -0,0 +1,172 @@
+"""
+HTTP кэш GET запросов к API СЦОС (scos.utils.http_cache): условные запросы
+с ответом 304 и блокировка обновления устаревшего ответа
+"""
+
+import threading
+import time
+from typing import List
+
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from django.core.cache import caches
+
+from scos.utils import http_cache
+from scos.utils.http_cache import cached_get, response_key
+
+
+
+URL = "https://scos.unit/api/v2/registry/courses/1"
+
+
+
+class FakeSCOS:
+    """
+    Ответы СЦОС по очереди вместо scos_request, запросы сохраняются
+    """
+
+    def __init__(self) -> None:
+        self.responses: List[requests.Response] = []
+        self.requests: List[dict] = []
+
+    def respond(self, status_code: int, content: bytes = b"", **headers) -> None:
+        response = requests.Response()
+        response.status_code = status_code
+        response.headers = CaseInsensitiveDict(
+            {"Content-Type": "application/json; charset=utf-8", **headers}
+        )
+        response._content = content # pylint: disable=protected-access
+        self.responses.append(response)
+
+    def __call__(self, method: str, url: str, headers: dict, timeout=None) -> requests.Response:
+        self.requests.append({"method": method, "url": url, "headers": dict(headers)})
+        return self.responses.pop(0)
+
+
+
+@pytest.fixture(name="scos")
+def scos_fixture(monkeypatch):
+    fake = FakeSCOS()
+    monkeypatch.setattr(http_cache, "scos_request", fake)
+    return fake
+
+def cache_entry() -> dict:
+    return caches[http_cache.SCOS_HTTP_CACHE].get(response_key(URL)[1])
+
+def refresh_key() -> str:
+    return f"{response_key(URL)[1]}.refresh"
+
+def expire() -> None:
+    entry = cache_entry()
+    entry["expires"] = time.time() - 1
+    caches[http_cache.SCOS_HTTP_CACHE].set(response_key(URL)[1], entry)
+
+
+
+def test_fresh_response_is_not_requested(scos):
+    scos.respond(200, b'{"global_id": "1"}', **{"Cache-Control": "max-age=60"})
+    assert cached_get(URL).json() == {"global_id": "1"}
+    assert cached_get(URL).json() == {"global_id": "1"}
+    assert len(scos.requests) == 1
+
+def test_not_modified_extends_stored_response(scos):
+    scos.respond(200, b'{"global_id": "1"}', ETag='"v1"', **{"Cache-Control": "max-age=0"})
+    scos.respond(304, ETag='"v1"', **{"Cache-Control": "max-age=60"})
+    cached_get(URL)
+    response = cached_get(URL)
+    assert response.status_code == 200
+    assert response.json() == {"global_id": "1"}
+    assert scos.requests[1]["headers"]["If-None-Match"] == '"v1"'
+    assert cache_entry()["expires"] > time.time() + 50
+    cached_get(URL)
+    assert len(scos.requests) == 2
+
+def test_last_modified_is_revalidated(scos):
+    modified = "Mon, 02 Sep 2024 10:00:00 GMT"
+    scos.respond(200, b'{"global_id": "1"}', **{"Last-Modified": modified})
+    scos.respond(304)
+    cached_get(URL)
+    assert cached_get(URL).json() == {"global_id": "1"}
+    assert scos.requests[1]["headers"]["If-Modified-Since"] == modified
+
+def test_changed_response_replaces_stored(scos):
+    scos.respond(200, b'{"title": "old"}', ETag='"v1"')
+    scos.respond(200, b'{"title": "new"}', ETag='"v2"')
+    cached_get(URL)
+    assert cached_get(URL).json() == {"title": "new"}
+    assert cache_entry()["headers"]["ETag"] == '"v2"'
+
+def test_error_response_keeps_stored(scos):
+    scos.respond(200, b'{"title": "old"}', ETag='"v1"')
+    scos.respond(503, b"{}")
+    cached_get(URL)
+    assert cached_get(URL).status_code == 503
+    assert cache_entry()["content"] == b'{"title": "old"}'
+
+def test_no_store_is_not_stored(scos):
+    scos.respond(200, b"{}", **{"Cache-Control": "no-store"})
+    cached_get(URL)
+    assert cache_entry() is None
+
+def test_stale_response_while_locked(scos):
+    scos.respond(200, b'{"title": "old"}', **{"Cache-Control": "max-age=60"})
+    cached_get(URL)
+    expire()
+    caches[http_cache.SCOS_HTTP_CACHE].add(refresh_key(), True)
+    assert cached_get(URL).json() == {"title": "old"}
+    assert len(scos.requests) == 1
+
+def test_lock_is_released_after_refresh(scos):
+    scos.respond(200, b"{}", **{"Cache-Control": "max-age=60"})
+    cached_get(URL)
+    assert caches[http_cache.SCOS_HTTP_CACHE].get(refresh_key()) is None
+
+def test_lock_is_released_after_error(monkeypatch):
+    def fail(**kwargs):
+        raise requests.exceptions.ConnectionError("connection refused")
+
+    monkeypatch.setattr(http_cache, "scos_request", fail)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        cached_get(URL)
+    assert caches[http_cache.SCOS_HTTP_CACHE].get(refresh_key()) is None
+
+def test_waits_for_response_stored_by_lock_owner(scos, monkeypatch):
+    monkeypatch.setattr(http_cache, "SCOS_HTTP_CACHE_LOCK_WAIT", 5)
+    caches[http_cache.SCOS_HTTP_CACHE].add(refresh_key(), True)
+    owner = FakeSCOS()
+    owner.respond(200, b'{"title": "new"}', **{"Cache-Control": "max-age=60"})
+
+    def refresh() -> None:
+        time.sleep(0.2)
+        response = owner(method="GET", url=URL, headers={})
+        http_cache.store_response(response_key(URL)[1], response, time.time())
+
+    thread = threading.Thread(target=refresh)
+    thread.start()
+    response = cached_get(URL)
+    thread.join()
+    assert response.json() == {"title": "new"}
+    assert not scos.requests
+
+def test_refreshes_when_lock_owner_fails(scos, monkeypatch):
+    monkeypatch.setattr(http_cache, "SCOS_HTTP_CACHE_LOCK_WAIT", 5)
+    caches[http_cache.SCOS_HTTP_CACHE].add(refresh_key(), True)
+    scos.respond(200, b'{"title": "new"}', **{"Cache-Control": "max-age=60"})
+    # Обновляющий процесс завершился, не сохранив ответ
+    timer = threading.Timer(0.2, caches[http_cache.SCOS_HTTP_CACHE].delete, args=(refresh_key(),))
+    timer.start()
+    response = cached_get(URL)
+    timer.join()
+    assert response.json() == {"title": "new"}
+    assert len(scos.requests) == 1
+    assert caches[http_cache.SCOS_HTTP_CACHE].get(refresh_key()) is None
+
+def test_requests_when_lock_wait_expires(scos, monkeypatch):
+    monkeypatch.setattr(http_cache, "SCOS_HTTP_CACHE_LOCK_WAIT", 0.2)
+    caches[http_cache.SCOS_HTTP_CACHE].add(refresh_key(), True)
+    scos.respond(200, b'{"title": "new"}', **{"Cache-Control": "max-age=60"})
+    assert cached_get(URL).json() == {"title": "new"}
+    # Блокировка обновляющего процесса не снимается
+    assert caches[http_cache.SCOS_HTTP_CACHE].get(refresh_key()) is True
@@ -0,0 +1,175 @@
+"""
+Упорядоченная отправка событий (scos.utils.ordering): отметка выполнения
+задачи и ожидание предыдущей задачи без расходования повторов
+"""
+
+import time
+from contextlib import contextmanager
+
+import pytest
+from celery import shared_task
+from celery._state import _task_stack
+from celery.canvas import Signature
+from celery.exceptions import Retry
+
+from django.core.cache import cache
+
+from scos.utils.ordering import (
+    DONE_KEY,
+    PARTITION_HEADER,
+    SEQUENCE_HEADER,
+    SEQUENCED_AT_HEADER,
+    WAITS_HEADER,
+    is_turn,
+    mark_done,
+    next_sequence,
+    ordered,
+    retry_delay,
+)
+from scos.utils.scos_http import SCOSError
+
+
+
+PARTITION = "1.course-v1:SSAU+UNIT+2024"
+
+
+
+@shared_task(autoretry_for=(SCOSError,), max_retries=2)
+def event_task() -> None:
+    """
+    Задача события обучения: текущая задача для ordered
+    """
+
+@contextmanager
+def task_request(sequence: int, retries: int = 0, waits: int = 0, is_eager: bool = True):
+    """
+    Выполнение внутри event_task с заголовками последовательности
+    """
+    headers = {
+        PARTITION_HEADER: PARTITION,
+        SEQUENCE_HEADER: sequence,
+        SEQUENCED_AT_HEADER: time.time(),
+    }
+    if waits:
+        headers[WAITS_HEADER] = waits
+    _task_stack.push(event_task)
+    event_task.push_request(
+        id = f"task-{sequence}",
+        retries = retries,
+        is_eager = is_eager,
+        headers = dict(headers),
+        **headers,
+    )
+    try:
+        yield event_task.request
+    finally:
+        event_task.pop_request()
+        _task_stack.pop()
+
+def is_done(sequence: int) -> bool:
+    return cache.get(DONE_KEY.format(partition=PARTITION, sequence=sequence)) is not None
+
+def start_sequence(count: int) -> None:
+    for _ in range(count):
+        next_sequence(PARTITION)
+
+def failing(exception: Exception):
+    @ordered
+    def body():
+        raise exception
+    return body
+
+
+
+def test_success_marks_done():
+    start_sequence(1)
+    with task_request(1):
+        assert ordered(lambda: "sent")() == "sent"
+    assert is_done(1)
+
+def test_mark_done_drops_previous_mark():
+    mark_done(PARTITION, 1)
+    mark_done(PARTITION, 2)
+    assert not is_done(1)
+    assert is_done(2)
+
+def test_retryable_error_is_not_marked_done():
+    start_sequence(1)
+    with task_request(1, retries=1):
+        with pytest.raises(SCOSError):
+            failing(SCOSError(SCOSError.CONNECTION, "connection refused"))()
+    assert not is_done(1)
+
+def test_final_error_is_marked_done():
+    start_sequence(1)
+    with task_request(1):
+        with pytest.raises(SCOSError):
+            failing(SCOSError(SCOSError.CLIENT, "bad request", 400))()
+    assert is_done(1)
+
+def test_exhausted_retries_are_marked_done():
+    start_sequence(1)
+    with task_request(1, retries=event_task.max_retries):
+        with pytest.raises(SCOSError):
+            failing(SCOSError(SCOSError.SERVER, "unavailable", 503))()
+    assert is_done(1)
+
+def test_error_outside_autoretry_is_marked_done():
+    start_sequence(1)
+    with task_request(1):
+        with pytest.raises(ValueError):
+            failing(ValueError("broken event"))()
+    assert is_done(1)
+
+def test_waiting_task_is_not_run_and_keeps_retries():
+    start_sequence(2)
+    calls = []
+    with task_request(2, retries=1, waits=3):
+        with pytest.raises(Retry) as retry:
+            ordered(lambda: calls.append(True))()
+    assert not calls
+    assert not is_done(2)
+    options = retry.value.sig.options
+    assert options["retries"] == 1
+    assert options["countdown"] == retry_delay(3)
+    assert options["headers"][WAITS_HEADER] == 4
+    assert options["headers"][SEQUENCE_HEADER] == 2
+    assert options["headers"][PARTITION_HEADER] == PARTITION
+
+def test_waiting_task_is_requeued(monkeypatch):
+    start_sequence(2)
+    sent = []
+    monkeypatch.setattr(Signature, "apply_async", lambda signature: sent.append(signature))
+    with task_request(2, is_eager=False):
+        with pytest.raises(Retry):
+            ordered(lambda: None)()
+    assert len(sent) == 1
+    assert sent[0].options["headers"][WAITS_HEADER] == 1
+
+def test_next_task_runs_after_previous_is_done():
+    start_sequence(2)
+    with task_request(1):
+        ordered(lambda: None)()
+    with task_request(2):
+        assert ordered(lambda: "sent")() == "sent"
+    assert is_done(2)
+
+def test_next_task_waits_for_retried_previous():
+    start_sequence(2)
+    with task_request(1):
+        with pytest.raises(SCOSError):
+            failing(SCOSError(SCOSError.TIMEOUT, "read timeout"))()
+    assert not is_turn(PARTITION, 2, time.time())
+
+def test_redelivered_task_runs():
+    start_sequence(2)
+    mark_done(PARTITION, 2)
+    assert is_turn(PARTITION, 2, time.time())
+
+def test_lost_sequence_runs_without_waiting():
+    assert is_turn(PARTITION, 5, time.time())
+
+def test_lost_previous_task_runs_after_timeout():
+    start_sequence(2)
+    assert not is_turn(PARTITION, 2, time.time())
+    assert is_turn(PARTITION, 2, 0)
@@ -0,0 +1,145 @@
+"""
+Файлы задач при недоступном брокере (scos.utils.publisher): запись в файл,
+забранный для отправки, и отправка файла только одним процессом
+"""
+
+import fcntl
+import glob
+import os
+import socket
+import threading
+
+import pytest
+
+from scos.utils import publisher
+from scos.utils.publisher import EventPublisher, append
+
+
+
+# Число потоков записи и строк каждого потока в тесте гонок
+WRITERS = 4
+LINES = 200
+
+
+
+@pytest.fixture(name="spool_path")
+def spool_path_fixture(tmp_path, monkeypatch):
+    monkeypatch.setattr(publisher, "SCOS_SPOOL_PATH", str(tmp_path))
+    return str(tmp_path)
+
+def read_lines(path: str) -> list:
+    with open(path, encoding="utf-8") as spool:
+        return spool.read().splitlines()
+
+def claim_and_read(claimer: EventPublisher) -> list:
+    """
+    Забирает файлы и читает их, как EventPublisher.replay
+    """
+    lines = []
+    for path in claimer.claim_spool_files():
+        with open(path, encoding="utf-8") as spool:
+            fcntl.flock(spool, fcntl.LOCK_EX)
+            lines.extend(line for line in spool.read().splitlines() if line)
+            os.remove(path)
+    return lines
+
+
+
+def test_append_after_rename_writes_new_file(spool_path, monkeypatch):
+    path = os.path.join(spool_path, "spool-host-1.jsonl")
+    claimed = f"{path}.replay-host-2"
+    with open(path, "w", encoding="utf-8") as spool:
+        spool.write("old\n")
+    flock = fcntl.flock
+    renamed = []
+
+    def rename_before_lock(spool, operation):
+        # Файл забран для отправки между open и flock, другой поток уже
+        # создал новый файл
+        if not renamed:
+            os.rename(path, claimed)
+            with open(path, "w", encoding="utf-8") as other:
+                other.write("other\n")
+            renamed.append(True)
+        flock(spool, operation)
+
+    monkeypatch.setattr(publisher.fcntl, "flock", rename_before_lock)
+    append(path, "new\n")
+    assert read_lines(claimed) == ["old"]
+    assert read_lines(path) == ["other", "new"]
+
+def test_append_after_remove_writes_new_file(spool_path, monkeypatch):
+    path = os.path.join(spool_path, "spool-host-1.jsonl")
+    flock = fcntl.flock
+    removed = []
+
+    def remove_before_lock(spool, operation):
+        if not removed:
+            os.remove(path)
+            removed.append(True)
+        flock(spool, operation)
+
+    monkeypatch.setattr(publisher.fcntl, "flock", remove_before_lock)
+    append(path, "new\n")
+    assert read_lines(path) == ["new"]
+
+def test_claimed_file_is_not_claimed_again(spool_path, monkeypatch):
+    path = os.path.join(spool_path, "spool-host-1.jsonl")
+    with open(path, "w", encoding="utf-8") as spool:
+        spool.write("task\n")
+    listing = glob.glob(os.path.join(spool_path, "spool-*.jsonl*"))
+    assert claim_and_read(EventPublisher()) == ["task"]
+    # Второй процесс получил список файлов до переименования
+    monkeypatch.setattr(publisher.glob, "glob", lambda pattern: listing)
+    assert not list(EventPublisher().claim_spool_files())
+
+def test_file_of_live_process_is_not_claimed(spool_path):
+    path = os.path.join(
+        spool_path, f"spool-host-1.jsonl.replay-{socket.gethostname()}-{os.getpid()}"
+    )
+    with open(path, "w", encoding="utf-8") as spool:
+        spool.write("task\n")
+    assert not list(EventPublisher().claim_spool_files())
+    assert os.path.exists(path)
+
+def test_file_of_finished_process_is_claimed(spool_path, monkeypatch):
+    path = os.path.join(spool_path, f"spool-host-1.jsonl.replay-{socket.gethostname()}-1")
+    with open(path, "w", encoding="utf-8") as spool:
+        spool.write("task\n")
+    monkeypatch.setattr(publisher, "is_alive", lambda pid: False)
+    assert claim_and_read(EventPublisher()) == ["task"]
+    assert not os.listdir(spool_path)
+
+def test_file_of_other_host_is_not_claimed(spool_path, monkeypatch):
+    path = os.path.join(spool_path, "spool-host-1.jsonl.replay-other-host-1")
+    with open(path, "w", encoding="utf-8") as spool:
+        spool.write("task\n")
+    monkeypatch.setattr(publisher, "is_alive", lambda pid: False)
+    assert not list(EventPublisher().claim_spool_files())
+
+def test_append_and_claim_race_keeps_every_line(spool_path):
+    path = os.path.join(spool_path, "spool-host-1.jsonl")
+    claimer = EventPublisher()
+    done = threading.Event()
+    received = []
+
+    def write(writer: int) -> None:
+        for line in range(LINES):
+            append(path, f"{writer}-{line}\n")
+
+    def claim() -> None:
+        while not done.is_set():
+            received.extend(claim_and_read(claimer))
+
+    claiming = threading.Thread(target=claim)
+    claiming.start()
+    writers = [threading.Thread(target=write, args=(writer,)) for writer in range(WRITERS)]
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    done.set()
+    claiming.join()
+    received.extend(claim_and_read(claimer))
+    expected = [f"{writer}-{line}" for writer in range(WRITERS) for line in range(LINES)]
+    assert sorted(received) == sorted(expected)